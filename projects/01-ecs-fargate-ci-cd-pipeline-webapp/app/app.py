@@ -1,20 +1,95 @@
-from flask import Flask, render_template, jsonify
+from startup import StartupTimeline
+
+STARTUP = StartupTimeline()
+STARTUP.mark("import_start")
+
+import logging
 import os
 
-app = Flask(__name__)
+from flask import Flask, render_template, jsonify
+
+import database
+from health_check import HealthCheckMiddleware
+from metrics import RequestMetrics
+from response_cache import ResponseCache, cached_response
+from students import bp as students_bp
+
+STARTUP.mark("imports_done")
+
+# Pages only change per deploy: render once per worker, then serve from memory
+# (set RESPONSE_CACHE=0 to render on every request, e.g. for benchmarks).
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "1") != "0"
+INSTANCE = os.uname().nodename
+
+def create_app(config=None):
+    app = Flask(__name__)
+    app.config.update(config or {})
+
+    # Under gunicorn, log through its handlers (Flask's default logger drops INFO)
+    gunicorn_logger = logging.getLogger("gunicorn.error")
+    if gunicorn_logger.handlers:
+        app.logger.handlers = gunicorn_logger.handlers
+        app.logger.setLevel(gunicorn_logger.level)
+
+    # /health is served by the middleware before Flask routing (see health_check.py);
+    # dependency checks for HEALTH_CHECK_MODE=deep go in app.extensions["health"].register().
+    app.wsgi_app = app.extensions["health"] = HealthCheckMiddleware(app.wsgi_app)
+    response_cache = app.extensions["response_cache"] = ResponseCache()
+
+    def cached(key, build):
+        if not RESPONSE_CACHE_ENABLED or app.debug:
+            body, mimetype = build()
+            return app.response_class(body, mimetype=mimetype)
+        return cached_response(response_cache.get_or_build(key, build))
+
+    pages = {
+        "home": (("index.html", INSTANCE), lambda: (render_template("index.html").encode(), "text/html")),
+        "api": (
+            ("api/hello", INSTANCE),
+            lambda: (jsonify(message="Hello from Rafs DevOps Academy's ECS Fargate!", instance=INSTANCE).get_data(), "application/json"),
+        ),
+    }
+
+    @app.route("/")
+    def home():
+        return cached(*pages["home"])
+
+    @app.route("/api/hello")
+    def api():
+        return cached(*pages["api"])
+
+    # Students API: only touches (and imports) SQLAlchemy when DATABASE_URL is set
+    db = app.extensions["database"] = database.from_config(app.config)
+    if db is not None:
+        app.extensions["health"].register("database", db.ping)
+    app.register_blueprint(students_bp)
+
+    # Registered last so the metrics layout covers every route (and /metrics itself)
+    app.extensions["metrics"] = RequestMetrics()
+    app.extensions["metrics"].init_app(app)
+
+    @app.after_request
+    def log_startup(response):
+        if not STARTUP.logged:
+            STARTUP.mark("first_response")
+            STARTUP.log_once(app.logger)
+        return response
 
-@app.route("/")
-def home():
-    return render_template("index.html")
+    # Compile templates and build the cached pages now instead of on the first
+    # request; under gunicorn's preload this runs once in the master and the
+    # workers share the result copy-on-write.
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    if RESPONSE_CACHE_ENABLED:
+        with app.test_request_context():
+            for key, build in pages.values():
+                response_cache.get_or_build(key, build)
 
-@app.route("/health")
-def health():
-    return jsonify(status="ok"), 200
+    STARTUP.mark("app_ready")
+    return app
 
-@app.route("/api/hello")
-def api():
-    return jsonify(message="Hello from Rafs DevOps Academy's ECS Fargate!", instance=os.uname().nodename)
+app = create_app()
 
 if __name__ == "__main__":
     # Dev only – Gunicorn used in Docker
-    app.run(host="0.0.0.0", port=int(os.getenv("PORT", 5000)))
\ No newline at end of file
+    app.run(host="0.0.0.0", port=int(os.getenv("PORT", 5000)))
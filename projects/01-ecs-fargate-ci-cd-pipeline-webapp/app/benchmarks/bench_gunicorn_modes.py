@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Throughput and tail latency of the gunicorn runtime profiles.
+
+Modes:
+    legacy   - the old Dockerfile CMD: gunicorn defaults (one sync worker,
+               2s keep-alive, no preload)
+    sync     - gunicorn.conf.py with GUNICORN_WORKER_CLASS=sync
+    gthread  - gunicorn.conf.py defaults
+    gevent   - gunicorn.conf.py with GUNICORN_WORKER_CLASS=gevent
+
+Workers/threads come from this machine's cgroup limits, exactly as in the task;
+pin them with GUNICORN_WORKERS / GUNICORN_THREADS to emulate a Fargate size.
+
+Usage (from the app/ directory):
+    pip install -r requirements.txt
+    python benchmarks/bench_gunicorn_modes.py --duration 5 --concurrency 32
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from loadgen import APP_DIR, gunicorn_server, run_load  # noqa: E402
+
+PROFILE = str(APP_DIR / "gunicorn.conf.py")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare gunicorn worker modes")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per mode (default: 5)")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent connections (default: 32)")
+    parser.add_argument("--path", default="/", help="Request path (default: /)")
+    parser.add_argument("--modes", default="legacy,sync,gthread,gevent", help="Comma-separated modes to run")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile("w", suffix=".py") as empty_config:
+        configs = {
+            # An empty config file, otherwise gunicorn picks up ./gunicorn.conf.py
+            "legacy": (["--config", empty_config.name], {}),
+            "sync": (["--config", PROFILE], {"GUNICORN_WORKER_CLASS": "sync"}),
+            "gthread": (["--config", PROFILE], {"GUNICORN_WORKER_CLASS": "gthread"}),
+            "gevent": (["--config", PROFILE], {"GUNICORN_WORKER_CLASS": "gevent"}),
+        }
+        results = {}
+        for mode in args.modes.split(","):
+            gunicorn_args, env = configs[mode]
+            with gunicorn_server(*gunicorn_args, env=env) as server:
+                run_load(server, args.path, args.concurrency, 0.5)  # warm-up
+                results[mode] = run_load(server, args.path, args.concurrency, args.duration).summary()
+
+    print(f"GET {args.path} with {args.concurrency} keep-alive connections, {args.duration}s per mode")
+    print(f"{'mode':<8} {'rps':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for mode, r in results.items():
+        print(f"{mode:<8} {r['rps']:>9} {r['p50_ms']:>9} {r['p99_ms']:>9} {r['errors']:>7}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
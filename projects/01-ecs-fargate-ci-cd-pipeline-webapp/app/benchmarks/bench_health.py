@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Per-probe cost of /health: Flask route vs the WSGI fast path.
+
+Calls the WSGI callables directly (no sockets), so the numbers are the pure
+in-process cost a probe adds to a worker.
+
+Usage (from the app/ directory):
+    python benchmarks/bench_health.py --probes 50000
+"""
+
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+from flask import Flask, jsonify
+from werkzeug.test import EnvironBuilder
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import app  # noqa: E402
+
+
+def flask_route_app():
+    """The previous implementation: a regular Flask view."""
+    legacy = Flask("legacy")
+
+    @legacy.route("/health")
+    def health():
+        return jsonify(status="ok"), 200
+
+    return legacy
+
+
+def probe_cost(wsgi_app, probes):
+    environ = EnvironBuilder(path="/health", headers={"User-Agent": "ELB-HealthChecker/2.0"}).get_environ()
+
+    def start_response(status, headers):
+        pass
+
+    def probe():
+        for _ in wsgi_app(dict(environ), start_response):
+            pass
+
+    probe()
+    best = min(timeit.repeat(probe, number=probes, repeat=5))
+    return best / probes * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-probe cost of the /health fast path")
+    parser.add_argument("--probes", type=int, default=20000, help="Probes per timing run (default: 20000)")
+    args = parser.parse_args()
+
+    route_us = probe_cost(flask_route_app(), args.probes)
+    fast_us = probe_cost(app, args.probes)
+    print(f"{'implementation':<16} {'us/probe':>9}")
+    print(f"{'flask route':<16} {route_us:>9.2f}")
+    print(f"{'wsgi fast path':<16} {fast_us:>9.2f}")
+    print(f"speed-up: {route_us / fast_us:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
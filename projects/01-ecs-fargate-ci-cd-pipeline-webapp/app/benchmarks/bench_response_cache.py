@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Requests/sec per gunicorn worker with and without the in-process response cache.
+
+Starts one sync gunicorn worker with RESPONSE_CACHE=0 (render every request) and
+with the cache on, then drives /, /api/hello and an If-None-Match revalidation.
+
+Usage (from the app/ directory):
+    pip install -r requirements.txt
+    python benchmarks/bench_response_cache.py --duration 5 --concurrency 4
+"""
+
+import argparse
+import http.client
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from loadgen import gunicorn_server, run_load  # noqa: E402
+
+SCENARIOS = [
+    ("GET /", "/", {"Accept-Encoding": "gzip, br"}),
+    ("GET /api/hello", "/api/hello", {}),
+    ("GET / (If-None-Match)", "/", None),  # headers filled in with the live ETag
+]
+
+
+def current_etag(server, path, headers):
+    conn = http.client.HTTPConnection(server.host, server.port)
+    conn.request("GET", path, headers=headers)
+    resp = conn.getresponse()
+    resp.read()
+    return resp.getheader("ETag")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the response cache per gunicorn worker")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per scenario (default: 5)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent connections (default: 4)")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = {}
+    # An empty config file, otherwise gunicorn picks up ./gunicorn.conf.py and its worker count
+    with tempfile.NamedTemporaryFile("w", suffix=".py") as empty_config:
+        for mode, env in (("uncached", {"RESPONSE_CACHE": "0"}), ("cached", {"RESPONSE_CACHE": "1"})):
+            with gunicorn_server("--config", empty_config.name, "--workers", "1", env=env) as server:
+                for name, path, headers in SCENARIOS:
+                    if headers is None:
+                        headers = {"Accept-Encoding": "gzip, br"}
+                        etag = current_etag(server, path, headers)
+                        if not etag:
+                            continue  # no ETags without the cache
+                        headers["If-None-Match"] = etag
+                    # Warm up the worker before measuring
+                    run_load(server, path, 1, 0.5, headers)
+                    results.setdefault(name, {})[mode] = run_load(
+                        server, path, args.concurrency, args.duration, headers
+                    ).summary()
+
+    print(f"{'scenario':<24} {'uncached rps':>13} {'cached rps':>11} {'gain':>7} {'cached p99 ms':>14}")
+    for name, modes in results.items():
+        cached = modes["cached"]
+        uncached = modes.get("uncached")
+        gain = f"{cached['rps'] / uncached['rps']:.2f}x" if uncached and uncached["rps"] else "-"
+        print(
+            f"{name:<24} {uncached['rps'] if uncached else '-':>13} {cached['rps']:>11} "
+            f"{gain:>7} {cached['p99_ms']:>14}"
+        )
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
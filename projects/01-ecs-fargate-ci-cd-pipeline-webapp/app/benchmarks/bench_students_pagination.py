@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Students API page latency as the table grows: keyset vs OFFSET pagination.
+
+For each table size a SQLite database is seeded and a 100-row page is fetched
+near the start, middle and end of the table:
+    keyset  - GET /api/students?after=<id> through the app (pool + streamed JSON)
+    offset  - the equivalent LIMIT/OFFSET query, for comparison
+
+Usage (from the app/ directory):
+    pip install -r requirements.txt
+    python benchmarks/bench_students_pagination.py --sizes 10000,100000,1000000
+"""
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, insert, text
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import create_app  # noqa: E402
+from models import create_schema, students  # noqa: E402
+
+
+def seed(path, size):
+    engine = create_engine(f"sqlite:///{path}")
+    create_schema(engine)
+    with engine.begin() as conn:
+        for start in range(0, size, 50000):
+            conn.execute(insert(students), [
+                {"name": f"student {n}", "grade_level": n % 12 + 1}
+                for n in range(start, min(size, start + 50000))
+            ])
+    return engine
+
+
+def median_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - began) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyset vs OFFSET page latency by table size")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated row counts")
+    parser.add_argument("--page-size", type=int, default=100, help="Rows per page (default: 100)")
+    parser.add_argument("--repeat", type=int, default=20, help="Fetches per measurement (default: 20)")
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'position':>9} {'keyset API ms':>14} {'OFFSET SQL ms':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in map(int, args.sizes.split(",")):
+            path = Path(tmp) / f"students_{size}.db"
+            engine = seed(path, size)
+            client = create_app({"DATABASE_URL": f"sqlite:///{path}"}).test_client()
+            for label, position in (("start", 0), ("middle", size // 2), ("end", size - args.page_size)):
+                keyset = median_ms(
+                    lambda: client.get(f"/api/students?limit={args.page_size}&after={position}").get_data(),
+                    args.repeat,
+                )
+                query = text("SELECT id, name, grade_level, created_at FROM students ORDER BY id LIMIT :n OFFSET :o")
+                with engine.connect() as conn:
+                    offset = median_ms(
+                        lambda: conn.execute(query, {"n": args.page_size, "o": position}).fetchall(),
+                        args.repeat,
+                    )
+                print(f"{size:>9} {label:>9} {keyset:>14.2f} {offset:>14.2f}")
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Shared helpers for the app benchmarks: start the app under gunicorn on a free
+local port and drive it with concurrent keep-alive HTTP clients.
+"""
+
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@dataclass
+class Server:
+    host: str
+    port: int
+    process: subprocess.Popen
+
+
+@contextmanager
+def gunicorn_server(*gunicorn_args: str, env: Optional[Dict[str, str]] = None,
+                    ready_path: str = "/health", timeout: float = 20.0):
+    """Run `gunicorn <args> app:app` from the app directory until the block exits."""
+    port = free_port()
+    cmd = [sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}", *gunicorn_args, "app:app"]
+    process = subprocess.Popen(
+        cmd, cwd=APP_DIR, env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+                conn.request("GET", ready_path)
+                if conn.getresponse().status == 200:
+                    break
+            except OSError:
+                pass
+            if process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError(f"gunicorn did not become ready: {' '.join(cmd)}")
+            time.sleep(0.05)
+        yield Server("127.0.0.1", port, process)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def worker_rss_kb(server: Server) -> Dict[int, int]:
+    """Resident set size (KiB) of each gunicorn worker, read from /proc (Linux only)."""
+    rss = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/status") as f:
+                status = dict(line.split(":", 1) for line in f if ":" in line)
+        except OSError:
+            continue
+        if int(status.get("PPid", "0")) == server.process.pid and "VmRSS" in status:
+            rss[int(entry)] = int(status["VmRSS"].split()[0])
+    return rss
+
+
+@dataclass
+class LoadResult:
+    path: str
+    concurrency: int
+    duration: float
+    latencies_ms: List[float] = field(default_factory=list)
+    statuses: Dict[int, int] = field(default_factory=dict)
+    errors: int = 0
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies_ms)
+
+    @property
+    def rps(self) -> float:
+        return self.requests / self.duration if self.duration else 0.0
+
+    def percentile(self, pct: float) -> float:
+        if not self.latencies_ms:
+            return 0.0
+        ordered = sorted(self.latencies_ms)
+        return ordered[min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1 if pct else 0)]
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "path": self.path,
+            "concurrency": self.concurrency,
+            "requests": self.requests,
+            "errors": self.errors,
+            "rps": round(self.rps, 1),
+            "p50_ms": round(self.percentile(50), 3),
+            "p95_ms": round(self.percentile(95), 3),
+            "p99_ms": round(self.percentile(99), 3),
+            "mean_ms": round(statistics.mean(self.latencies_ms), 3) if self.latencies_ms else 0.0,
+        }
+
+
+def run_load(server: Server, path: str, concurrency: int = 8, duration: float = 5.0,
+             headers: Optional[Dict[str, str]] = None) -> LoadResult:
+    """Hammer `path` from `concurrency` threads, each on its own keep-alive connection."""
+    result = LoadResult(path, concurrency, duration)
+    lock = threading.Lock()
+    start = threading.Event()
+
+    def worker():
+        latencies, statuses, errors = [], {}, 0
+        conn = http.client.HTTPConnection(server.host, server.port, timeout=10)
+        start.wait()
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            began = time.perf_counter()
+            try:
+                conn.request("GET", path, headers=headers or {})
+                resp = conn.getresponse()
+                resp.read()
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection(server.host, server.port, timeout=10)
+                continue
+            latencies.append((time.perf_counter() - began) * 1000)
+            statuses[resp.status] = statuses.get(resp.status, 0) + 1
+        conn.close()
+        with lock:
+            result.latencies_ms.extend(latencies)
+            result.errors += errors
+            for status, count in statuses.items():
+                result.statuses[status] = result.statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    start.set()
+    for thread in threads:
+        thread.join()
+    return result
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+HTTP load-test and performance-regression suite for the web app.
+
+Starts the app under gunicorn with gunicorn.conf.py, drives each endpoint with
+concurrent keep-alive clients and records throughput, p50/p95/p99 latency and
+the RSS of every worker. Results are compared with benchmarks/baseline.json;
+the run fails (exit 1) when any endpoint regresses beyond --threshold.
+
+Machines differ, so every run also times a fixed pure-Python workload and the
+baseline's rps/latency are scaled by the speed ratio before comparing.
+RSS is compared as-is.
+
+Usage (from the app/ directory):
+    pip install -r requirements.txt
+    python benchmarks/perf_suite.py                    # run and check against the baseline
+    python benchmarks/perf_suite.py --update-baseline  # record a new baseline
+"""
+
+import argparse
+import hashlib
+import json
+import platform
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from loadgen import APP_DIR, gunicorn_server, run_load, worker_rss_kb  # noqa: E402
+
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+ENDPOINTS = {
+    "/": {"Accept-Encoding": "gzip, br"},
+    "/health": {},
+    "/api/hello": {},
+}
+
+
+def calibrate(rounds=5, seconds=0.2):
+    """Iterations/sec of a fixed CPU-bound loop (best of `rounds`), used to normalise across machines."""
+    payload = b"x" * 1024
+    best = 0.0
+    for _ in range(rounds):
+        iterations = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            for _ in range(100):
+                hashlib.sha256(payload).digest()
+                json.loads(json.dumps({"n": iterations, "items": list(range(20))}))
+            iterations += 100
+        best = max(best, iterations / seconds)
+    return best
+
+
+def best_of(rounds):
+    """Least noisy figures across rounds: highest rps, lowest latencies."""
+    best = dict(max(rounds, key=lambda r: r["rps"]))
+    for key in ("p50_ms", "p95_ms", "p99_ms", "mean_ms"):
+        best[key] = min(r[key] for r in rounds)
+    best["errors"] = sum(r["errors"] for r in rounds)
+    return best
+
+
+def run_suite(args):
+    calibration = calibrate()
+    env = {
+        "GUNICORN_WORKERS": str(args.workers),
+        "GUNICORN_THREADS": str(args.threads),
+        # Steady state only: a recycled worker mid-run shows up as connection errors
+        "GUNICORN_MAX_REQUESTS": "0",
+    }
+    results = {}
+    with gunicorn_server("--config", str(APP_DIR / "gunicorn.conf.py"), env=env) as server:
+        for path, headers in ENDPOINTS.items():
+            run_load(server, path, args.concurrency, args.warmup, headers)
+            results[path] = best_of([
+                run_load(server, path, args.concurrency, args.duration, headers).summary()
+                for _ in range(args.rounds)
+            ])
+        rss = worker_rss_kb(server)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "workers": args.workers,
+            "threads": args.threads,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "rounds": args.rounds,
+            "calibration": round(calibration),
+        },
+        "endpoints": results,
+        "worker_rss_kb": {"max": max(rss.values(), default=0), "workers": sorted(rss.values())},
+    }
+
+
+def compare(run, baseline, threshold):
+    """List of (check, baseline, current, verdict) rows; verdict is 'ok' or 'REGRESSED'."""
+    speed = run["meta"]["calibration"] / baseline["meta"]["calibration"]
+    rows = []
+    for path, current in run["endpoints"].items():
+        base = baseline["endpoints"].get(path)
+        if not base:
+            continue
+        expected_rps = base["rps"] * speed
+        rows.append((f"{path} rps", round(expected_rps, 1), current["rps"],
+                     current["rps"] >= expected_rps * (1 - threshold)))
+        for pct in ("p50_ms", "p99_ms"):
+            expected = base[pct] / speed
+            rows.append((f"{path} {pct}", round(expected, 3), current[pct],
+                         current[pct] <= expected * (1 + threshold)))
+        rows.append((f"{path} errors", 0, current["errors"], current["errors"] == 0))
+    base_rss = baseline["worker_rss_kb"]["max"]
+    current_rss = run["worker_rss_kb"]["max"]
+    rows.append(("max worker RSS KiB", base_rss, current_rss, current_rss <= base_rss * (1 + threshold)))
+    return speed, [(name, b, c, "ok" if good else "REGRESSED") for name, b, c, good in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the app and fail on performance regressions")
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds per round (default: 3)")
+    parser.add_argument("--rounds", type=int, default=3, help="Rounds per endpoint, best one counts (default: 3)")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Warm-up seconds per endpoint (default: 1)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent connections (default: 16)")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers (default: 2)")
+    parser.add_argument("--threads", type=int, default=4, help="Threads per gthread worker (default: 4)")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed regression as a fraction of the baseline (default: 0.25)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE, help="Baseline JSON file")
+    parser.add_argument("--update-baseline", action="store_true", help="Write this run as the new baseline")
+    parser.add_argument("--json", help="Also write this run's results to this JSON file")
+    args = parser.parse_args()
+
+    run = run_suite(args)
+    print(f"{'endpoint':<12} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for path, r in run["endpoints"].items():
+        print(f"{path:<12} {r['rps']:>9} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} {r['errors']:>7}")
+    print(f"worker RSS KiB: {run['worker_rss_kb']['workers']}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(run, indent=2))
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(run, indent=2) + "\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline first")
+        return 1
+
+    speed, rows = compare(run, json.loads(args.baseline.read_text()), args.threshold)
+    print(f"\nAgainst baseline (machine speed x{speed:.2f}, threshold {args.threshold:.0%}):")
+    print(f"{'check':<24} {'expected':>10} {'current':>10}  verdict")
+    for name, expected, current, verdict in rows:
+        print(f"{name:<24} {expected:>10} {current:>10}  {verdict}")
+    regressions = [row for row in rows if row[3] != "ok"]
+    if regressions:
+        print(f"\n{len(regressions)} check(s) regressed beyond {args.threshold:.0%}")
+        return 1
+    print("\nNo regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+# Gunicorn runtime profile for the Fargate task.
+# Workers and threads are sized from the container's cgroup CPU quota and memory
+# limit (what Fargate actually grants, not the host's cores), the app is loaded
+# once in the master and shared copy-on-write with the workers (except under
+# gevent/eventlet), and keep-alive outlives the ALB idle timeout so the ALB never
+# reuses a connection we closed.
+#
+# Every knob can be overridden through GUNICORN_* environment variables, e.g.
+#   GUNICORN_WORKER_CLASS=gevent GUNICORN_WORKERS=2 gunicorn -c gunicorn.conf.py app:app
+
+import gc
+import math
+import os
+import shutil
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+# Resident memory one worker needs (Flask + app); caps workers on small tasks.
+WORKER_MEMORY_MB = int(os.getenv("GUNICORN_WORKER_MEMORY_MB", "96"))
+# ALB default is 60s; closing first makes the ALB answer 502 on a reused socket.
+ALB_IDLE_TIMEOUT = int(os.getenv("ALB_IDLE_TIMEOUT", "60"))
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpus(root=CGROUP_ROOT):
+    """CPUs granted by the cgroup quota (v2 then v1), else the visible core count."""
+    cpu_max = _read(os.path.join(root, "cpu.max"))
+    if cpu_max:
+        quota, _, period = cpu_max.partition(" ")
+        if quota != "max":
+            return int(quota) / int(period or 100000)
+    quota = _read(os.path.join(root, "cpu", "cpu.cfs_quota_us")) or _read(os.path.join(root, "cpu.cfs_quota_us"))
+    period = _read(os.path.join(root, "cpu", "cpu.cfs_period_us")) or _read(os.path.join(root, "cpu.cfs_period_us"))
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return float(len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1)
+
+
+def cgroup_memory_mb(root=CGROUP_ROOT):
+    """Memory limit of the cgroup in MiB (v2 then v1), or None when unlimited."""
+    for path in (os.path.join(root, "memory.max"),
+                 os.path.join(root, "memory", "memory.limit_in_bytes"),
+                 os.path.join(root, "memory.limit_in_bytes")):
+        value = _read(path)
+        if value and value != "max":
+            limit = int(value)
+            # cgroup v1 reports "unlimited" as a huge page-aligned number
+            if limit < 1 << 60:
+                return limit // (1024 * 1024)
+    return None
+
+
+def size_workers(cpus, memory_mb, worker_class):
+    """(workers, threads) for the given limits and worker class."""
+    # Fractional Fargate CPUs (0.25, 0.5) round up to one core's worth.
+    cores = max(1, math.ceil(cpus))
+    if worker_class == "sync":
+        workers, threads = 2 * cores + 1, 1
+    elif worker_class == "gthread":
+        # Spare process so one stuck worker doesn't take the task offline
+        workers, threads = cores + 1, 2 * cores + 2
+    else:
+        # One event loop per core; concurrency comes from worker_connections
+        workers, threads = cores, 1
+    if memory_mb:
+        workers = min(workers, max(1, memory_mb // WORKER_MEMORY_MB))
+    return workers, threads
+
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+_cpus = cgroup_cpus()
+_workers, _threads = size_workers(_cpus, cgroup_memory_mb(), worker_class)
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("GUNICORN_WORKERS", _workers))
+threads = int(os.getenv("GUNICORN_THREADS", _threads))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))  # gevent only
+
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", ALB_IDLE_TIMEOUT + 15))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+# ECS sends SIGTERM and waits stopTimeout (30s default) before SIGKILL.
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "25"))
+
+# Recycle workers now and then so slow leaks can't grow unbounded; jitter keeps
+# them from all restarting at once.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = max_requests // 10
+
+# Per-worker metric arrays (see metrics.py); tmpfs so recording never hits disk.
+# Set before the app is imported so the metrics module picks it up.
+os.environ.setdefault("METRICS_DIR", "/dev/shm/app-metrics" if os.path.isdir("/dev/shm") else "/tmp/app-metrics")
+
+# gevent/eventlet monkey-patch in each worker after the fork; a preloaded app
+# would already hold unpatched sockets, locks and ssl objects from the master.
+_green = any(name in worker_class.lower() for name in ("gevent", "eventlet"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "0" if _green else "1") != "0"
+# The worker heartbeat file is touched every second; keep it off the overlay fs.
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+accesslog = os.getenv("GUNICORN_ACCESSLOG")  # off by default: the ALB logs requests
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOGLEVEL", "info")
+
+
+def on_starting(server):
+    # Counters restart with the master; drop arrays left by a previous run
+    shutil.rmtree(os.environ["METRICS_DIR"], ignore_errors=True)
+    os.makedirs(os.environ["METRICS_DIR"], exist_ok=True)
+
+
+def when_ready(server):
+    server.log.info(
+        "runtime profile: cpus=%.2f worker_class=%s workers=%d threads=%d keepalive=%ds preload=%s",
+        _cpus, worker_class, workers, threads, keepalive, preload_app,
+    )
+    if preload_app:
+        # Move everything the preloaded app allocated into the permanent GC
+        # generation: collections in the workers then never write to (and so
+        # never copy) the pages shared with the master.
+        gc.collect()
+        gc.freeze()
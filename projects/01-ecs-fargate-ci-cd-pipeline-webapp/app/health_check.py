@@ -0,0 +1,98 @@
+# WSGI fast path for the ALB / ECS health probes.
+# /health is answered from precomputed bytes before Flask sees the request (no
+# routing, request context or jsonify), which matters because every target is
+# probed by every ALB node, plus the container health check.
+#
+# In deep mode the response reflects registered dependency checks, but those run
+# on a background thread every HEALTH_REFRESH_SECONDS: a probe only ever reads
+# the last result, so a slow database can't make the probes time out.
+
+import json
+import os
+import threading
+import time
+
+HEALTH_PATH = "/health"
+# "shallow": always 200 while the process serves requests (liveness).
+# "deep": 200/503 from the last dependency check results (readiness).
+HEALTH_CHECK_MODE = os.getenv("HEALTH_CHECK_MODE", "shallow")
+HEALTH_REFRESH_SECONDS = float(os.getenv("HEALTH_REFRESH_SECONDS", "10"))
+
+
+def _prepare(status_code, payload):
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    status = "200 OK" if status_code == 200 else "503 Service Unavailable"
+    headers = [
+        ("Content-Type", "application/json"),
+        ("Content-Length", str(len(body))),
+        ("Cache-Control", "no-store"),
+    ]
+    return status, headers, body
+
+
+class HealthCheckMiddleware:
+    """Wraps a WSGI app and serves HEALTH_PATH itself."""
+
+    def __init__(self, app, path=HEALTH_PATH, mode=HEALTH_CHECK_MODE, refresh_seconds=HEALTH_REFRESH_SECONDS):
+        self.app = app
+        self.path = path
+        self.mode = mode
+        self.refresh_seconds = refresh_seconds
+        self.checks = {}
+        self._response = _prepare(200, {"status": "ok"})
+        self._refreshed_at = None
+        self._refresher_pid = None
+        self._lock = threading.Lock()
+
+    def register(self, name, check):
+        """Add a dependency check: a callable that raises (or returns False) when unhealthy."""
+        self.checks[name] = check
+
+    def __call__(self, environ, start_response):
+        if environ.get("PATH_INFO") != self.path:
+            return self.app(environ, start_response)
+
+        if self.mode == "deep" and self.checks:
+            self._ensure_refresher()
+            if self._is_stale():
+                status, headers, body = _prepare(503, {"status": "stale"})
+            else:
+                status, headers, body = self._response
+        else:
+            status, headers, body = self._response
+        start_response(status, headers)
+        return [] if environ.get("REQUEST_METHOD") == "HEAD" else [body]
+
+    def _is_stale(self):
+        # Not refreshed yet, or the refresher has stopped making progress
+        refreshed_at = self._refreshed_at
+        return refreshed_at is None or time.monotonic() - refreshed_at > 3 * self.refresh_seconds
+
+    def _ensure_refresher(self):
+        # Threads don't survive gunicorn's fork, so each worker starts its own
+        if self._refresher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._refresher_pid == os.getpid():
+                return
+            self._refresher_pid = os.getpid()
+            self._refreshed_at = None
+            threading.Thread(target=self._refresh_forever, name="health-refresher", daemon=True).start()
+
+    def _refresh_forever(self):
+        while True:
+            self.refresh()
+            time.sleep(self.refresh_seconds)
+
+    def refresh(self):
+        """Run every check once and swap in the new precomputed response."""
+        results = {}
+        for name, check in list(self.checks.items()):
+            try:
+                results[name] = "ok" if check() is not False else "fail"
+            except Exception as exc:  # any failure marks the dependency down
+                results[name] = f"fail: {exc.__class__.__name__}"
+        healthy = all(result == "ok" for result in results.values())
+        payload = {"status": "ok" if healthy else "degraded", "checks": results}
+        self._response = _prepare(200 if healthy else 503, payload)
+        self._refreshed_at = time.monotonic()
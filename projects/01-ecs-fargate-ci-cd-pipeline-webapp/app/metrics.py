@@ -0,0 +1,239 @@
+# Prometheus metrics that add up across gunicorn workers without locks.
+# Every (process, thread) that serves requests owns a small mmap-backed array of
+# float64 slots: request counters, latency histogram buckets and an in-flight
+# gauge per (route, method). Only the owning thread ever writes its array, so
+# recording a request is a handful of in-place adds with no lock at all.
+# /metrics reads every array in METRICS_DIR (all workers, including recycled
+# ones, so counters stay monotonic) and renders the merged text format.
+#
+# The slot layout is derived from the Flask url_map, which is identical in every
+# worker (same app, same routes), and its hash is part of each file name so a
+# deploy with different routes never mixes layouts.
+#
+# Arrays of workers that have exited (recycled by max_requests, or crashed) are
+# folded into one <layout>_retired.db on the next scrape and unlinked, so the
+# directory holds one file per live (process, thread) plus that one.
+#
+# Without METRICS_DIR (flask run, tests) the arrays are anonymous mmaps and the
+# endpoint only sees the current process.
+
+import fcntl
+import glob
+import hashlib
+import mmap
+import os
+import threading
+import time
+import weakref
+
+from flask import Response, g, request
+
+METRICS_DIR = os.getenv("METRICS_DIR")
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METHODS = ("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OTHER")
+STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+UNMATCHED_ROUTE = "<unmatched>"
+
+# Slot offsets within one (route, method) row
+_STATUS = 0
+_BUCKETS = _STATUS + len(STATUS_CLASSES)
+_SUM = _BUCKETS + len(LATENCY_BUCKETS) + 1  # + the +Inf bucket
+_IN_FLIGHT = _SUM + 1
+_ROW = _IN_FLIGHT + 1
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# Every live RequestMetrics, reset after a fork by one hook (a hook per instance
+# would keep each create_app()'s arrays alive for good)
+_instances = weakref.WeakSet()
+
+
+def _after_fork_in_child():
+    for metrics in list(_instances):
+        metrics._after_fork()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+class RequestMetrics:
+    """Per-route request count, in-flight gauge and latency histogram."""
+
+    def __init__(self, directory=METRICS_DIR):
+        self.directory = directory
+        self.routes = {}
+        self.layout = ""
+        self._by_thread = {}  # OS thread id -> values
+        self._anonymous = []  # in-process arrays when there is no directory
+        self._lock = threading.Lock()  # only taken when a thread creates its array
+        _instances.add(self)
+
+    def init_app(self, app, path="/metrics"):
+        """Instrument every request and register the scrape endpoint."""
+        app.add_url_rule(path, "metrics", self.scrape)
+        routes = sorted({rule.rule for rule in app.url_map.iter_rules()}) + [UNMATCHED_ROUTE]
+        self.routes = {route: n for n, route in enumerate(routes)}
+        self.layout = hashlib.sha1("\n".join(routes).encode()).hexdigest()[:12]
+        self._slots = len(routes) * len(METHODS) * _ROW
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    # -- hot path --------------------------------------------------------
+
+    def _values(self):
+        # Keyed by the OS thread, not threading.local: under gevent that is
+        # greenlet-local, but greenlets of one thread never interleave mid-update.
+        thread = threading.get_native_id()
+        values = self._by_thread.get(thread)
+        if values is None:
+            values = self._by_thread[thread] = self._create_values()
+        return values
+
+    def _row(self):
+        rule = request.url_rule
+        route = self.routes.get(rule.rule if rule is not None else UNMATCHED_ROUTE, self.routes[UNMATCHED_ROUTE])
+        method = METHODS.index(request.method) if request.method in METHODS else len(METHODS) - 1
+        return (route * len(METHODS) + method) * _ROW
+
+    def _before_request(self):
+        row = self._row()
+        g._metrics = (row, time.perf_counter())
+        self._values()[row + _IN_FLIGHT] += 1
+
+    def _after_request(self, response):
+        g._metrics_status = response.status_code
+        return response
+
+    def _teardown_request(self, exc):
+        started = g.pop("_metrics", None)
+        if started is None:
+            return
+        row, began = started
+        elapsed = time.perf_counter() - began
+        status = g.pop("_metrics_status", 500)
+        values = self._values()
+        values[row + _IN_FLIGHT] -= 1
+        values[row + _STATUS + min(max(status // 100, 1), 5) - 1] += 1
+        bucket = 0
+        for bound in LATENCY_BUCKETS:
+            if elapsed <= bound:
+                break
+            bucket += 1
+        values[row + _BUCKETS + bucket] += 1
+        values[row + _SUM] += elapsed
+
+    # -- storage ---------------------------------------------------------
+
+    def _create_values(self):
+        size = self._slots * 8
+        with self._lock:
+            if self.directory:
+                index = len(glob.glob(os.path.join(self.directory, f"{self.layout}_{os.getpid()}_*.db")))
+                path = os.path.join(self.directory, f"{self.layout}_{os.getpid()}_{index}.db")
+                fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o600)
+                try:
+                    os.ftruncate(fd, size)
+                    buffer = mmap.mmap(fd, size)
+                finally:
+                    os.close(fd)
+            else:
+                buffer = mmap.mmap(-1, size)
+                self._anonymous.append(buffer)
+        return memoryview(buffer).cast("d")
+
+    def _after_fork(self):
+        # Arrays created before the fork belong to the parent
+        self._by_thread = {}
+        self._anonymous = []
+        self._lock = threading.Lock()
+
+    def _arrays(self):
+        """(alive, values) for every array of this layout, folding in exited workers."""
+        if not self.directory:
+            return [(True, memoryview(buffer).cast("d")) for buffer in list(self._anonymous)]
+        size = self._slots * 8
+        fd = os.open(os.path.join(self.directory, f"{self.layout}_retired.db"), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # Held while reading too: a concurrent scrape must not see a dead
+            # worker's counts both in the retired file and in its own file.
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, size)
+            with mmap.mmap(fd, size) as buffer, memoryview(buffer).cast("d") as retired:
+                arrays = []
+                for path in glob.glob(os.path.join(self.directory, f"{self.layout}_*_*.db")):
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    if len(data) != size:
+                        continue
+                    values = memoryview(data).cast("d")
+                    if _pid_alive(int(path.rsplit("_", 2)[1])):
+                        arrays.append((True, values))
+                        continue
+                    for slot, value in enumerate(values):
+                        # A worker that died mid-request can't decrement its in-flight count
+                        if value and slot % _ROW != _IN_FLIGHT:
+                            retired[slot] += value
+                    os.unlink(path)
+                arrays.append((False, memoryview(retired.tobytes()).cast("d")))
+        finally:
+            os.close(fd)
+        return arrays
+
+    # -- exposition ------------------------------------------------------
+
+    def collect(self):
+        """Merged slot totals across all processes and threads."""
+        totals = [0.0] * self._slots
+        for alive, values in self._arrays():
+            for slot, value in enumerate(values):
+                if value and (alive or slot % _ROW != _IN_FLIGHT):
+                    totals[slot] += value
+        return totals
+
+    def render(self):
+        totals = self.collect()
+        requests = ["# HELP http_requests_total Requests handled, by route, method and status class.",
+                    "# TYPE http_requests_total counter"]
+        in_flight = ["# HELP http_requests_in_flight Requests currently being handled.",
+                     "# TYPE http_requests_in_flight gauge"]
+        latency = ["# HELP http_request_duration_seconds Request latency, by route and method.",
+                   "# TYPE http_request_duration_seconds histogram"]
+        for route, r in self.routes.items():
+            for m, method in enumerate(METHODS):
+                row = (r * len(METHODS) + m) * _ROW
+                count = sum(totals[row + _BUCKETS:row + _SUM])
+                if not count and not totals[row + _IN_FLIGHT]:
+                    continue
+                labels = f'route="{_escape(route)}",method="{method}"'
+                for s, status in enumerate(STATUS_CLASSES):
+                    if totals[row + _STATUS + s]:
+                        requests.append(f'http_requests_total{{{labels},status="{status}"}} {totals[row + _STATUS + s]:g}')
+                in_flight.append(f"http_requests_in_flight{{{labels}}} {totals[row + _IN_FLIGHT]:g}")
+                cumulative = 0.0
+                for b, bound in enumerate(LATENCY_BUCKETS + ("+Inf",)):
+                    cumulative += totals[row + _BUCKETS + b]
+                    latency.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative:g}')
+                latency.append(f"http_request_duration_seconds_sum{{{labels}}} {totals[row + _SUM]!r}")
+                latency.append(f"http_request_duration_seconds_count{{{labels}}} {count:g}")
+        return "\n".join(requests + in_flight + latency) + "\n"
+
+    def scrape(self):
+        return Response(self.render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,21 @@
+# Table definitions mirroring the migration schema in
+# 04-aurora-zero-downtime-migration/sql/baseline/001_create_schema.sql.
+# SQLAlchemy Core tables (no ORM): the API streams plain rows.
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func
+
+metadata = MetaData()
+
+students = Table(
+    "students",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("name", String(255), nullable=False),
+    Column("grade_level", Integer, nullable=False),
+    Column("created_at", DateTime, server_default=func.current_timestamp()),
+)
+
+
+def create_schema(engine):
+    """Create the tables locally (SQLite / MySQL stand-in); Aurora uses the SQL migrations."""
+    metadata.create_all(engine)
@@ -0,0 +1,105 @@
+# In-process cache for responses that only change per deploy.
+# Bodies are rendered once per worker, hashed into a strong ETag and compressed
+# once (gzip, plus brotli when the package is installed), so repeat requests
+# cost a dict lookup instead of a Jinja render or a syscall.
+
+import hashlib
+import threading
+
+from flask import Response, request
+from werkzeug.http import parse_accept_header, parse_etags
+
+# Compressing tiny bodies (e.g. the /api/hello JSON) costs more than it saves.
+COMPRESS_MIN_BYTES = 256
+# Bound on memoised Accept-Encoding values per entry, so odd clients can't grow it.
+MAX_ACCEPT_ENCODING_VARIANTS = 64
+
+
+_brotli = None
+
+
+def _compressors():
+    """gzip and (when installed) brotli, imported on first use to keep them off the startup path."""
+    global _brotli
+    import gzip
+
+    if _brotli is None:
+        try:
+            import brotli as _brotli
+        except ImportError:  # optional: gzip only
+            _brotli = False
+    return gzip, _brotli or None
+
+
+class CachedBody:
+    """A rendered body with its strong ETag and precompressed variants."""
+
+    def __init__(self, body, mimetype):
+        self.mimetype = mimetype
+        # Raw Accept-Encoding header -> chosen encoding; browsers send a handful of
+        # distinct values, so parsing each one once keeps the hot path to a dict hit.
+        self._encoding_for = {}
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        # Each encoding is a distinct representation, so each gets its own strong ETag.
+        self.variants = {"identity": (body, f'"{digest}"')}
+        if len(body) >= COMPRESS_MIN_BYTES:
+            gzip, brotli = _compressors()
+            self.variants["gzip"] = (gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gz"')
+            if brotli is not None:
+                self.variants["br"] = (brotli.compress(body, quality=11), f'"{digest}-br"')
+
+    def select(self, accept_encoding):
+        """Pick the smallest encoding the client accepts (identity is always acceptable)."""
+        encoding = self._encoding_for.get(accept_encoding)
+        if encoding is None:
+            offered = [e for e in ("br", "gzip") if e in self.variants]
+            best = parse_accept_header(accept_encoding).best_match(offered) if offered else None
+            encoding = best or "identity"
+            if len(self._encoding_for) < MAX_ACCEPT_ENCODING_VARIANTS:
+                self._encoding_for[accept_encoding] = encoding
+        return encoding
+
+
+class ResponseCache:
+    """Thread-safe map of cache key -> CachedBody, built on first request."""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, build):
+        entry = self._entries.get(key)
+        if entry is None:
+            body, mimetype = build()
+            entry = CachedBody(body, mimetype)
+            with self._lock:
+                entry = self._entries.setdefault(key, entry)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    # Fast path: browsers echo back exactly the ETag they were given
+    if if_none_match == etag:
+        return True
+    etags = parse_etags(if_none_match)
+    return etags.star_tag or etags.contains_weak(etag.strip('"'))
+
+
+def cached_response(entry):
+    """Serve a CachedBody for the current request, honouring If-None-Match and Accept-Encoding."""
+    encoding = entry.select(request.headers.get("Accept-Encoding", ""))
+    body, etag = entry.variants[encoding]
+    headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+
+    if _etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status=304, headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(body, mimetype=entry.mimetype, headers=headers)
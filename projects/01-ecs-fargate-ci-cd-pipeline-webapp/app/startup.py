@@ -0,0 +1,50 @@
+# Startup timeline for cold starts: interpreter start -> imports done -> app
+# ready -> (worker forked) -> first response, logged once per process when the
+# first response goes out. During scale-out this is what decides how fast a new
+# task takes load off the saturated ones.
+
+import json
+import os
+import time
+
+
+def _interpreter_start():
+    """Wall-clock time this process started, from /proc (Linux), else None."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22 (starttime, in clock ticks since boot); the command name
+            # in field 2 may contain spaces, so split after its closing paren.
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return time.time() - uptime + start_ticks / os.sysconf("SC_CLK_TCK")
+
+
+class StartupTimeline:
+    """Named wall-clock marks, reported in ms since the interpreter started."""
+
+    def __init__(self):
+        self.marks = {}
+        started = _interpreter_start()
+        if started is not None:
+            self.marks["interpreter_start"] = started
+        self.logged = False
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def mark(self, name):
+        self.marks.setdefault(name, time.time())
+
+    def _after_fork(self):
+        # gunicorn preload: everything up to app_ready happened in the master
+        self.mark("worker_fork")
+
+    def elapsed_ms(self):
+        origin = min(self.marks.values())
+        return {name: round((at - origin) * 1000, 1) for name, at in sorted(self.marks.items(), key=lambda m: m[1])}
+
+    def log_once(self, logger):
+        if not self.logged:
+            self.logged = True
+            logger.info("startup timeline (ms): %s", json.dumps(self.elapsed_ms()))
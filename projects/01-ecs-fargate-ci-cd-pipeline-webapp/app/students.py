@@ -0,0 +1,94 @@
+# Students API over the migration schema (devops_raf_demo.students).
+# Pages use keyset pagination on the primary key (WHERE id > :after ORDER BY id
+# LIMIT n), so page 10 000 costs the same index range scan as page 1 where
+# OFFSET would read and discard every earlier row. Rows are fetched with a
+# server-side cursor and streamed out in batches, so a 1000-row page never sits
+# in memory as one big list or JSON string.
+
+import json
+
+from flask import Blueprint, Response, current_app, jsonify, request
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Rows pulled from the cursor and written to the socket per chunk
+STREAM_BATCH = 200
+
+bp = Blueprint("students", __name__)
+
+
+def _int_arg(name, default, minimum, maximum=None):
+    value = request.args.get(name, default)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer")
+    if value < minimum or (maximum is not None and value > maximum):
+        raise ValueError(f"{name} must be between {minimum} and {maximum}" if maximum else f"{name} must be >= {minimum}")
+    return value
+
+
+def _row_json(row):
+    created_at = row.created_at.isoformat() if row.created_at is not None else None
+    return json.dumps(
+        {"id": row.id, "name": row.name, "grade_level": row.grade_level, "created_at": created_at},
+        separators=(",", ":"),
+    )
+
+
+def _stream_page(conn, result, limit):
+    try:
+        yield '{"students":['
+        count, last_id = 0, None
+        for rows in result.partitions(STREAM_BATCH):
+            chunk = ",".join(_row_json(row) for row in rows)
+            yield ("," if count else "") + chunk
+            count += len(rows)
+            last_id = rows[-1].id
+        # A full page may have more rows after it; a short page is the last one
+        yield '],"count":%d,"next_after":%s}' % (count, json.dumps(last_id if count == limit else None))
+    finally:
+        result.close()
+        conn.close()
+
+
+@bp.route("/api/students")
+def list_students():
+    database = current_app.extensions.get("database")
+    if database is None:
+        return jsonify(error="database not configured"), 503
+    try:
+        limit = _int_arg("limit", DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+        after = _int_arg("after", 0, 0)
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+    # Reads go to the reader endpoint; ?consistency=strong reads the writer
+    # (e.g. right after an insert, before the reader has caught up).
+    readonly = request.args.get("consistency") != "strong"
+
+    from sqlalchemy import exc, select
+
+    from models import students
+
+    query = (
+        select(students.c.id, students.c.name, students.c.grade_level, students.c.created_at)
+        .where(students.c.id > after)
+        .order_by(students.c.id)
+        .limit(limit)
+    )
+    # Check out the connection and run the query before the 200 goes out, so an
+    # exhausted pool or a down database is still a clean 503.
+    try:
+        conn = database.connect(readonly)
+    except exc.TimeoutError:
+        return jsonify(error="database busy"), 503, {"Retry-After": "1"}
+    except exc.DBAPIError:
+        current_app.logger.exception("database unavailable")
+        return jsonify(error="database unavailable"), 503
+    try:
+        result = conn.execution_options(stream_results=True, yield_per=STREAM_BATCH).execute(query)
+    except exc.DBAPIError:
+        conn.close()
+        current_app.logger.exception("students query failed")
+        return jsonify(error="database unavailable"), 503
+    return Response(_stream_page(conn, result, limit), mimetype="application/json")
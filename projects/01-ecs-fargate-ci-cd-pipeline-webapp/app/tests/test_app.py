@@ -1,6 +1,12 @@
 # Pytest is a lightweight testing framework that lets you verify your Flask app's routes and responses automatically.
 # Think of it as Postman for developers — but fully automated and CI/CD-friendly.
 
+import json
+import os
+import runpy
+import subprocess
+import sys
+
 import pytest
 from app import app
 
@@ -20,6 +26,208 @@ def test_health(client):
     assert rv.status_code == 200
     assert rv.json == {"status": "ok"}
 
+def test_api_hello(client):
+    rv = client.get("/api/hello")
+    assert rv.status_code == 200
+    assert "ECS Fargate" in rv.json["message"]
+
+def test_home_etag_revalidation(client):
+    rv = client.get("/")
+    etag = rv.headers["ETag"]
+    assert rv.headers["Vary"] == "Accept-Encoding"
+
+    rv = client.get("/", headers={"If-None-Match": etag})
+    assert rv.status_code == 304
+    assert rv.data == b""
+
+def test_home_precompressed(client):
+    import gzip
+
+    plain = client.get("/").data
+    rv = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert rv.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(rv.data) == plain
+    assert rv.headers["ETag"] != client.get("/").headers["ETag"]
+
+def _profile(monkeypatch, tmp_path, files, **env):
+    for name, value in files.items():
+        (tmp_path / name).write_text(value)
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+    config = runpy.run_path(os.path.join(os.path.dirname(__file__), "..", "gunicorn.conf.py"))
+    cpus = config["cgroup_cpus"](str(tmp_path))
+    return config, config["size_workers"](cpus, config["cgroup_memory_mb"](str(tmp_path)), config["worker_class"])
+
+def test_gunicorn_profile_sizes_from_cgroup(monkeypatch, tmp_path):
+    # Fargate 0.25 vCPU / 512 MiB task on cgroup v2
+    files = {"cpu.max": "25000 100000", "memory.max": str(512 * 1024 * 1024)}
+    config, sized = _profile(monkeypatch, tmp_path, files)
+    assert config["worker_class"] == "gthread"
+    assert sized == (2, 4)
+    assert config["preload_app"] is True
+    assert config["keepalive"] > config["ALB_IDLE_TIMEOUT"]
+
+    config, sized = _profile(monkeypatch, tmp_path, {"cpu.max": "200000 100000"}, GUNICORN_WORKER_CLASS="gevent")
+    assert sized == (2, 1)
+    assert config["preload_app"] is False  # workers monkey-patch after the fork
+    config, _ = _profile(monkeypatch, tmp_path, {}, GUNICORN_WORKER_CLASS="eventlet", GUNICORN_PRELOAD="1")
+    assert config["preload_app"] is True
+
+def test_gunicorn_profile_memory_caps_workers(monkeypatch, tmp_path):
+    files = {"cpu.max": "max 100000", "memory.max": str(128 * 1024 * 1024)}
+    monkeypatch.setattr("os.sched_getaffinity", lambda pid: set(range(8)))
+    _, sized = _profile(monkeypatch, tmp_path, files, GUNICORN_WORKER_CLASS="sync")
+    assert sized == (1, 1)
+
+def test_health_deep_mode_serves_cached_status(client):
+    from health_check import HealthCheckMiddleware
+    calls = []
+    def database():
+        calls.append(1)
+        raise ConnectionError("down")
+    health = HealthCheckMiddleware(app.wsgi_app, mode="deep")
+    health.register("database", database)
+    health._refresher_pid = os.getpid()  # refresh by hand below
+
+    environ = {"PATH_INFO": "/health", "REQUEST_METHOD": "GET"}
+    statuses = []
+    start_response = lambda status, headers: statuses.append(status)
+    assert health(environ, start_response) == [b'{"status":"stale"}']
+
+    health.refresh()
+    body = health(environ, start_response)
+    health(environ, start_response)
+    assert statuses[-1].startswith("503")
+    assert b'"database":"fail: ConnectionError"' in body[0]
+    assert len(calls) == 1  # probes read the cached result
+
+def test_metrics_endpoint(client):
+    client.get("/api/hello")
+    client.get("/does-not-exist")
+    body = client.get("/metrics").get_data(as_text=True)
+    assert 'http_requests_total{route="/api/hello",method="GET",status="2xx"}' in body
+    assert 'http_requests_total{route="<unmatched>",method="GET",status="4xx"}' in body
+    assert 'http_request_duration_seconds_bucket{route="/api/hello",method="GET",le="+Inf"}' in body
+
+def test_metrics_merge_across_worker_processes(tmp_path):
+    from flask import Flask
+    from metrics import RequestMetrics
+    worker_app = Flask("worker")
+    worker_app.add_url_rule("/", "index", lambda: "ok")
+    metrics = RequestMetrics(directory=str(tmp_path))
+    metrics.init_app(worker_app)
+
+    # A forked "worker" serves two requests and exits; this process serves one
+    pid = os.fork()
+    if pid == 0:
+        with worker_app.test_client() as child:
+            child.get("/")
+            child.get("/")
+        os._exit(0)
+    os.waitpid(pid, 0)
+    worker_app.test_client().get("/")
+
+    assert len(list(tmp_path.glob("*.db"))) == 2
+    body = metrics.render()
+    assert 'http_requests_total{route="/",method="GET",status="2xx"} 3' in body
+    assert 'http_requests_in_flight{route="/",method="GET"} 0' in body
+
+    # The exited worker's array was folded into the retired file, counted once
+    names = sorted(path.name.split("_", 1)[1] for path in tmp_path.glob("*.db"))
+    assert names == [f"{os.getpid()}_0.db", "retired.db"]
+    assert metrics.render() == body
+
+def test_create_app_factory_is_independent():
+    from app import create_app
+    other = create_app({"TESTING": True})
+    assert other is not app
+    assert other.extensions["response_cache"] is not app.extensions["response_cache"]
+    assert other.test_client().get("/api/hello").status_code == 200
+
+def test_startup_budget():
+    # Cold process: interpreter start -> first response must stay within budget
+    budget_ms = float(os.getenv("STARTUP_BUDGET_MS", "1500"))
+    script = (
+        "import json, app; app.app.test_client().get('/');"
+        "print(json.dumps(app.STARTUP.elapsed_ms()))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", script], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True, text=True, check=True,
+    ).stdout
+    timeline = json.loads(out.strip().splitlines()[-1])
+    assert list(timeline)[-3:] == ["imports_done", "app_ready", "first_response"]
+    assert timeline["first_response"] <= budget_ms, timeline
+
+def _students_db(path, count):
+    from sqlalchemy import create_engine, insert
+    from models import create_schema, students
+    engine = create_engine(f"sqlite:///{path}")
+    create_schema(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(students), [{"name": f"student {n}", "grade_level": n % 12 + 1} for n in range(count)])
+    engine.dispose()
+    return f"sqlite:///{path}"
+
+def test_students_keyset_pagination(tmp_path):
+    from app import create_app
+    students_app = create_app({"DATABASE_URL": _students_db(tmp_path / "students.db", 250)})
+    client = students_app.test_client()
+
+    seen, after = [], 0
+    while after is not None:
+        page = client.get(f"/api/students?limit=100&after={after}").json
+        seen += [row["id"] for row in page["students"]]
+        after = page["next_after"]
+    assert seen == list(range(1, 251))
+    assert page["count"] == 50
+    assert students_app.extensions["database"].engine().pool.checkedout() == 0
+
+    assert client.get("/api/students?limit=0").status_code == 400
+    assert client.get("/api/students?after=abc").status_code == 400
+
+def test_students_reads_route_to_reader(tmp_path):
+    from app import create_app
+    students_app = create_app({
+        "DATABASE_URL": _students_db(tmp_path / "writer.db", 3),
+        "DATABASE_READER_URL": _students_db(tmp_path / "reader.db", 2),
+    })
+    client = students_app.test_client()
+    assert client.get("/api/students").json["count"] == 2
+    assert client.get("/api/students?consistency=strong").json["count"] == 3
+
+def test_students_pool_is_bounded(tmp_path):
+    from app import create_app
+    students_app = create_app({"DATABASE_URL": _students_db(tmp_path / "students.db", 1)})
+    db = students_app.extensions["database"]
+    db.pool_size, db.pool_timeout = 1, 0.05
+    with db.connect():
+        rv = students_app.test_client().get("/api/students")
+    assert rv.status_code == 503
+    assert rv.headers["Retry-After"] == "1"
+
+def test_students_without_database(client):
+    assert client.get("/api/students").status_code == 503
+
+def test_database_engines_reset_in_forked_child(tmp_path):
+    import gc
+    import weakref
+    from database import Database
+    db = Database(_students_db(tmp_path / "students.db", 1))
+    db.engine()
+
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0 if not db._engines else 1)
+    assert os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]) == 0
+    assert db._engines  # the parent keeps its pool
+
+    # No fork hook holds on to the instance's engines
+    ref = weakref.ref(db.engine())
+    del db
+    gc.collect()
+    assert ref() is None
+
 
 # To run the tests locally, use the following command:
 # pip install -r requirements.txt pytest
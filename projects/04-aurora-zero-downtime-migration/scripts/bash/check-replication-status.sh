@@ -1,3 +1,46 @@
 #!/usr/bin/env bash
-# Placeholder for checking replication state between RDS and Aurora
-echo 'Check replication status between RDS and Aurora here.'
\ No newline at end of file
+# Measure RDS -> Aurora replication lag with a heartbeat row.
+# Writes a sequence number to devops_raf_demo.migration_heartbeat on the source
+# and times how long it takes to show up on the target (same table as
+# python/replication_lag.py). Password is read from MYSQL_PWD.
+#
+# Usage: ./check-replication-status.sh <source-host> <target-host> [samples] [max-lag-ms]
+set -euo pipefail
+
+SOURCE_HOST="${1:?source host required}"
+TARGET_HOST="${2:?target host required}"
+SAMPLES="${3:-10}"
+MAX_LAG_MS="${4:-1000}"
+DB_USER="${DB_USER:-admin}"
+DB_NAME="${DB_NAME:-devops_raf_demo}"
+SOURCE_ID="bash-$(hostname | cut -c1-58)"
+
+sql() { mysql -h "$1" -u "$DB_USER" -D "$DB_NAME" -N -B -e "$2"; }
+now_us() { echo $(( $(date +%s%N) / 1000 )); }
+
+sql "$SOURCE_HOST" "CREATE TABLE IF NOT EXISTS migration_heartbeat (
+  source_id VARCHAR(64) NOT NULL PRIMARY KEY, seq BIGINT NOT NULL, written_us BIGINT NOT NULL)"
+
+worst=0
+for ((i = 1; i <= SAMPLES; i++)); do
+  seq=$(now_us)
+  sql "$SOURCE_HOST" "REPLACE INTO migration_heartbeat VALUES ('$SOURCE_ID', $seq, $seq)"
+  deadline=$(( $(now_us) + 30000000 ))
+  until [[ "$(sql "$TARGET_HOST" "SELECT seq FROM migration_heartbeat WHERE source_id = '$SOURCE_ID'" 2>/dev/null || true)" == "$seq" ]]; do
+    if (( $(now_us) > deadline )); then
+      echo "❌ Heartbeat $i not replicated within 30s" >&2
+      exit 1
+    fi
+    sleep 0.05
+  done
+  lag_ms=$(( ($(now_us) - seq) / 1000 ))
+  (( lag_ms > worst )) && worst=$lag_ms
+  echo "  sample $i: ${lag_ms} ms"
+  sleep 0.5
+done
+
+if (( worst > MAX_LAG_MS )); then
+  echo "❌ Replication lag ${worst} ms above ${MAX_LAG_MS} ms" >&2
+  exit 1
+fi
+echo "✓ Replication lag within ${MAX_LAG_MS} ms (worst ${worst} ms)"
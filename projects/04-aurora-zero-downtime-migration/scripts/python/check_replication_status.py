@@ -2,45 +2,192 @@
 """
 Check replication status between RDS and Aurora.
 
-This script verifies the replication state between the source RDS MySQL instance
-and the target Aurora MySQL cluster to ensure data consistency before cutover.
+This script measures the real end-to-end replication lag between the source RDS
+MySQL instance and the target Aurora MySQL cluster: a heartbeat row is written
+to the source on a fixed cadence and polled on the target (see
+replication_lag.py). The check passes when the p99 lag over the sampling window
+is within --max-lag-ms. With --check-tables, the listed tables are then compared
+row for row with chunked checksums (see consistency_check.py).
+
+Endpoints are looked up from the instance/cluster identifiers, or given directly
+as URLs (e.g. sqlite:///tmp/source.db for local stand-ins).
+
+Fleet mode (--manifest) checks every pair of a migration wave concurrently:
+endpoints for all pairs are resolved with one describe per region, pairs run
+on a bounded worker pool, a line is printed as each one finishes, and the run
+ends with an aggregated table and an optional JSON report. The exit code is 0
+only if every pair passed. A manifest looks like:
+
+    {
+      "defaults": {"region": "us-east-1", "max_lag_ms": 1000, "check_tables": ["students"]},
+      "pairs": [
+        {"name": "sis", "rds_instance_id": "sis-rds", "aurora_cluster_id": "sis-aurora"},
+        {"name": "lms", "rds_instance_id": "lms-rds", "aurora_cluster_id": "lms-aurora", "region": "us-west-2"}
+      ]
+    }
 """
 
 import sys
 import argparse
-import boto3
-from botocore.exceptions import ClientError
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from consistency_check import DEFAULT_RECHECK_DELAY, check_consistency, print_report  # noqa: E402
+from db import connect, mysql_url  # noqa: E402
+from replication_lag import HeartbeatLagMonitor, serve_metrics  # noqa: E402
+from utils import create_rds_client, print_call_summary, reset_call_stats  # noqa: E402
+
+
+def resolve_endpoints(
+    rds_instance_id: str,
+    aurora_cluster_id: str,
+    db_user: str,
+    db_name: str,
+    region: str = "us-east-1"
+) -> Tuple[str, str]:
+    """
+    Build source/target database URLs from the RDS instance and Aurora cluster.
+
+    Args:
+        rds_instance_id: The RDS instance identifier
+        aurora_cluster_id: The Aurora cluster identifier
+        db_user: Database user (password is read from DB_PASSWORD)
+        db_name: Database (schema) name
+        region: AWS region
+
+    Returns:
+        (source_url, target_url)
+    """
+    rds_client = create_rds_client(region)
+    instance = rds_client.describe_db_instances(DBInstanceIdentifier=rds_instance_id)['DBInstances'][0]
+    cluster = rds_client.describe_db_clusters(DBClusterIdentifier=aurora_cluster_id)['DBClusters'][0]
+    source = mysql_url(instance['Endpoint']['Address'], db_user, db_name, instance['Endpoint'].get('Port', 3306))
+    target = mysql_url(cluster['Endpoint'], db_user, db_name, cluster.get('Port', 3306))
+    return source, target
+
+
+def measure_replication_lag(
+    source_url: str,
+    target_url: str,
+    duration: float = 10.0,
+    interval: float = 0.5,
+    metrics_port: Optional[int] = None
+) -> dict:
+    """
+    Sample heartbeat lag for `duration` seconds.
 
+    Args:
+        source_url: Source database URL
+        target_url: Target database URL
+        duration: Seconds to sample
+        interval: Seconds between heartbeats
+        metrics_port: Serve the lag series on this port for Prometheus (optional)
 
-def check_replication_status(rds_instance_id: str, aurora_cluster_id: str, region: str = "us-east-1") -> bool:
+    Returns:
+        Lag statistics in milliseconds (see HeartbeatLagMonitor.stats)
+    """
+    with connect(source_url) as source, connect(target_url) as target:
+        monitor = HeartbeatLagMonitor(source, target, interval=interval)
+        server = serve_metrics(monitor, metrics_port) if metrics_port else None
+        monitor.start()
+        try:
+            time.sleep(duration)
+        finally:
+            monitor.stop()
+            if server:
+                server.shutdown()
+        return monitor.stats()
+
+
+def lag_within_budget(stats: Dict, max_lag_ms: float) -> bool:
+    """The lag check's pass rule: p99 and current lag both within budget."""
+    return stats["p99_ms"] <= max_lag_ms and stats["current_ms"] <= max_lag_ms
+
+
+def check_replication_status(
+    rds_instance_id: str,
+    aurora_cluster_id: str,
+    region: str = "us-east-1",
+    source_url: Optional[str] = None,
+    target_url: Optional[str] = None,
+    db_user: str = "admin",
+    db_name: str = "devops_raf_demo",
+    duration: float = 10.0,
+    interval: float = 0.5,
+    max_lag_ms: float = 1000.0,
+    metrics_port: Optional[int] = None,
+    check_tables: Optional[Sequence[str]] = None,
+    concurrency: int = 4
+) -> bool:
     """
     Check replication status between RDS and Aurora.
-    
+
     Args:
         rds_instance_id: The RDS instance identifier
         aurora_cluster_id: The Aurora cluster identifier
         region: AWS region
+        source_url: Source database URL (default: resolved from rds_instance_id)
+        target_url: Target database URL (default: resolved from aurora_cluster_id)
+        db_user: Database user for resolved endpoints
+        db_name: Database name for resolved endpoints
+        duration: Seconds to sample lag
+        interval: Seconds between heartbeats
+        max_lag_ms: Highest acceptable p99 lag
+        metrics_port: Serve the lag series for Prometheus while sampling (optional)
+        check_tables: Tables to compare with chunked checksums once lag is in budget
+        concurrency: Parallel checksum workers for the table comparison
+
+    Returns:
+        True if replication is flowing within the lag budget (and the checked
+        tables match), False otherwise
     """
     try:
-        rds_client = boto3.client('rds', region_name=region)
-        
         print(f"Checking replication status between RDS ({rds_instance_id}) and Aurora ({aurora_cluster_id})...")
-        
-        # Placeholder for actual replication status check
-        # In a real implementation, this would:
-        # 1. Check binlog replication lag
-        # 2. Verify replication threads are running
-        # 3. Check for any replication errors
-        # 4. Validate data consistency
-        
-        print("✓ Replication status check placeholder")
-        print("  - Verify binlog replication lag is minimal")
-        print("  - Confirm replication threads are active")
-        print("  - Check for replication errors")
-        print("  - Validate data consistency")
-        
+
+        if not (source_url and target_url):
+            resolved_source, resolved_target = resolve_endpoints(
+                rds_instance_id, aurora_cluster_id, db_user, db_name, region
+            )
+            source_url = source_url or resolved_source
+            target_url = target_url or resolved_target
+
+        print(f"  Sampling heartbeat lag for {duration:g}s (every {interval:g}s)...")
+        stats = measure_replication_lag(source_url, target_url, duration, interval, metrics_port)
+
+        if not stats["samples"]:
+            print(f"❌ No heartbeat reached the target (current lag {stats['current_ms']} ms)", file=sys.stderr)
+            return False
+
+        print(f"  Samples: {stats['samples']}  errors: {stats['errors']}")
+        print(
+            f"  Lag ms: current {stats['current_ms']}  p50 {stats['p50_ms']}  "
+            f"p95 {stats['p95_ms']}  p99 {stats['p99_ms']}  max {stats['max_ms']}"
+        )
+        if not lag_within_budget(stats, max_lag_ms):
+            print(f"❌ Replication lag above {max_lag_ms:g} ms", file=sys.stderr)
+            return False
+
+        print(f"✓ Replication lag within {max_lag_ms:g} ms")
+
+        if check_tables:
+            print(f"  Comparing {', '.join(check_tables)} with chunked checksums...")
+            reports = check_consistency(source_url, target_url, check_tables, concurrency=concurrency)
+            print_report(reports)
+            if not all(report.consistent for report in reports):
+                print("❌ Source and target data differ", file=sys.stderr)
+                return False
+            print("✓ Data consistent")
+
         return True
-        
+
     except ClientError as e:
         print(f"Error checking replication status: {e}", file=sys.stderr)
         return False
@@ -49,37 +196,367 @@ def check_replication_status(rds_instance_id: str, aurora_cluster_id: str, regio
         return False
 
 
+# -- fleet mode -------------------------------------------------------------
+
+# Per-pair settings a manifest may give (in "defaults" or on each pair)
+PAIR_KEYS = {
+    "name", "rds_instance_id", "aurora_cluster_id", "region", "source_url", "target_url", "db_user",
+    "db_name", "duration", "interval", "max_lag_ms", "check_tables", "concurrency", "recheck_delay",
+}
+
+
+@dataclass
+class PairResult:
+    """Outcome of one RDS -> Aurora pair in a fleet check."""
+
+    name: str
+    rds_instance_id: str
+    aurora_cluster_id: str
+    region: str
+    status: str = "error"  # pass | lag | no-heartbeat | inconsistent | error
+    lag: Optional[Dict] = None
+    consistency: Optional[List[Dict]] = None
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "pass"
+
+
+def load_manifest(path: str, **defaults) -> List[Dict]:
+    """
+    Read a fleet manifest: {"defaults": {...}, "pairs": [{...}, ...]} or a bare list of pairs.
+
+    Each pair needs rds_instance_id and aurora_cluster_id; any other PAIR_KEYS
+    setting overrides the manifest defaults, which override `defaults`.
+
+    Raises:
+        ValueError: On a missing identifier, an unknown key or a duplicate name
+    """
+    manifest = json.loads(Path(path).read_text())
+    if isinstance(manifest, list):
+        manifest = {"pairs": manifest}
+    base = dict(defaults, **manifest.get("defaults", {}))
+    pairs, names = [], set()
+    for entry in manifest["pairs"]:
+        pair = dict(base, **entry)
+        unknown = set(pair) - PAIR_KEYS
+        if unknown:
+            raise ValueError(f"Unknown manifest keys: {', '.join(sorted(unknown))}")
+        if not (pair.get("rds_instance_id") and pair.get("aurora_cluster_id")):
+            raise ValueError(f"Manifest pair needs rds_instance_id and aurora_cluster_id: {entry}")
+        pair.setdefault("name", pair["rds_instance_id"])
+        if pair["name"] in names:
+            raise ValueError(f"Duplicate pair name in manifest: {pair['name']}")
+        names.add(pair["name"])
+        if isinstance(pair.get("check_tables"), str):
+            pair["check_tables"] = [t.strip() for t in pair["check_tables"].split(",") if t.strip()]
+        pairs.append(pair)
+    return pairs
+
+
+def _describe_all(rds_client, operation: str, key: str) -> List[Dict]:
+    items, marker = [], None
+    while True:
+        page = getattr(rds_client, operation)(**({"Marker": marker} if marker else {}))
+        items.extend(page[key])
+        marker = page.get("Marker")
+        if not marker:
+            return items
+
+
+def resolve_fleet_endpoints(pairs: Sequence[Dict]) -> None:
+    """
+    Fill in source_url/target_url for every pair that lacks them.
+
+    One paginated describe of all instances and all clusters per region
+    replaces two describe calls per pair, so a wave of dozens of pairs
+    doesn't queue up on the RDS API's rate limit. Pairs whose identifier
+    isn't found get an "error" entry instead.
+    """
+    by_region: Dict[str, List[Dict]] = {}
+    for pair in pairs:
+        if not (pair.get("source_url") and pair.get("target_url")):
+            by_region.setdefault(pair.get("region", "us-east-1"), []).append(pair)
+    for region, region_pairs in by_region.items():
+        rds_client = create_rds_client(region)
+        instances = {
+            i["DBInstanceIdentifier"]: i for i in _describe_all(rds_client, "describe_db_instances", "DBInstances")
+        }
+        clusters = {
+            c["DBClusterIdentifier"]: c for c in _describe_all(rds_client, "describe_db_clusters", "DBClusters")
+        }
+        for pair in region_pairs:
+            instance = instances.get(pair["rds_instance_id"])
+            cluster = clusters.get(pair["aurora_cluster_id"])
+            if instance is None or cluster is None:
+                missing = pair["rds_instance_id"] if instance is None else pair["aurora_cluster_id"]
+                pair["error"] = f"{missing} not found in {region}"
+                continue
+            user, database = pair.get("db_user", "admin"), pair.get("db_name", "devops_raf_demo")
+            pair.setdefault("source_url", mysql_url(
+                instance["Endpoint"]["Address"], user, database, instance["Endpoint"].get("Port", 3306)
+            ))
+            pair.setdefault("target_url", mysql_url(cluster["Endpoint"], user, database, cluster.get("Port", 3306)))
+
+
+def check_pair(pair: Dict) -> PairResult:
+    """
+    Run the lag check (and table comparison) for one manifest pair, without printing.
+
+    Args:
+        pair: Manifest entry with resolved source_url/target_url (see load_manifest)
+
+    Returns:
+        The pair's result; failures are reported in it, never raised
+    """
+    result = PairResult(
+        pair["name"], pair["rds_instance_id"], pair["aurora_cluster_id"], pair.get("region", "us-east-1")
+    )
+    started = time.perf_counter()
+    try:
+        if pair.get("error"):
+            raise ValueError(pair["error"])
+        max_lag_ms = pair.get("max_lag_ms", 1000.0)
+        result.lag = measure_replication_lag(
+            pair["source_url"], pair["target_url"], pair.get("duration", 10.0), pair.get("interval", 0.5)
+        )
+        if not result.lag["samples"]:
+            result.status = "no-heartbeat"
+        elif not lag_within_budget(result.lag, max_lag_ms):
+            result.status = "lag"
+        elif pair.get("check_tables"):
+            reports = check_consistency(
+                pair["source_url"], pair["target_url"], pair["check_tables"], concurrency=pair.get("concurrency", 4),
+                recheck_delay=pair.get("recheck_delay", DEFAULT_RECHECK_DELAY)
+            )
+            result.consistency = [dict(asdict(report), consistent=report.consistent) for report in reports]
+            result.status = "pass" if all(report.consistent for report in reports) else "inconsistent"
+        else:
+            result.status = "pass"
+    except Exception as e:  # one broken pair must not stop the wave
+        result.status = "error"
+        result.error = f"{type(e).__name__}: {e}"
+    result.seconds = round(time.perf_counter() - started, 2)
+    return result
+
+
+def _consistency_summary(result: PairResult) -> str:
+    if result.consistency is None:
+        return "-"
+    differing = [table["table"] for table in result.consistency if not table["consistent"]]
+    return f"differs: {', '.join(differing)}" if differing else f"{len(result.consistency)} tables ok"
+
+
+def _lag_field(result: PairResult, key: str) -> str:
+    value = (result.lag or {}).get(key)
+    return "-" if value is None else str(value)
+
+
+def _result_line(result: PairResult) -> str:
+    mark = "✓" if result.ok else "❌"
+    detail = result.error or _consistency_summary(result)
+    return (
+        f"{mark} {result.name:<20} {result.status:<13} p99 {_lag_field(result, 'p99_ms'):>8}  "
+        f"current {_lag_field(result, 'current_ms'):>8}  {result.seconds:6.1f}s  {detail}"
+    )
+
+
+def check_fleet(
+    pairs: Sequence[Dict],
+    workers: int = 16,
+    report_json: Optional[str] = None
+) -> bool:
+    """
+    Check every pair of a migration wave concurrently.
+
+    Endpoints are resolved up front, one describe per region through the
+    shared clients, then each pair runs on a bounded worker pool. Lag
+    sampling mostly waits, so with enough workers the wave takes about as
+    long as its slowest pair. A line is printed as each pair finishes, then
+    the aggregated table.
+
+    Args:
+        pairs: Manifest entries (see load_manifest)
+        workers: Most pairs checked at the same time
+        report_json: Write the machine-readable wave report to this file (optional)
+
+    Returns:
+        True if every pair passed, False otherwise
+    """
+    started = time.perf_counter()
+    reset_call_stats()
+    print("=" * 60)
+    print(f"Checking {len(pairs)} RDS -> Aurora pairs ({min(workers, len(pairs))} at a time)")
+    print("=" * 60)
+    try:
+        resolve_fleet_endpoints(pairs)
+    except (ClientError, BotoCoreError) as e:
+        for pair in pairs:
+            pair.setdefault("error", f"Could not resolve endpoints: {e}")
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="fleet") as pool:
+        futures = [pool.submit(check_pair, pair) for pair in pairs]
+        for future in as_completed(futures):
+            results.append(future.result())
+            print(_result_line(results[-1]), flush=True)
+
+    seconds = round(time.perf_counter() - started, 2)
+    order = {pair["name"]: index for index, pair in enumerate(pairs)}
+    results.sort(key=lambda result: order[result.name])
+    passed = sum(1 for result in results if result.ok)
+    slowest = max((result.seconds for result in results), default=0.0)
+    print_fleet_table(results)
+    print(f"  {passed}/{len(results)} pairs passed in {seconds:.1f}s (slowest pair {slowest:.1f}s)")
+    print_call_summary()
+
+    if report_json:
+        Path(report_json).write_text(json.dumps({
+            "ok": passed == len(results),
+            "passed": passed,
+            "failed": len(results) - passed,
+            "seconds": seconds,
+            "slowest_pair_seconds": slowest,
+            "pairs": [dict(asdict(result), ok=result.ok) for result in results],
+        }, indent=2))
+    return passed == len(results)
+
+
+def print_fleet_table(results: Sequence[PairResult]) -> None:
+    """Aggregated wave table, in manifest order."""
+    print("=" * 60)
+    print(f"{'pair':<20} {'status':<13} {'p99 ms':>8} {'max ms':>8} {'samples':>7} {'errors':>6}  consistency")
+    for result in results:
+        lag = [_lag_field(result, key) for key in ("p99_ms", "max_ms", "samples", "errors")]
+        print(
+            f"{result.name:<20} {result.status:<13} {lag[0]:>8} {lag[1]:>8} {lag[2]:>7} {lag[3]:>6}  "
+            f"{result.error or _consistency_summary(result)}"
+        )
+    print("=" * 60)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Check replication status between RDS and Aurora"
     )
     parser.add_argument(
         "--rds-instance-id",
-        required=True,
-        help="RDS instance identifier"
+        help="RDS instance identifier (required without --manifest)"
     )
     parser.add_argument(
         "--aurora-cluster-id",
-        required=True,
-        help="Aurora cluster identifier"
+        help="Aurora cluster identifier (required without --manifest)"
+    )
+    parser.add_argument(
+        "--manifest",
+        help="JSON manifest of RDS/Aurora pairs to check concurrently (fleet mode)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=16,
+        help="Pairs checked at the same time in fleet mode (default: 16)"
+    )
+    parser.add_argument(
+        "--report-json",
+        help="Write the fleet report (lag, errors, consistency per pair) to this JSON file"
     )
     parser.add_argument(
         "--region",
         default="us-east-1",
         help="AWS region (default: us-east-1)"
     )
-    
+    parser.add_argument(
+        "--source-url",
+        help="Source database URL (default: RDS instance endpoint)"
+    )
+    parser.add_argument(
+        "--target-url",
+        help="Target database URL (default: Aurora cluster endpoint)"
+    )
+    parser.add_argument(
+        "--db-user",
+        default="admin",
+        help="Database user for resolved endpoints; password from DB_PASSWORD (default: admin)"
+    )
+    parser.add_argument(
+        "--db-name",
+        default="devops_raf_demo",
+        help="Database name (default: devops_raf_demo)"
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=10.0,
+        help="Seconds to sample replication lag (default: 10)"
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.5,
+        help="Seconds between heartbeats (default: 0.5)"
+    )
+    parser.add_argument(
+        "--max-lag-ms",
+        type=float,
+        default=1000.0,
+        help="Highest acceptable p99 lag in milliseconds (default: 1000)"
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="Expose the lag series on this port at /metrics for Prometheus"
+    )
+    parser.add_argument(
+        "--check-tables",
+        help="Comma-separated tables to compare with chunked checksums after the lag check"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Parallel checksum workers for --check-tables (default: 4)"
+    )
+
     args = parser.parse_args()
-    
+    check_tables = [t.strip() for t in args.check_tables.split(",") if t.strip()] if args.check_tables else None
+
+    if args.manifest:
+        # Command-line settings are the defaults for every pair in the manifest
+        try:
+            pairs = load_manifest(
+                args.manifest, region=args.region, db_user=args.db_user, db_name=args.db_name,
+                duration=args.duration, interval=args.interval, max_lag_ms=args.max_lag_ms,
+                check_tables=check_tables, concurrency=args.concurrency
+            )
+        except (OSError, ValueError, KeyError) as e:
+            print(f"❌ Invalid manifest {args.manifest}: {e}", file=sys.stderr)
+            sys.exit(1)
+        sys.exit(0 if check_fleet(pairs, args.workers, args.report_json) else 1)
+
+    if not (args.rds_instance_id and args.aurora_cluster_id):
+        parser.error("--rds-instance-id and --aurora-cluster-id are required without --manifest")
+
     success = check_replication_status(
         args.rds_instance_id,
         args.aurora_cluster_id,
-        args.region
+        args.region,
+        source_url=args.source_url,
+        target_url=args.target_url,
+        db_user=args.db_user,
+        db_name=args.db_name,
+        duration=args.duration,
+        interval=args.interval,
+        max_lag_ms=args.max_lag_ms,
+        metrics_port=args.metrics_port,
+        check_tables=check_tables,
+        concurrency=args.concurrency
     )
-    
+
     sys.exit(0 if success else 1)
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Chunked checksum comparison between the RDS source and the Aurora target.
+
+Each table is walked along its primary key index into ranges of --chunk-size
+existing rows, so sparse or skewed keys never produce empty chunks. For every
+range both sides compute one aggregate row hash (COUNT(*) plus BIT_XOR of CRC32
+over all columns, the pt-table-checksum approach), so only two small result rows
+cross the network per chunk. Chunks run in parallel worker threads, each with
+its own persistent connection per endpoint, capped at --concurrency so the
+primary is never hammered; ranges are submitted as workers free up rather than
+all up front. Matching chunks are done. A mismatching chunk is checked again
+after --recheck-delay, since replication may simply not have applied the latest
+writes yet; if it still differs it is bisected, Merkle style, until the ranges
+are small enough to compare row by row, which yields the exact divergent keys.
+
+Only tables with a single integer primary key are supported.
+"""
+
+import sys
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from db import Connection, connect  # noqa: E402
+
+DEFAULT_CHUNK_SIZE = 10000
+# Seconds before a mismatching chunk is checked again (replication catching up)
+DEFAULT_RECHECK_DELAY = 1.0
+# Ranges at or below this many keys are compared row by row instead of bisected
+ROW_COMPARE_SIZE = 64
+
+
+@dataclass
+class TableReport:
+    table: str
+    rows_checked: int = 0
+    chunks: int = 0
+    mismatched_chunks: int = 0
+    rechecks: int = 0
+    bisections: int = 0
+    elapsed_seconds: float = 0.0
+    rows_per_second: float = 0.0
+    missing_on_target: List[int] = field(default_factory=list)
+    missing_on_source: List[int] = field(default_factory=list)
+    changed: List[int] = field(default_factory=list)
+
+    @property
+    def consistent(self) -> bool:
+        return not (self.missing_on_target or self.missing_on_source or self.changed)
+
+
+class _Endpoints:
+    """One persistent connection per endpoint for each worker thread."""
+
+    def __init__(self, source_url: str, target_url: str):
+        self.urls = (source_url, target_url)
+        self._local = threading.local()
+        self._opened: List[Connection] = []
+        self._lock = threading.Lock()
+
+    def get(self) -> Tuple[Connection, Connection]:
+        conns = getattr(self._local, "conns", None)
+        if conns is None:
+            conns = self._local.conns = tuple(connect(url) for url in self.urls)
+            with self._lock:
+                self._opened.extend(conns)
+        return conns
+
+    def close(self) -> None:
+        for conn in self._opened:
+            conn.close()
+
+
+class ConsistencyChecker:
+    """Compares tables between two endpoints with parallel chunk checksums."""
+
+    def __init__(
+        self,
+        source_url: str,
+        target_url: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        concurrency: int = 4,
+        key: str = "id",
+        recheck_delay: float = DEFAULT_RECHECK_DELAY,
+    ):
+        self.endpoints = _Endpoints(source_url, target_url)
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.key = key
+        self.recheck_delay = recheck_delay
+
+    def _row_hash_sql(self, table: str, columns: Sequence[str]) -> str:
+        # COALESCE keeps NULLs distinguishable (CONCAT_WS would silently skip them)
+        row = ", ".join(f"COALESCE({column}, '\\\\N')" for column in columns)
+        return (
+            f"SELECT COUNT(*), COALESCE(BIT_XOR(CRC32(CONCAT_WS('#', {row}))), 0)"
+            f" FROM {table} WHERE {self.key} >= %s AND {self.key} < %s"
+        )
+
+    def _checksum(self, table: str, columns: Sequence[str], lo: int, hi: int) -> Tuple[Tuple, Tuple]:
+        source, target = self.endpoints.get()
+        sql = self._row_hash_sql(table, columns)
+        source_sum = tuple(int(v) for v in source.query_one(sql, (lo, hi)))
+        target_sum = tuple(int(v) for v in target.query_one(sql, (lo, hi)))
+        return source_sum, target_sum
+
+    def _compare_rows(self, table: str, columns: Sequence[str], lo: int, hi: int) -> Dict[str, List[int]]:
+        source, target = self.endpoints.get()
+        sql = f"SELECT {', '.join(columns)} FROM {table} WHERE {self.key} >= %s AND {self.key} < %s"
+        key_index = list(columns).index(self.key)
+        source_rows = {row[key_index]: row for row in source.query(sql, (lo, hi))}
+        target_rows = {row[key_index]: row for row in target.query(sql, (lo, hi))}
+        return {
+            "missing_on_target": sorted(source_rows.keys() - target_rows.keys()),
+            "missing_on_source": sorted(target_rows.keys() - source_rows.keys()),
+            "changed": sorted(k for k in source_rows.keys() & target_rows.keys() if source_rows[k] != target_rows[k]),
+        }
+
+    def _key_range(self, table: str) -> Optional[Tuple[int, int]]:
+        source, target = self.endpoints.get()
+        bounds = [
+            conn.query_one(f"SELECT MIN({self.key}), MAX({self.key}) FROM {table}") for conn in (source, target)
+        ]
+        lows = [b[0] for b in bounds if b[0] is not None]
+        highs = [b[1] for b in bounds if b[1] is not None]
+        if not lows:
+            return None
+        return min(lows), max(highs) + 1
+
+    def _chunks(self, table: str, lo: int, hi: int) -> Iterator[Tuple[int, int]]:
+        """Yield [lo, hi) ranges of chunk_size existing keys, one index probe per chunk."""
+        source, target = self.endpoints.get()
+        walk = source if source.query_one(f"SELECT {self.key} FROM {table} LIMIT 1") else target
+        sql = f"SELECT {self.key} FROM {table} WHERE {self.key} >= %s ORDER BY {self.key} LIMIT 1 OFFSET %s"
+        start = lo
+        while start < hi:
+            row = walk.query_one(sql, (start, self.chunk_size))
+            end = hi if row is None else row[0]
+            yield start, end
+            start = end
+
+    def check_table(self, table: str) -> TableReport:
+        """Compare one table; returns counts, throughput and the divergent keys."""
+        report = TableReport(table)
+        started = time.perf_counter()
+        source, _ = self.endpoints.get()
+        columns = source.columns(table)
+        if self.key not in columns:
+            raise ValueError(f"{table} has no column {self.key!r}")
+        key_range = self._key_range(table)
+
+        if key_range is not None:
+            chunks = self._chunks(table, *key_range)
+            rechecks: List[Tuple[float, int, int]] = []  # (due, lo, hi); constant delay keeps them in order
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="checksum") as pool:
+                pending = {}  # future -> (lo, hi, stage)
+
+                def submit(fn, chunk_lo, chunk_hi, stage):
+                    pending[pool.submit(fn, table, columns, chunk_lo, chunk_hi)] = (chunk_lo, chunk_hi, stage)
+
+                while True:
+                    while rechecks and rechecks[0][0] <= time.monotonic():
+                        _, chunk_lo, chunk_hi = rechecks.pop(0)
+                        submit(self._checksum, chunk_lo, chunk_hi, "recheck")
+                    # Keep every worker busy with one chunk queued behind it, no more
+                    while chunks is not None and len(pending) < self.concurrency * 2:
+                        chunk = next(chunks, None)
+                        if chunk is None:
+                            chunks = None
+                            break
+                        report.chunks += 1
+                        submit(self._checksum, *chunk, "chunk")
+                    if not pending and not rechecks:
+                        break
+                    timeout = max(0.0, rechecks[0][0] - time.monotonic()) if rechecks else None
+                    done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        chunk_lo, chunk_hi, stage = pending.pop(future)
+                        result = future.result()
+                        if stage == "rows":
+                            for kind, keys in result.items():
+                                getattr(report, kind).extend(keys)
+                            continue
+                        source_sum, target_sum = result
+                        if stage == "chunk":
+                            report.rows_checked += source_sum[0]
+                        if source_sum == target_sum:
+                            continue
+                        if stage == "chunk":
+                            report.rechecks += 1
+                            rechecks.append((time.monotonic() + self.recheck_delay, chunk_lo, chunk_hi))
+                            continue
+                        if stage == "recheck":
+                            report.mismatched_chunks += 1
+                        if chunk_hi - chunk_lo <= ROW_COMPARE_SIZE:
+                            submit(self._compare_rows, chunk_lo, chunk_hi, "rows")
+                            continue
+                        # Bisect: only the halves whose hashes differ go further down
+                        report.bisections += 1
+                        mid = (chunk_lo + chunk_hi) // 2
+                        for half_lo, half_hi in ((chunk_lo, mid), (mid, chunk_hi)):
+                            submit(self._checksum, half_lo, half_hi, "bisect")
+
+        for kind in ("missing_on_target", "missing_on_source", "changed"):
+            getattr(report, kind).sort()
+        report.elapsed_seconds = round(time.perf_counter() - started, 3)
+        report.rows_per_second = round(report.rows_checked / report.elapsed_seconds, 1) if report.elapsed_seconds else 0.0
+        return report
+
+    def close(self) -> None:
+        self.endpoints.close()
+
+
+def check_consistency(
+    source_url: str,
+    target_url: str,
+    tables: Sequence[str],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    concurrency: int = 4,
+    recheck_delay: float = DEFAULT_RECHECK_DELAY
+) -> List[TableReport]:
+    """
+    Compare `tables` between source and target.
+
+    Args:
+        source_url: Source database URL
+        target_url: Target database URL
+        tables: Tables to compare
+        chunk_size: Rows per top-level chunk
+        concurrency: Parallel checksum workers (connections per endpoint)
+        recheck_delay: Seconds before a mismatching chunk is checked again
+
+    Returns:
+        One TableReport per table
+    """
+    checker = ConsistencyChecker(source_url, target_url, chunk_size, concurrency, recheck_delay=recheck_delay)
+    try:
+        return [checker.check_table(table) for table in tables]
+    finally:
+        checker.close()
+
+
+def print_report(reports: Sequence[TableReport], max_keys: int = 20) -> None:
+    for report in reports:
+        status = "✓ consistent" if report.consistent else "❌ DIVERGENT"
+        print(
+            f"{report.table}: {status}  rows {report.rows_checked}  chunks {report.chunks} "
+            f"(mismatched {report.mismatched_chunks}, rechecked {report.rechecks}, bisections {report.bisections})  "
+            f"{report.elapsed_seconds}s  {report.rows_per_second} rows/s"
+        )
+        for kind in ("missing_on_target", "missing_on_source", "changed"):
+            keys = getattr(report, kind)
+            if keys:
+                more = f" ... (+{len(keys) - max_keys})" if len(keys) > max_keys else ""
+                print(f"  {kind}: {keys[:max_keys]}{more}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare tables between RDS and Aurora with parallel chunk checksums"
+    )
+    parser.add_argument(
+        "--source-url",
+        required=True,
+        help="Source database URL (mysql://user@host/db or sqlite:///path)"
+    )
+    parser.add_argument(
+        "--target-url",
+        required=True,
+        help="Target database URL"
+    )
+    parser.add_argument(
+        "--tables",
+        default="students",
+        help="Comma-separated tables to compare (default: students)"
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help=f"Rows per chunk (default: {DEFAULT_CHUNK_SIZE})"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Parallel checksum workers per endpoint (default: 4)"
+    )
+    parser.add_argument(
+        "--recheck-delay",
+        type=float,
+        default=DEFAULT_RECHECK_DELAY,
+        help=f"Seconds before a mismatching chunk is checked again (default: {DEFAULT_RECHECK_DELAY:g})"
+    )
+    parser.add_argument(
+        "--json",
+        help="Also write the full report (all divergent keys) to this JSON file"
+    )
+
+    args = parser.parse_args()
+
+    reports = check_consistency(
+        args.source_url,
+        args.target_url,
+        [t.strip() for t in args.tables.split(",") if t.strip()],
+        args.chunk_size,
+        args.concurrency,
+        args.recheck_delay
+    )
+    print_report(reports)
+    if args.json:
+        Path(args.json).write_text(json.dumps([asdict(r) for r in reports], indent=2))
+
+    sys.exit(0 if all(r.consistent for r in reports) else 1)
+
+
+if __name__ == "__main__":
+    main()
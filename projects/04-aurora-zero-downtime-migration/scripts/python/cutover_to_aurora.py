@@ -2,85 +2,431 @@
 """
 Cutover script for migrating from RDS MySQL to Aurora MySQL.
 
-This script performs a controlled cutover:
-1. Sets RDS to read-only mode
-2. Ensures replication is caught up
-3. Flips Route 53 CNAME to Aurora
+Writes are unavailable from the moment RDS turns read-only until the CNAME
+points at Aurora, so everything that can happen before that moment does:
+
+Prepare (writes still flowing):
+1. Creates the shared AWS clients (utils.py) and opens persistent connections to both databases
+2. Validates the Route 53 change batch and the parameter group used for read-only
+3. Lowers the record's TTL and waits out the old one
+4. Waits until heartbeat replication lag is within budget
+
+Write-unavailable window:
+5. Sets RDS to read-only and waits until it reports read_only=1
+6. Proves everything committed before that is on Aurora: a fence heartbeat
+   written now, or RDS's final binlog position against the DMS status table
+   when RDS refuses the write, polled adaptively from a few ms
+7. Flips the Route 53 CNAME to Aurora and waits for INSYNC
+
+Post-flip (dns_convergence.py):
+8. While Route 53 syncs, queries --resolvers until each one answers with Aurora
+9. Terminates the sessions left on RDS in batches and reports time-to-full-convergence
+
+Every phase is timestamped and the run reports the exact read-only to
+writable-on-Aurora window. Change capture on --capture-tables is installed
+during prepare and the boundary is saved inside the window, so
+rollback_to_rds.py can replay only what Aurora accepted after it. If replication doesn't catch up, RDS is made
+writable again, the change capture is removed and the CNAME is left alone. After a
+successful cutover the capture stays until the rollback window is over; then remove
+it with rollback_delta.py --remove-change-capture.
+
+--dry-run runs the same sequence against local stand-ins (e.g. sqlite URLs)
+without calling AWS: Route 53 and DMS are simulated.
 """
 
 import sys
 import argparse
+import json
+import re
+import socket
+import threading
 import time
-import boto3
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
 from botocore.exceptions import ClientError
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from check_replication_status import resolve_endpoints  # noqa: E402
+from db import Connection, connect  # noqa: E402
+from dns_convergence import INSYNC, ConvergenceStage, print_convergence  # noqa: E402
+from replication_lag import HEARTBEAT_TABLE, HeartbeatLagMonitor, ensure_heartbeat_table  # noqa: E402
+from rollback_delta import (  # noqa: E402
+    capture_boundary, install_change_capture, remove_change_capture, save_boundary
+)
+from utils import (  # noqa: E402
+    create_rds_client, create_route53_client, poll_until, print_call_summary, reset_call_stats
+)
+
+# Written by DMS on the target when the task has ControlTablesSettings.StatusTableEnabled
+DMS_STATUS_TABLE = "awsdms_control.awsdms_status"
+
+
+class CutoverTimeline:
+    """Named phase marks (wall clock + monotonic) for one cutover or rollback run."""
+
+    WINDOW_START = "read_only_requested"
+    WINDOW_END = "writable_on_aurora"
+
+    def __init__(self, window: Tuple[str, str] = (WINDOW_START, WINDOW_END)):
+        self.window = window
+        self._wall0 = time.time()
+        self._mono0 = time.perf_counter()
+        self.marks: List[Tuple[str, float]] = []
+
+    def mark(self, name: str) -> None:
+        self.marks.append((name, time.perf_counter()))
+        print(f"  [{self.since_start_ms(name):10.1f} ms] {name}")
+
+    def since_start_ms(self, name: str) -> float:
+        return round((dict(self.marks)[name] - self._mono0) * 1000, 1)
+
+    def between_ms(self, start: str, end: str) -> Optional[float]:
+        marks = dict(self.marks)
+        if start not in marks or end not in marks:
+            return None
+        return round((marks[end] - marks[start]) * 1000, 1)
+
+    @property
+    def write_unavailable_ms(self) -> Optional[float]:
+        return self.between_ms(*self.window)
+
+    def report(self) -> Dict:
+        phases = []
+        previous = self._mono0
+        for name, at in self.marks:
+            phases.append({
+                "phase": name,
+                "at": datetime.fromtimestamp(self._wall0 + at - self._mono0, timezone.utc).isoformat(timespec="milliseconds"),
+                "since_start_ms": round((at - self._mono0) * 1000, 1),
+                "delta_ms": round((at - previous) * 1000, 1),
+            })
+            previous = at
+        return {"phases": phases, "write_unavailable_ms": self.write_unavailable_ms}
+
+
+# -- dry-run stand-ins ------------------------------------------------------
+
+class DryRunRoute53:
+    """The few Route 53 calls the cutover makes, answered locally."""
 
-def set_rds_read_only(rds_instance_id: str, region: str = "us-east-1") -> bool:
+    def __init__(self, record_name: str, value: str, ttl: int = 60, propagation: float = 0.05):
+        self.records = {(self._fqdn(record_name), "CNAME"): {"TTL": ttl, "Value": value}}
+        self.propagation = propagation
+        self._changes = {}
+
+    @staticmethod
+    def _fqdn(name: str) -> str:
+        return name if name.endswith(".") else name + "."
+
+    def list_resource_record_sets(self, HostedZoneId, StartRecordName, StartRecordType, MaxItems="1"):
+        record = self.records.get((self._fqdn(StartRecordName), StartRecordType))
+        if record is None:
+            return {"ResourceRecordSets": []}
+        return {"ResourceRecordSets": [{
+            "Name": self._fqdn(StartRecordName), "Type": StartRecordType, "TTL": record["TTL"],
+            "ResourceRecords": [{"Value": record["Value"]}],
+        }]}
+
+    def change_resource_record_sets(self, HostedZoneId, ChangeBatch):
+        for change in ChangeBatch["Changes"]:
+            rrset = change["ResourceRecordSet"]
+            self.records[(self._fqdn(rrset["Name"]), rrset["Type"])] = {
+                "TTL": rrset["TTL"], "Value": rrset["ResourceRecords"][0]["Value"]
+            }
+        change_id = f"/change/DRYRUN{len(self._changes) + 1}"
+        self._changes[change_id] = time.monotonic()
+        return {"ChangeInfo": {"Id": change_id, "Status": "PENDING"}}
+
+    def get_change(self, Id):
+        insync = time.monotonic() - self._changes[Id] >= self.propagation
+        return {"ChangeInfo": {"Id": Id, "Status": "INSYNC" if insync else "PENDING"}}
+
+
+class DryRunReplicator:
+    """Copies the heartbeat table from source to target every `lag` seconds, as DMS CDC would."""
+
+    def __init__(self, source_url: str, target_url: str, lag: float = 0.05):
+        self.urls = (source_url, target_url)
+        self.lag = lag
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="dry-run-dms", daemon=True)
+
+    def _run(self) -> None:
+        with connect(self.urls[0]) as source, connect(self.urls[1]) as target:
+            ensure_heartbeat_table(source)
+            ensure_heartbeat_table(target)
+            while not self._stop.wait(self.lag):
+                rows = source.query(f"SELECT source_id, seq, written_us FROM {HEARTBEAT_TABLE}")
+                with target.transaction():
+                    target.execute(f"DELETE FROM {HEARTBEAT_TABLE}")
+                    target.executemany(
+                        f"INSERT INTO {HEARTBEAT_TABLE} (source_id, seq, written_us) VALUES (%s, %s, %s)", rows
+                    )
+
+    def start(self) -> "DryRunReplicator":
+        self._thread.start()
+        return self
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+# -- steps ------------------------------------------------------------------
+
+def find_read_only_parameter_group(rds_client, rds_instance_id: str) -> str:
     """
-    Set RDS instance to read-only mode.
-    
+    Parameter group whose `read_only` setting controls the RDS instance.
+
     Args:
+        rds_client: boto3 RDS client
         rds_instance_id: The RDS instance identifier
-        region: AWS region
-        
+
     Returns:
-        True if successful, False otherwise
+        The parameter group name
+
+    Raises:
+        ValueError: If the instance uses a default (unmodifiable) parameter group, or one
+            that other instances share (setting read_only on it would stop their writes too)
     """
-    try:
-        rds_client = boto3.client('rds', region_name=region)
-        print(f"Setting RDS instance {rds_instance_id} to read-only mode...")
-        # Placeholder: In real implementation, modify DB parameter group or use SQL
-        print("✓ RDS read-only mode activated (placeholder)")
-        return True
-    except ClientError as e:
-        print(f"Error setting RDS to read-only: {e}", file=sys.stderr)
-        return False
+    instance = rds_client.describe_db_instances(DBInstanceIdentifier=rds_instance_id)['DBInstances'][0]
+    name = instance['DBParameterGroups'][0]['DBParameterGroupName']
+    if name.startswith("default."):
+        raise ValueError(f"{rds_instance_id} uses {name}; read_only needs a custom parameter group")
+    sharing, marker = [], None
+    while True:
+        page = rds_client.describe_db_instances(**({"Marker": marker} if marker else {}))
+        sharing.extend(
+            other['DBInstanceIdentifier'] for other in page['DBInstances']
+            if other['DBInstanceIdentifier'] != rds_instance_id
+            and any(group['DBParameterGroupName'] == name for group in other['DBParameterGroups'])
+        )
+        marker = page.get("Marker")
+        if not marker:
+            break
+    if sharing:
+        raise ValueError(
+            f"{name} is also attached to {', '.join(sorted(sharing))}; "
+            f"give {rds_instance_id} its own parameter group before toggling read_only"
+        )
+    return name
 
 
-def ensure_replication_caught_up(rds_instance_id: str, aurora_cluster_id: str, region: str = "us-east-1") -> bool:
+def prepare_route53_change(
+    route53_client,
+    hosted_zone_id: str,
+    record_name: str,
+    aurora_endpoint: str,
+    ttl: int,
+    resolve: bool = True
+) -> Tuple[Dict, Dict]:
     """
-    Ensure replication lag is minimal before cutover.
-    
+    Look up the current CNAME and build the change batch that points it at Aurora.
+
     Args:
-        rds_instance_id: The RDS instance identifier
-        aurora_cluster_id: The Aurora cluster identifier
-        region: AWS region
-        
+        route53_client: boto3 Route 53 client
+        hosted_zone_id: Route 53 hosted zone ID
+        record_name: DNS record name to update
+        aurora_endpoint: Aurora cluster endpoint
+        ttl: TTL for the new record
+        resolve: Check that the Aurora endpoint resolves
+
+    Returns:
+        (current record set, change batch)
+
+    Raises:
+        ValueError: If the record doesn't exist or the endpoint doesn't resolve
+    """
+    fqdn = record_name if record_name.endswith(".") else record_name + "."
+    record_sets = route53_client.list_resource_record_sets(
+        HostedZoneId=hosted_zone_id, StartRecordName=fqdn, StartRecordType="CNAME", MaxItems="1"
+    )["ResourceRecordSets"]
+    if not record_sets or record_sets[0]["Name"] != fqdn or record_sets[0]["Type"] != "CNAME":
+        raise ValueError(f"No CNAME {record_name} in hosted zone {hosted_zone_id}")
+    if resolve:
+        try:
+            socket.getaddrinfo(aurora_endpoint, 3306)
+        except socket.gaierror as e:
+            raise ValueError(f"Aurora endpoint {aurora_endpoint} does not resolve: {e}") from e
+    change_batch = {
+        "Comment": f"Cutover {record_name} to Aurora",
+        "Changes": [{
+            "Action": "UPSERT",
+            "ResourceRecordSet": {
+                "Name": fqdn, "Type": "CNAME", "TTL": ttl,
+                "ResourceRecords": [{"Value": aurora_endpoint}],
+            },
+        }],
+    }
+    return record_sets[0], change_batch
+
+
+def wait_for_dns_insync(route53_client, change_id: str, timeout: float = 120.0) -> bool:
+    """Poll a Route 53 change until it is INSYNC."""
+    return poll_until(
+        lambda: route53_client.get_change(Id=change_id)["ChangeInfo"]["Status"] == "INSYNC",
+        timeout, first_interval=0.05, max_interval=2.0
+    )
+
+
+def lower_ttl(route53_client, hosted_zone_id: str, record: Dict, ttl: int, wait: bool = True) -> float:
+    """
+    Re-publish the current record with a lower TTL and wait out the old one.
+
+    Args:
+        route53_client: boto3 Route 53 client
+        hosted_zone_id: Route 53 hosted zone ID
+        record: Current record set (from prepare_route53_change)
+        ttl: New, lower TTL
+        wait: Sleep for the old TTL so resolvers drop the long-lived answer
+
+    Returns:
+        Seconds waited for the old TTL
+    """
+    old_ttl = record["TTL"]
+    if old_ttl <= ttl:
+        return 0.0
+    change = route53_client.change_resource_record_sets(HostedZoneId=hosted_zone_id, ChangeBatch={
+        "Comment": f"Lower TTL of {record['Name']} before cutover",
+        "Changes": [{"Action": "UPSERT", "ResourceRecordSet": dict(record, TTL=ttl)}],
+    })
+    if not wait_for_dns_insync(route53_client, change["ChangeInfo"]["Id"]):
+        raise TimeoutError(f"TTL change for {record['Name']} did not reach INSYNC")
+    if wait:
+        print(f"  Waiting {old_ttl}s for the old TTL to expire...")
+        time.sleep(old_ttl)
+        return float(old_ttl)
+    return 0.0
+
+
+def set_rds_read_only(rds_client, parameter_group: str, read_only: bool = True) -> None:
+    """
+    Set `read_only` on the RDS parameter group (a dynamic parameter, applied immediately).
+
+    Args:
+        rds_client: boto3 RDS client
+        parameter_group: Parameter group name (see find_read_only_parameter_group)
+        read_only: True to stop writes, False to restore them
+    """
+    rds_client.modify_db_parameter_group(
+        DBParameterGroupName=parameter_group,
+        Parameters=[{
+            "ParameterName": "read_only",
+            "ParameterValue": "1" if read_only else "0",
+            "ApplyMethod": "immediate",
+        }]
+    )
+
+
+def wait_for_read_only(conn: Connection, read_only: bool = True, timeout: float = 60.0) -> bool:
+    """Poll @@global.read_only on the open connection until it has the wanted value."""
+    if conn.dialect == "sqlite":
+        return True  # stand-ins have no server-side read-only flag
+    return poll_until(
+        lambda: int(conn.query_one("SELECT @@global.read_only")[0]) == int(read_only), timeout
+    )
+
+
+def source_binlog_position(conn: Connection) -> Optional[str]:
+    """Current "file:position" of the source's binlog (None on stand-ins or with binlog off)."""
+    if conn.dialect == "sqlite":
+        return None
+    status = conn.query_one("SHOW MASTER STATUS")
+    return f"{status[0]}:{status[1]}" if status else None
+
+
+def _position_key(position: str) -> Tuple[int, int]:
+    """(binlog file number, offset) from "mysql-bin-changelog.000024:373", for ordering."""
+    match = re.search(r"(\d+)\D+(\d+)\s*$", position or "")
+    if not match:
+        raise ValueError(f"Unrecognised binlog position: {position!r}")
+    return int(match.group(1)), int(match.group(2))
+
+
+def ensure_replication_caught_up(
+    monitor: HeartbeatLagMonitor,
+    target: Connection,
+    timeout: float = 30.0,
+    dms_status_table: str = DMS_STATUS_TABLE,
+    dms_task_name: Optional[str] = None
+) -> bool:
+    """
+    Wait until every write committed on the source is on the target.
+
+    Call only once the source has confirmed read_only=1: nothing commits there
+    after that, so the proof taken here covers every write.
+
+    - A fence heartbeat is written now. DMS applies changes in commit order,
+      so once the fence is visible everything committed before it is too.
+    - RDS refuses that write under read_only (error 1290) unless the user has
+      CONNECTION_ADMIN/SUPER. Then the source's final binlog position is
+      compared with the DMS status table on the target (task setting
+      ControlTablesSettings.StatusTableEnabled): DMS must have read past it
+      with no changes pending.
+
+    Args:
+        monitor: Heartbeat monitor holding the open source/target connections
+        target: Connection to the target
+        timeout: Seconds to wait
+        dms_status_table: DMS status table on the target
+        dms_task_name: DMS task replicating this source (default: every row of the table)
+
     Returns:
-        True if replication is caught up, False otherwise
+        True if replication is caught up, False otherwise (including when
+        neither proof is available)
     """
     try:
-        print("Checking replication lag...")
-        # Placeholder: In real implementation, check binlog lag
-        print("✓ Replication lag is minimal (placeholder)")
-        return True
+        fence_seq = monitor.beat()
     except Exception as e:
-        print(f"Error checking replication lag: {e}", file=sys.stderr)
+        if "1290" not in str(e) and "read-only" not in str(e):
+            raise
+    else:
+        return monitor.wait_for_seq(fence_seq, timeout)
+    position = source_binlog_position(monitor.source)
+    if position is None:
+        print("  ⚠ Source refused the fence and has no binlog position to compare", file=sys.stderr)
         return False
+    final = _position_key(position)
+    sql = f"SELECT source_current_position, pending_changes FROM {dms_status_table}"
+    params: Tuple = ()
+    if dms_task_name:
+        sql += " WHERE task_name = %s"
+        params = (dms_task_name,)
 
+    def applied() -> bool:
+        rows = target.query(sql, params)
+        return bool(rows) and all(
+            row[0] and _position_key(row[0]) >= final and int(row[1] or 0) == 0 for row in rows
+        )
 
-def update_route53_record(hosted_zone_id: str, record_name: str, aurora_endpoint: str, region: str = "us-east-1") -> bool:
+    try:
+        return poll_until(applied, timeout)
+    except Exception as e:
+        print(f"  ⚠ Cannot read {dms_status_table} on the target: {e}", file=sys.stderr)
+        return False
+
+
+def update_route53_record(route53_client, hosted_zone_id: str, change_batch: Dict) -> str:
     """
-    Update Route 53 CNAME to point to Aurora endpoint.
-    
+    Submit the prepared change batch that points the CNAME at Aurora.
+
     Args:
+        route53_client: boto3 Route 53 client
         hosted_zone_id: Route 53 hosted zone ID
-        record_name: DNS record name to update
-        aurora_endpoint: Aurora cluster endpoint
-        region: AWS region
-        
+        change_batch: Change batch from prepare_route53_change
+
     Returns:
-        True if successful, False otherwise
+        The Route 53 change ID
     """
-    try:
-        route53_client = boto3.client('route53', region_name=region)
-        print(f"Updating Route 53 record {record_name} to point to Aurora ({aurora_endpoint})...")
-        # Placeholder: In real implementation, update Route 53 record
-        print("✓ Route 53 CNAME updated to Aurora (placeholder)")
-        return True
-    except ClientError as e:
-        print(f"Error updating Route 53 record: {e}", file=sys.stderr)
-        return False
+    change = route53_client.change_resource_record_sets(HostedZoneId=hosted_zone_id, ChangeBatch=change_batch)
+    return change["ChangeInfo"]["Id"]
 
 
 def perform_cutover(
@@ -89,11 +435,31 @@ def perform_cutover(
     aurora_endpoint: str,
     hosted_zone_id: str,
     record_name: str,
-    region: str = "us-east-1"
+    region: str = "us-east-1",
+    source_url: Optional[str] = None,
+    target_url: Optional[str] = None,
+    db_user: str = "admin",
+    db_name: str = "devops_raf_demo",
+    ttl: int = 5,
+    max_lag_ms: float = 1000.0,
+    catch_up_timeout: float = 30.0,
+    dns_timeout: float = 120.0,
+    dry_run: bool = False,
+    dry_run_lag: float = 0.05,
+    timeline: Optional[CutoverTimeline] = None,
+    report_json: Optional[str] = None,
+    capture_tables: Sequence[str] = (),
+    boundary_file: Optional[str] = None,
+    resolvers: Sequence[str] = (),
+    drain_old_sessions: bool = False,
+    drain_users: Sequence[str] = (),
+    drain_batch_size: int = 50,
+    drain_timeout: float = 60.0,
+    dms_task_name: Optional[str] = None
 ) -> bool:
     """
     Perform the complete cutover process.
-    
+
     Args:
         rds_instance_id: The RDS instance identifier
         aurora_cluster_id: The Aurora cluster identifier
@@ -101,37 +467,177 @@ def perform_cutover(
         hosted_zone_id: Route 53 hosted zone ID
         record_name: DNS record name to update
         region: AWS region
-        
+        source_url: Source database URL (default: resolved from rds_instance_id)
+        target_url: Target database URL (default: resolved from aurora_cluster_id)
+        db_user: Database user for resolved endpoints
+        db_name: Database name for resolved endpoints
+        ttl: TTL set on the record before the flip (and kept after it)
+        max_lag_ms: Replication lag required before turning RDS read-only
+        catch_up_timeout: Seconds to wait for the fence after the flip before aborting
+        dns_timeout: Seconds to wait for the Route 53 change to be INSYNC
+        dry_run: Run against local stand-ins; Route 53 and DMS are simulated
+        dry_run_lag: Simulated replication delay in dry-run mode (seconds)
+        timeline: Timeline to record the phases in (default: a new one)
+        report_json: Write the timeline report to this file (optional)
+        capture_tables: Tables whose writes on Aurora a rollback can replay (rollback_delta.py)
+        boundary_file: Where to save the cutover boundary for rollback_to_rds.py
+        resolvers: DNS resolvers ("host[:port]") that must answer with Aurora before draining
+        drain_old_sessions: Terminate the sessions left on RDS once DNS has converged
+        drain_users: Only drain sessions of these users (default: all but system accounts)
+        drain_batch_size: Sessions terminated per round
+        drain_timeout: Seconds to keep draining
+        dms_task_name: DMS task whose status row proves the catch-up when RDS refuses the fence
+
     Returns:
         True if cutover successful, False otherwise
     """
+    timeline = timeline or CutoverTimeline()
+    mode = " (dry run)" if dry_run else ""
     print("=" * 60)
-    print("Starting cutover from RDS to Aurora")
+    print(f"Starting cutover from RDS to Aurora{mode}")
     print("=" * 60)
-    
-    # Step 1: Set RDS to read-only
-    if not set_rds_read_only(rds_instance_id, region):
-        print("❌ Failed to set RDS to read-only mode", file=sys.stderr)
-        return False
-    
-    # Step 2: Ensure replication is caught up
-    if not ensure_replication_caught_up(rds_instance_id, aurora_cluster_id, region):
-        print("❌ Replication not caught up", file=sys.stderr)
-        return False
-    
-    # Step 3: Update Route 53 CNAME
-    if not update_route53_record(hosted_zone_id, record_name, aurora_endpoint, region):
-        print("❌ Failed to update Route 53 record", file=sys.stderr)
+
+    reset_call_stats()
+    source = target = monitor = replicator = convergence = None
+    parameter_group = rds_client = None
+    read_only = capture_installed = False
+    try:
+        # -- prepare: nothing below touches availability ------------------
+        timeline.mark("prepare_start")
+        if dry_run:
+            if not (source_url and target_url):
+                print("❌ --dry-run needs --source-url and --target-url", file=sys.stderr)
+                return False
+            route53_client = DryRunRoute53(record_name, f"{rds_instance_id}.dry-run.invalid")
+            replicator = DryRunReplicator(source_url, target_url, dry_run_lag).start()
+        else:
+            rds_client = create_rds_client(region)
+            route53_client = create_route53_client(region)
+            if not (source_url and target_url):
+                resolved_source, resolved_target = resolve_endpoints(
+                    rds_instance_id, aurora_cluster_id, db_user, db_name, region
+                )
+                source_url = source_url or resolved_source
+                target_url = target_url or resolved_target
+            parameter_group = find_read_only_parameter_group(rds_client, rds_instance_id)
+        timeline.mark("clients_ready")
+
+        source, target = connect(source_url), connect(target_url)
+        if not wait_for_read_only(target, read_only=False, timeout=0):
+            print("❌ Aurora writer is read-only", file=sys.stderr)
+            return False
+        timeline.mark("connections_open")
+
+        record, change_batch = prepare_route53_change(
+            route53_client, hosted_zone_id, record_name, aurora_endpoint, ttl, resolve=not dry_run
+        )
+        timeline.mark("change_batch_validated")
+
+        lower_ttl(route53_client, hosted_zone_id, record, ttl, wait=not dry_run)
+        timeline.mark("ttl_lowered")
+
+        if capture_tables:
+            capture_installed = True
+            install_change_capture(target, capture_tables)
+            timeline.mark("change_capture_installed")
+
+        monitor = HeartbeatLagMonitor(source, target, interval=0.1).start()
+        if not monitor.wait_for_lag(max_lag_ms / 1000, timeout=max(catch_up_timeout, 10.0)):
+            print(f"❌ Replication lag not within {max_lag_ms:g} ms; not cutting over", file=sys.stderr)
+            return False
+        monitor.stop()
+        print(f"  Lag before flip: {monitor.stats()}")
+        timeline.mark("lag_within_budget")
+
+        # -- write-unavailable window -------------------------------------
+        timeline.mark(CutoverTimeline.WINDOW_START)
+        read_only = True
+        if not dry_run:
+            set_rds_read_only(rds_client, parameter_group)
+            if not wait_for_read_only(source):
+                raise TimeoutError("RDS did not report read_only=1")
+        timeline.mark("read_only_confirmed")
+
+        # Only now is the source frozen: the fence must come after every write
+        if not ensure_replication_caught_up(monitor, target, catch_up_timeout, dms_task_name=dms_task_name):
+            print("❌ Replication not caught up; restoring writes on RDS", file=sys.stderr)
+            return False
+        timeline.mark("replication_caught_up")
+
+        if capture_tables:
+            boundary = capture_boundary(target, capture_tables)
+            if boundary_file:
+                save_boundary(boundary_file, boundary)
+            timeline.mark("boundary_captured")
+
+        change_id = update_route53_record(route53_client, hosted_zone_id, change_batch)
+        timeline.mark("dns_change_submitted")
+        # From here on the CNAME points at Aurora: no rollback of the read-only flag,
+        # and the change capture stays for rollback_to_rds.py
+        read_only = capture_installed = False
+
+        # -- post-flip: Route 53, resolvers and old sessions ---------------
+        convergence = ConvergenceStage(
+            route53_client, change_id, record_name, aurora_endpoint, resolvers,
+            old_conn=source if drain_old_sessions else None, timeout=dns_timeout,
+            grace=0 if dry_run else ttl, drain_timeout=drain_timeout,
+            on_phase=lambda phase: timeline.mark(CutoverTimeline.WINDOW_END if phase == INSYNC else phase),
+            batch_size=drain_batch_size, users=drain_users
+        ).run()
+        if convergence.insync_ms is None:
+            print(f"❌ Route 53 change {change_id} not INSYNC after {dns_timeout:g}s", file=sys.stderr)
+            return False
+
+    except (ClientError, ValueError, TimeoutError) as e:
+        print(f"❌ Cutover failed: {e}", file=sys.stderr)
         return False
-    
+    finally:
+        if read_only:
+            try:
+                if not dry_run:
+                    set_rds_read_only(rds_client, parameter_group, read_only=False)
+                timeline.mark("aborted_writes_restored")
+            except ClientError as e:
+                print(f"❌ Could not restore writes on RDS: {e}", file=sys.stderr)
+        if capture_installed:
+            # Aborted before the flip: nothing to roll back, so don't leave triggers
+            # and an ever-growing changelog on Aurora
+            try:
+                remove_change_capture(target, capture_tables)
+                timeline.mark("aborted_change_capture_removed")
+            except Exception as e:
+                print(f"❌ Could not remove the change capture on Aurora: {e}", file=sys.stderr)
+        if monitor:
+            monitor.stop()
+        if replicator:
+            replicator.stop()
+        for conn in (source, target):
+            if conn:
+                conn.close()
+        if report_json:
+            report = timeline.report()
+            if convergence:
+                report["convergence"] = convergence.to_dict()
+            Path(report_json).write_text(json.dumps(report, indent=2))
+        print_call_summary()
+
+    window = timeline.write_unavailable_ms
     print("=" * 60)
-    print("✓ Cutover to Aurora completed successfully")
+    print(f"✓ Cutover to Aurora completed successfully{mode}")
+    print(f"  Write-unavailable window (read-only -> writable on Aurora): {window:.1f} ms")
+    print(f"    RDS read-only confirmed:  {timeline.between_ms(CutoverTimeline.WINDOW_START, 'read_only_confirmed'):.1f} ms")
+    print(f"    Replication caught up:    {timeline.between_ms('read_only_confirmed', 'replication_caught_up'):.1f} ms")
+    print(f"    DNS change submitted:     {timeline.between_ms('replication_caught_up', 'dns_change_submitted'):.1f} ms")
+    print(f"    DNS INSYNC:               {timeline.between_ms('dns_change_submitted', CutoverTimeline.WINDOW_END):.1f} ms")
+    print_convergence(convergence)
+    if not convergence.converged:
+        print("  ⚠ Clients have not all moved to Aurora; check the resolvers and sessions above")
     print("=" * 60)
     print("\nNext steps:")
     print("  1. Validate application connectivity to Aurora")
     print("  2. Run basic queries to verify data integrity")
     print("  3. Monitor application logs for errors")
-    
+
     return True
 
 
@@ -169,21 +675,123 @@ def main():
         default="us-east-1",
         help="AWS region (default: us-east-1)"
     )
-    
+    parser.add_argument(
+        "--source-url",
+        help="Source database URL (default: RDS instance endpoint)"
+    )
+    parser.add_argument(
+        "--target-url",
+        help="Target database URL (default: Aurora cluster endpoint)"
+    )
+    parser.add_argument(
+        "--db-user",
+        default="admin",
+        help="Database user for resolved endpoints; password from DB_PASSWORD (default: admin)"
+    )
+    parser.add_argument(
+        "--db-name",
+        default="devops_raf_demo",
+        help="Database name (default: devops_raf_demo)"
+    )
+    parser.add_argument(
+        "--ttl",
+        type=int,
+        default=5,
+        help="Record TTL set before the flip, in seconds (default: 5)"
+    )
+    parser.add_argument(
+        "--max-lag-ms",
+        type=float,
+        default=1000.0,
+        help="Replication lag required before turning RDS read-only (default: 1000)"
+    )
+    parser.add_argument(
+        "--catch-up-timeout",
+        type=float,
+        default=30.0,
+        help="Seconds to wait for replication after the flip before aborting (default: 30)"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Run against --source-url/--target-url stand-ins without calling AWS"
+    )
+    parser.add_argument(
+        "--report-json",
+        help="Write the phase timeline to this JSON file"
+    )
+    parser.add_argument(
+        "--capture-tables",
+        default="students",
+        help="Tables whose post-cutover writes a rollback replays; empty to disable (default: students)"
+    )
+    parser.add_argument(
+        "--boundary-file",
+        default="cutover-boundary.json",
+        help="Where to save the cutover boundary for rollback_to_rds.py (default: cutover-boundary.json)"
+    )
+    parser.add_argument(
+        "--dms-task-name",
+        help="DMS task (identifier) whose awsdms_status row proves catch-up when RDS refuses the fence write"
+    )
+    parser.add_argument(
+        "--resolvers",
+        default="",
+        help="Comma-separated DNS resolvers (host[:port]) that must answer with Aurora after the flip"
+    )
+    parser.add_argument(
+        "--dns-timeout",
+        type=float,
+        default=120.0,
+        help="Seconds to wait for Route 53 INSYNC and the resolvers after the flip (default: 120)"
+    )
+    parser.add_argument(
+        "--no-drain",
+        action="store_true",
+        help="Leave the sessions still open on RDS after DNS has converged"
+    )
+    parser.add_argument(
+        "--drain-users",
+        default="",
+        help="Only terminate sessions of these comma-separated users on RDS (default: all but system accounts)"
+    )
+    parser.add_argument(
+        "--drain-batch-size",
+        type=int,
+        default=50,
+        help="Sessions on RDS terminated per round (default: 50)"
+    )
+
     args = parser.parse_args()
-    
+
     success = perform_cutover(
         args.rds_instance_id,
         args.aurora_cluster_id,
         args.aurora_endpoint,
         args.hosted_zone_id,
         args.record_name,
-        args.region
+        args.region,
+        source_url=args.source_url,
+        target_url=args.target_url,
+        db_user=args.db_user,
+        db_name=args.db_name,
+        ttl=args.ttl,
+        max_lag_ms=args.max_lag_ms,
+        catch_up_timeout=args.catch_up_timeout,
+        dry_run=args.dry_run,
+        report_json=args.report_json,
+        capture_tables=[t.strip() for t in args.capture_tables.split(",") if t.strip()],
+        boundary_file=args.boundary_file,
+        dns_timeout=args.dns_timeout,
+        resolvers=[r.strip() for r in args.resolvers.split(",") if r.strip()],
+        drain_old_sessions=not args.no_drain,
+        drain_users=[u.strip() for u in args.drain_users.split(",") if u.strip()],
+        drain_batch_size=args.drain_batch_size,
+        dms_task_name=args.dms_task_name
     )
-    
+
     sys.exit(0 if success else 1)
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,442 @@
+"""
+Post-flip convergence: when have clients actually moved to the new endpoint?
+
+An INSYNC Route 53 change only means the authoritative name servers have the
+new CNAME. Recursive resolvers keep serving the old answer until their cached
+copy expires, and application pools keep their old connections open for as
+long as the pool allows. After the flip this stage runs, concurrently on one
+event loop:
+
+- a poll of the Route 53 change until it is INSYNC
+- a CNAME query loop against every resolver in a configurable list, until
+  each one answers with the new endpoint
+
+Once every resolver has converged (plus a grace period for client-side
+caches), lingering sessions on the old endpoint are enumerated from its
+processlist and terminated in batches, idle ones first, so pools reconnect in
+waves rather than all at once. Sessions that appear on the old endpoint after
+the first round are counted: they are clients still resolving the old answer.
+
+The stage reports time-to-full-convergence: from the flip until Route 53,
+every resolver and the old endpoint's sessions all agree the move is done.
+
+DNS queries use a minimal UDP client (one question, CNAME type) so no
+resolver library is needed.
+"""
+
+import asyncio
+import random
+import struct
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from db import Connection
+
+QTYPE_CNAME = 5
+QCLASS_IN = 1
+RCODE_NXDOMAIN = 3
+
+# Phase names passed to on_phase(), in order
+INSYNC = "route53_insync"
+DNS_CONVERGED = "dns_converged"
+SESSIONS_DRAINED = "old_sessions_drained"
+
+# Accounts whose sessions are never terminated (RDS/Aurora internals, replication)
+SYSTEM_USERS = ("rdsadmin", "system user", "event_scheduler")
+SYSTEM_COMMANDS = ("Daemon", "Binlog Dump", "Binlog Dump GTID", "Killed")
+
+
+# -- DNS --------------------------------------------------------------------
+
+def _normalize(name: str) -> str:
+    return name.rstrip(".").lower()
+
+
+def parse_resolver(resolver: str) -> Tuple[str, int]:
+    """"host", "host:port" or "[v6]:port" -> (host, port)."""
+    if resolver.startswith("["):
+        host, _, port = resolver[1:].partition("]")
+        return host, int(port.lstrip(":") or 53)
+    if resolver.count(":") == 1:
+        host, port = resolver.split(":")
+        return host, int(port)
+    return resolver, 53
+
+
+def encode_name(name: str) -> bytes:
+    labels = [label.encode("idna") for label in _normalize(name).split(".") if label]
+    return b"".join(struct.pack("!B", len(label)) + label for label in labels) + b"\0"
+
+
+def build_query(name: str, query_id: int, qtype: int = QTYPE_CNAME) -> bytes:
+    """A recursive (RD) query for one question."""
+    header = struct.pack("!HHHHHH", query_id, 0x0100, 1, 0, 0, 0)
+    return header + encode_name(name) + struct.pack("!HH", qtype, QCLASS_IN)
+
+
+def _read_name(message: bytes, offset: int) -> Tuple[str, int]:
+    """Decode a (possibly compressed) name; returns (name, offset after it)."""
+    labels = []
+    end = None
+    for _ in range(128):  # bounds a malicious pointer loop
+        length = message[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = struct.unpack_from("!H", message, offset)[0] & 0x3FFF
+            continue
+        offset += 1
+        if length == 0:
+            return ".".join(labels), end if end is not None else offset
+        labels.append(message[offset:offset + length].decode("ascii"))
+        offset += length
+    raise ValueError("DNS name compression loop")
+
+
+def parse_cname(message: bytes, query_id: int) -> Optional[str]:
+    """
+    CNAME target from a response, or None if the name has no CNAME.
+
+    Raises:
+        ValueError: If the response is for another query or the resolver failed
+    """
+    response_id, flags, qdcount, ancount, _, _ = struct.unpack_from("!HHHHHH", message)
+    if response_id != query_id or not flags & 0x8000:
+        raise ValueError("DNS response does not match the query")
+    rcode = flags & 0x000F
+    if rcode == RCODE_NXDOMAIN:
+        return None
+    if rcode:
+        raise ValueError(f"DNS rcode {rcode}")
+    offset = 12
+    for _ in range(qdcount):
+        offset = _read_name(message, offset)[1] + 4
+    for _ in range(ancount):
+        offset = _read_name(message, offset)[1]
+        rtype, _, _, rdlength = struct.unpack_from("!HHIH", message, offset)
+        offset += 10
+        if rtype == QTYPE_CNAME:
+            return _read_name(message, offset)[0]
+        offset += rdlength
+    return None
+
+
+class _DnsClientProtocol(asyncio.DatagramProtocol):
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.answer = loop.create_future()
+
+    def datagram_received(self, data, addr):
+        if not self.answer.done():
+            self.answer.set_result(data)
+
+    def error_received(self, exc):
+        if not self.answer.done():
+            self.answer.set_exception(exc)
+
+
+async def query_cname(name: str, resolver: str, timeout: float = 1.0) -> Optional[str]:
+    """
+    Ask `resolver` for the CNAME of `name` over UDP.
+
+    Args:
+        name: Record name
+        resolver: "host", "host:port" or "[v6]:port"
+        timeout: Seconds to wait for the answer
+
+    Returns:
+        The CNAME target (no trailing dot), or None if there is none
+
+    Raises:
+        asyncio.TimeoutError: If the resolver doesn't answer in time
+        OSError, ValueError: On network errors or a failed / malformed answer
+    """
+    loop = asyncio.get_running_loop()
+    host, port = parse_resolver(resolver)
+    query_id = random.getrandbits(16)
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: _DnsClientProtocol(loop), remote_addr=(host, port)
+    )
+    try:
+        transport.sendto(build_query(name, query_id))
+        return parse_cname(await asyncio.wait_for(protocol.answer, timeout), query_id)
+    finally:
+        transport.close()
+
+
+# -- session draining -------------------------------------------------------
+
+@dataclass
+class Session:
+    id: int
+    user: str
+    host: str
+    command: str
+    seconds: int
+
+
+@dataclass
+class DrainReport:
+    sessions_found: int = 0
+    sessions_killed: int = 0
+    late_sessions: int = 0  # appeared after the first round: clients on a stale answer
+    remaining: int = 0
+    rounds: int = 0
+    seconds: float = 0.0
+
+
+class SessionDrainer:
+    """
+    Terminates client sessions on the old endpoint in batches.
+
+    Our own connection, the system accounts and replication threads are left
+    alone; `users` restricts draining to those accounts (e.g. the application's,
+    so a DMS task reading the old endpoint is not interrupted). RDS and Aurora
+    don't grant KILL on other users' sessions, so `mysql.rds_kill` is used
+    where it exists.
+    """
+
+    def __init__(
+        self,
+        conn: Connection,
+        batch_size: int = 50,
+        interval: float = 0.5,
+        users: Sequence[str] = ()
+    ):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.interval = interval
+        self.users = set(users)
+        self.report = DrainReport()
+        self._kill_sql = None
+        self._own_id = None
+
+    def sessions(self) -> List[Session]:
+        """Client sessions currently open on the endpoint (none on SQLite stand-ins)."""
+        if self.conn.dialect == "sqlite":
+            return []
+        if self._own_id is None:
+            self._own_id = self.conn.query_one("SELECT CONNECTION_ID()")[0]
+        rows = self.conn.query("SELECT id, user, host, command, time FROM information_schema.processlist")
+        return [
+            Session(int(row[0]), row[1], row[2] or "", row[3], int(row[4] or 0)) for row in rows
+            if row[0] != self._own_id and row[1] not in SYSTEM_USERS and row[3] not in SYSTEM_COMMANDS
+            and (not self.users or row[1] in self.users)
+        ]
+
+    def kill(self, session_id: int) -> bool:
+        """Terminate one session; False if it had already gone."""
+        if self._kill_sql is None:
+            has_rds_kill = self.conn.query_one(
+                "SELECT COUNT(*) FROM information_schema.routines"
+                " WHERE routine_schema = 'mysql' AND routine_name = 'rds_kill'"
+            )[0]
+            self._kill_sql = "CALL mysql.rds_kill(%s)" if has_rds_kill else "KILL %s"
+        try:
+            self.conn.execute(self._kill_sql, (session_id,))
+            return True
+        except Exception as e:  # 1094 Unknown thread id: it disconnected on its own
+            if "1094" in str(e) or "Unknown thread" in str(e):
+                return False
+            raise
+
+    def drain(self, timeout: float = 60.0) -> DrainReport:
+        """
+        Kill sessions batch by batch until none are left or `timeout` expires.
+
+        Each round re-reads the processlist, kills up to `batch_size` sessions
+        (idle first, then longest-running) and waits `interval` for their pools
+        to reconnect through the new CNAME.
+        """
+        started = time.perf_counter()
+        deadline = time.monotonic() + timeout
+        seen, killed = set(), set()
+        while True:
+            current = self.sessions()
+            if not seen:
+                self.report.sessions_found = len(current)
+            else:
+                self.report.late_sessions += sum(1 for s in current if s.id not in seen)
+            seen.update(s.id for s in current)
+            if not current or time.monotonic() >= deadline:
+                self.report.remaining = len(current)
+                break
+            # Killed sessions can linger while they roll back; they are waited for, not killed again
+            pending = [s for s in current if s.id not in killed]
+            batch = sorted(pending, key=lambda s: (s.command != "Sleep", -s.seconds))[:self.batch_size]
+            for session in batch:
+                if self.kill(session.id):
+                    self.report.sessions_killed += 1
+                killed.add(session.id)
+            if batch:
+                self.report.rounds += 1
+            time.sleep(self.interval)
+        self.report.seconds = round(time.perf_counter() - started, 3)
+        return self.report
+
+
+# -- convergence stage ------------------------------------------------------
+
+@dataclass
+class ResolverReport:
+    resolver: str
+    answer: Optional[str] = None
+    converged_ms: Optional[float] = None
+    queries: int = 0
+    errors: int = 0
+    last_error: Optional[str] = None
+
+
+@dataclass
+class ConvergenceReport:
+    """Milliseconds are measured from the start of the stage, right after the flip."""
+
+    expected: str
+    insync_ms: Optional[float] = None
+    resolvers: List[ResolverReport] = field(default_factory=list)
+    dns_converged_ms: Optional[float] = None
+    drain: Optional[DrainReport] = None
+    time_to_full_convergence_ms: Optional[float] = None
+
+    @property
+    def dns_converged(self) -> bool:
+        return self.insync_ms is not None and all(r.converged_ms is not None for r in self.resolvers)
+
+    @property
+    def converged(self) -> bool:
+        return self.dns_converged and (self.drain is None or self.drain.remaining == 0)
+
+    def to_dict(self) -> Dict:
+        return dict(asdict(self), dns_converged=self.dns_converged, converged=self.converged)
+
+
+class ConvergenceStage:
+    """
+    Waits for the flip to reach Route 53, every resolver and the old endpoint's sessions.
+
+    Args:
+        route53_client: boto3 Route 53 client (or DryRunRoute53)
+        change_id: Change returned by the flip
+        record_name: Record that was flipped
+        expected: Endpoint the record now points at
+        resolvers: Resolvers to query ("host[:port]"); empty to rely on INSYNC alone
+        old_conn: Open connection to the old endpoint; None to skip draining
+        timeout: Seconds to wait for Route 53 and the resolvers
+        grace: Seconds to wait after DNS converged before draining (client-side caches, the record TTL)
+        drainer_options: SessionDrainer options (batch_size, interval, users)
+        drain_timeout: Seconds to keep draining
+        on_phase: Called with INSYNC, DNS_CONVERGED and SESSIONS_DRAINED as they happen
+    """
+
+    def __init__(
+        self,
+        route53_client,
+        change_id: str,
+        record_name: str,
+        expected: str,
+        resolvers: Sequence[str] = (),
+        old_conn: Optional[Connection] = None,
+        timeout: float = 120.0,
+        grace: float = 0.0,
+        drain_timeout: float = 60.0,
+        on_phase: Optional[Callable[[str], None]] = None,
+        query_timeout: float = 1.0,
+        **drainer_options
+    ):
+        self.route53 = route53_client
+        self.change_id = change_id
+        self.record_name = record_name
+        self.timeout = timeout
+        self.grace = grace
+        self.drain_timeout = drain_timeout
+        self.query_timeout = query_timeout
+        self.on_phase = on_phase or (lambda phase: None)
+        self.drainer = SessionDrainer(old_conn, **drainer_options) if old_conn is not None else None
+        self.report = ConvergenceReport(expected=_normalize(expected), resolvers=[ResolverReport(r) for r in resolvers])
+        self._started = None
+
+    def _elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self._started) * 1000, 1)
+
+    async def _poll(self, check, deadline: float, first_interval: float = 0.05, max_interval: float = 1.0) -> bool:
+        """poll_until() for coroutines: other checks run while this one sleeps."""
+        interval = first_interval
+        while True:
+            if await check():
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            await asyncio.sleep(min(interval, remaining))
+            interval = min(interval * 1.5, max_interval)
+
+    async def _wait_insync(self, deadline: float) -> None:
+        loop = asyncio.get_running_loop()
+
+        async def insync():
+            change = await loop.run_in_executor(None, lambda: self.route53.get_change(Id=self.change_id))
+            return change["ChangeInfo"]["Status"] == "INSYNC"
+
+        if await self._poll(insync, deadline):
+            self.report.insync_ms = self._elapsed_ms()
+            self.on_phase(INSYNC)
+
+    async def _wait_resolver(self, resolver: ResolverReport, deadline: float) -> None:
+        async def converged():
+            resolver.queries += 1
+            try:
+                answer = await query_cname(self.record_name, resolver.resolver, self.query_timeout)
+            except (asyncio.TimeoutError, OSError, ValueError) as e:
+                resolver.errors += 1
+                resolver.last_error = str(e) or type(e).__name__
+                return False
+            resolver.answer = answer
+            return answer is not None and _normalize(answer) == self.report.expected
+
+        if await self._poll(converged, deadline):
+            resolver.converged_ms = self._elapsed_ms()
+
+    async def _run(self) -> ConvergenceReport:
+        self._started = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        await asyncio.gather(
+            self._wait_insync(deadline), *(self._wait_resolver(r, deadline) for r in self.report.resolvers)
+        )
+        if not self.report.dns_converged:
+            return self.report  # draining now would send clients back to the old answer
+        self.report.dns_converged_ms = self._elapsed_ms()
+        if self.report.resolvers:
+            self.on_phase(DNS_CONVERGED)
+        if self.drainer is not None:
+            await asyncio.sleep(self.grace)
+            loop = asyncio.get_running_loop()
+            self.report.drain = await loop.run_in_executor(None, self.drainer.drain, self.drain_timeout)
+            if self.report.drain.remaining == 0:
+                self.on_phase(SESSIONS_DRAINED)
+        if self.report.converged:
+            self.report.time_to_full_convergence_ms = self._elapsed_ms()
+        return self.report
+
+    def run(self) -> ConvergenceReport:
+        return asyncio.run(self._run())
+
+
+def _ms(value: Optional[float]) -> str:
+    return f"{value:10.1f} ms" if value is not None else "  not converged"
+
+
+def print_convergence(report: ConvergenceReport) -> None:
+    """Per-resolver and draining summary of a ConvergenceStage run."""
+    print(f"  Convergence on {report.expected}:")
+    print(f"    Route 53 INSYNC:          {_ms(report.insync_ms)}")
+    for r in report.resolvers:
+        detail = f"{r.queries} queries" + (f", {r.errors} errors ({r.last_error})" if r.errors else "")
+        print(f"    {r.resolver:<25} {_ms(r.converged_ms)}  answer={r.answer}  [{detail}]")
+    if report.drain is not None:
+        d = report.drain
+        print(
+            f"    Old endpoint sessions:    {d.sessions_found} found, {d.sessions_killed} killed in {d.rounds} rounds, "
+            f"{d.late_sessions} late, {d.remaining} remaining ({d.seconds:.1f}s)"
+        )
+    print(f"    Time to full convergence: {_ms(report.time_to_full_convergence_ms)}")
+
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Synthetic `students` data for production-scale migration rehearsals.
+
+Bulk mode streams --rows rows into the source with parallel writer
+connections. Each writer claims the next id range (one chunk), generates it,
+loads it in a single transaction and moves on, so memory stays at one chunk
+per writer whatever the total. Rows are a pure function of their id, which
+makes loads reproducible and lets ranges be loaded in any order.
+
+    insert     executemany() of batched INSERTs (the MySQL driver turns them
+               into multi-row statements)
+    load-data  LOAD DATA LOCAL INFILE from a generated chunk file (MySQL only)
+
+Live mode (--live-ops) runs alongside, or on its own: a mix of INSERT /
+UPDATE / DELETE paced at a target ops/sec, the way the application would
+write during DMS full load and CDC. Both modes report achieved throughput.
+"""
+
+import sys
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from db import Connection, connect  # noqa: E402
+from replication_lag import percentile  # noqa: E402
+
+FIRST_NAMES = (
+    "Alice", "Bob", "Charlie", "Diana", "Ethan", "Fiona", "George", "Hannah", "Isaac", "Julia",
+    "Kevin", "Luna", "Michael", "Nina", "Oscar", "Penelope", "Quentin", "Rachel", "Steve", "Taylor",
+)
+LAST_NAMES = (
+    "Johnson", "Smith", "Brown", "Prince", "Hunt", "Chen", "Washington", "Montana", "Newton", "Roberts",
+    "Hart", "Lovegood", "Jordan", "Simone", "Garcia", "Cruz", "Green", "Jobs", "Swift", "Okafor",
+)
+# created_at spreads over one year from here
+EPOCH = 1672531200  # 2023-01-01T00:00:00Z
+INSERT_SQL = "INSERT INTO students (id, name, grade_level, created_at) VALUES (%s, %s, %s, %s)"
+# Live traffic keeps a uniform sample of this many latencies, however long it runs
+LATENCY_RESERVOIR = 10000
+
+
+def synthetic_row(student_id: int) -> Tuple[int, str, int, str]:
+    """The row for `student_id`; the same id always gives the same row."""
+    name = (
+        f"{FIRST_NAMES[student_id * 7919 % len(FIRST_NAMES)]} "
+        f"{LAST_NAMES[student_id * 104729 % len(LAST_NAMES)]} {student_id}"
+    )
+    created_at = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(EPOCH + student_id * 37 % 31536000))
+    return student_id, name, 9 + student_id % 4, created_at
+
+
+def ensure_students_table(conn: Connection) -> None:
+    """Create `students` (same shape as sql/baseline/001_create_schema.sql) if it doesn't exist."""
+    if conn.dialect == "sqlite":
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS students ("
+            " id INTEGER PRIMARY KEY, name VARCHAR(255) NOT NULL, grade_level INT NOT NULL,"
+            " created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        )
+    else:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS students ("
+            " id INT AUTO_INCREMENT PRIMARY KEY, name VARCHAR(255) NOT NULL, grade_level INT NOT NULL,"
+            " created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        )
+
+
+def next_free_id(conn: Connection) -> int:
+    return (conn.query_one("SELECT MAX(id) FROM students")[0] or 0) + 1
+
+
+@dataclass
+class LoadReport:
+    rows: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return round(self.rows / self.seconds, 1) if self.seconds else 0.0
+
+
+@dataclass
+class TrafficReport:
+    target_ops: float
+    ops: Dict[str, int] = field(default_factory=lambda: {"insert": 0, "update": 0, "delete": 0})
+    errors: int = 0
+    seconds: float = 0.0
+    latency_samples: int = 0
+    latencies_ms: List[float] = field(default_factory=list, repr=False)
+
+    @property
+    def achieved_ops(self) -> float:
+        return round(sum(self.ops.values()) / self.seconds, 1) if self.seconds else 0.0
+
+    def record_latency(self, ms: float, rng: random.Random) -> None:
+        """Add a latency to the reservoir (at most LATENCY_RESERVOIR kept, each equally likely)."""
+        self.latency_samples += 1
+        if len(self.latencies_ms) < LATENCY_RESERVOIR:
+            self.latencies_ms.append(ms)
+            return
+        slot = rng.randrange(self.latency_samples)
+        if slot < LATENCY_RESERVOIR:
+            self.latencies_ms[slot] = ms
+
+    def latency_ms(self, pct: float) -> float:
+        return round(percentile(sorted(self.latencies_ms), pct), 2)
+
+
+def _chunks(start_id: int, rows: int, chunk_size: int) -> Iterator[Tuple[int, int]]:
+    for lo in range(start_id, start_id + rows, chunk_size):
+        yield lo, min(lo + chunk_size, start_id + rows)
+
+
+def _load_chunk(conn: Connection, lo: int, hi: int, method: str, batch_size: int) -> int:
+    if method == "load-data":
+        with tempfile.NamedTemporaryFile("w", suffix=".tsv", delete=False) as chunk_file:
+            for row in map(synthetic_row, range(lo, hi)):
+                chunk_file.write("\t".join(map(str, row)) + "\n")
+        try:
+            return conn.execute(
+                "LOAD DATA LOCAL INFILE %s INTO TABLE students"
+                " FIELDS TERMINATED BY '\\t' (id, name, grade_level, created_at)",
+                (chunk_file.name,),
+            )
+        finally:
+            os.unlink(chunk_file.name)
+    with conn.transaction():
+        for batch_lo in range(lo, hi, batch_size):
+            conn.executemany(INSERT_SQL, map(synthetic_row, range(batch_lo, min(batch_lo + batch_size, hi))))
+    return hi - lo
+
+
+def bulk_load(
+    url: str,
+    rows: int,
+    start_id: Optional[int] = None,
+    writers: int = 4,
+    chunk_size: int = 10000,
+    batch_size: int = 1000,
+    method: str = "insert",
+    progress: bool = False
+) -> LoadReport:
+    """
+    Stream `rows` synthetic students into the database at `url`.
+
+    Args:
+        url: Database URL
+        rows: Rows to load
+        start_id: First id (default: MAX(id) + 1)
+        writers: Parallel writer connections
+        chunk_size: Rows per chunk (one transaction / one LOAD DATA file)
+        batch_size: Rows per INSERT batch within a chunk
+        method: "insert" or "load-data"
+        progress: Print a line per 10 chunks
+
+    Returns:
+        Rows loaded and elapsed time
+    """
+    if method not in ("insert", "load-data"):
+        raise ValueError(f"Unknown method {method!r}")
+    with connect(url) as conn:
+        if method == "load-data" and conn.dialect != "mysql":
+            raise ValueError("load-data needs a MySQL endpoint")
+        ensure_students_table(conn)
+        if start_id is None:
+            start_id = next_free_id(conn)
+
+    report = LoadReport()
+    chunks = _chunks(start_id, rows, chunk_size)
+    lock = threading.Lock()
+    started = time.perf_counter()
+
+    def writer():
+        # LOAD DATA LOCAL INFILE in _load_chunk is the only reason to allow local files
+        with connect(url, local_infile=method == "load-data") as conn:
+            while True:
+                with lock:
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    return
+                loaded = _load_chunk(conn, *chunk, method, batch_size)
+                with lock:
+                    report.rows += loaded
+                    report.chunks += 1
+                    if progress and report.chunks % 10 == 0:
+                        elapsed = time.perf_counter() - started
+                        print(f"  {report.rows:>12,} rows  {report.rows / elapsed:>10,.0f} rows/s")
+
+    with ThreadPoolExecutor(max_workers=writers, thread_name_prefix="loader") as pool:
+        for future in [pool.submit(writer) for _ in range(writers)]:
+            future.result()
+    report.seconds = round(time.perf_counter() - started, 3)
+    return report
+
+
+class LiveTraffic:
+    """
+    Application-like write traffic at a fixed rate.
+
+    Each worker paces itself to ops_per_sec / workers on an absolute schedule,
+    so a slow statement is caught up on rather than lowering the rate. Inserts
+    take ids from `first_id` upwards, so they never collide with a bulk load
+    running below it.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        ops_per_sec: float,
+        mix: Sequence[float] = (70, 25, 5),
+        workers: int = 2,
+        first_id: Optional[int] = None,
+        seed: Optional[int] = None
+    ):
+        self.url = url
+        self.ops_per_sec = ops_per_sec
+        self.mix = mix
+        self.workers = workers
+        self.report = TrafficReport(target_ops=ops_per_sec)
+        self._seed = seed
+        self._next_id = first_id
+        self._lowest_id = 1
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._started = None
+
+    def _claim_id(self) -> int:
+        with self._lock:
+            self._next_id += 1
+            return self._next_id - 1
+
+    def _existing_id(self, rng: random.Random) -> int:
+        return rng.randint(self._lowest_id, max(self._lowest_id, self._next_id - 1))
+
+    def _one_op(self, conn: Connection, rng: random.Random) -> str:
+        kind = rng.choices(("insert", "update", "delete"), weights=self.mix)[0]
+        if kind == "insert":
+            conn.execute(INSERT_SQL, synthetic_row(self._claim_id()))
+        elif kind == "update":
+            conn.execute("UPDATE students SET grade_level = %s WHERE id = %s", (rng.randint(9, 12), self._existing_id(rng)))
+        else:
+            conn.execute("DELETE FROM students WHERE id = %s", (self._existing_id(rng),))
+        return kind
+
+    def _run(self, index: int) -> None:
+        rng = random.Random(None if self._seed is None else self._seed + index)
+        interval = self.workers / self.ops_per_sec
+        with connect(self.url) as conn:
+            next_at = time.monotonic() + interval * index / self.workers
+            while not self._stop.is_set():
+                delay = next_at - time.monotonic()
+                if delay > 0 and self._stop.wait(delay):
+                    break
+                began = time.perf_counter()
+                try:
+                    kind = self._one_op(conn, rng)
+                except Exception:
+                    with self._lock:
+                        self.report.errors += 1
+                    conn.ping()
+                else:
+                    with self._lock:
+                        self.report.ops[kind] += 1
+                        self.report.record_latency((time.perf_counter() - began) * 1000, rng)
+                next_at += interval
+
+    def start(self) -> "LiveTraffic":
+        with connect(self.url) as conn:
+            ensure_students_table(conn)
+            if self._next_id is None:
+                self._next_id = next_free_id(conn)
+            self._lowest_id = conn.query_one("SELECT MIN(id) FROM students")[0] or 1
+        self._stop.clear()
+        self._started = time.perf_counter()
+        self._threads = [
+            threading.Thread(target=self._run, args=(i,), name=f"live-traffic-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self) -> TrafficReport:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self.report.seconds = round(time.perf_counter() - self._started, 3)
+        return self.report
+
+
+def print_load_report(report: LoadReport) -> None:
+    print(f"Bulk load: {report.rows:,} rows in {report.chunks} chunks, {report.seconds:.1f}s "
+          f"({report.rows_per_second:,.0f} rows/s)")
+
+
+def print_traffic_report(report: TrafficReport) -> None:
+    ops = "  ".join(f"{kind} {count}" for kind, count in report.ops.items())
+    print(f"Live traffic: {report.achieved_ops:,.1f} ops/s achieved of {report.target_ops:g} target "
+          f"over {report.seconds:.1f}s  ({ops}, errors {report.errors})")
+    if report.latencies_ms:
+        print(f"  latency ms: p50 {report.latency_ms(50)}  p99 {report.latency_ms(99)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load synthetic students and/or generate live write traffic"
+    )
+    parser.add_argument(
+        "--url",
+        required=True,
+        help="Database URL (mysql://user@host/db or sqlite:///path); password from DB_PASSWORD"
+    )
+    parser.add_argument(
+        "--rows",
+        type=int,
+        default=0,
+        help="Rows to bulk load (default: 0, live traffic only)"
+    )
+    parser.add_argument(
+        "--start-id",
+        type=int,
+        help="First id for the bulk load (default: MAX(id) + 1)"
+    )
+    parser.add_argument(
+        "--writers",
+        type=int,
+        default=4,
+        help="Parallel writer connections for the bulk load (default: 4)"
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=10000,
+        help="Rows per chunk / transaction (default: 10000)"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1000,
+        help="Rows per INSERT batch (default: 1000)"
+    )
+    parser.add_argument(
+        "--method",
+        choices=("insert", "load-data"),
+        default="insert",
+        help="insert (batched INSERTs) or load-data (LOAD DATA LOCAL INFILE, MySQL only)"
+    )
+    parser.add_argument(
+        "--live-ops",
+        type=float,
+        default=0.0,
+        help="Also run live INSERT/UPDATE/DELETE traffic at this many ops/s"
+    )
+    parser.add_argument(
+        "--mix",
+        default="70,25,5",
+        help="Live traffic insert,update,delete weights (default: 70,25,5)"
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        help="Seconds of live traffic, bulk load included; it never stops before the bulk load finishes "
+             "(default: until the bulk load finishes, else 60)"
+    )
+
+    args = parser.parse_args()
+
+    traffic = None
+    traffic_until = None
+    if args.live_ops:
+        with connect(args.url) as conn:
+            ensure_students_table(conn)
+            first_id = args.start_id or next_free_id(conn)
+        # Live inserts go above the range the bulk load is about to fill
+        traffic = LiveTraffic(
+            args.url, args.live_ops, [float(w) for w in args.mix.split(",")], first_id=first_id + args.rows
+        ).start()
+        args.start_id = first_id
+        if args.duration or not args.rows:
+            traffic_until = time.monotonic() + (args.duration or 60)
+
+    try:
+        if args.rows:
+            print_load_report(bulk_load(
+                args.url, args.rows, args.start_id, args.writers, args.chunk_size, args.batch_size,
+                args.method, progress=True
+            ))
+        if traffic_until is not None:
+            time.sleep(max(0.0, traffic_until - time.monotonic()))
+    finally:
+        if traffic:
+            print_traffic_report(traffic.stop())
+
+
+if __name__ == "__main__":
+    main()
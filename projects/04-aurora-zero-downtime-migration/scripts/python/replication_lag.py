@@ -0,0 +1,272 @@
+"""
+End-to-end replication lag measurement with a heartbeat row.
+
+A writer thread stamps a heartbeat row on the source every `interval` seconds
+(sequence number + microsecond wall-clock time); a poller thread reads that row
+on the target several times per interval. When a new sequence number shows up
+on the target, lag = now - time it was written. That is the true CDC delay
+(DMS capture + apply), not an engine-reported estimate. If replication stalls,
+the current lag keeps growing from the oldest heartbeat the target hasn't shown
+yet, so a stuck task is never reported as "0 lag".
+
+Each side keeps one persistent connection for the whole run. Percentiles are
+computed over a sliding window of samples and can be served to Prometheus.
+"""
+
+import math
+import socket
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+from db import Connection
+from utils import poll_until
+
+HEARTBEAT_TABLE = "migration_heartbeat"
+# Unseen heartbeats remembered while replication is stalled (~1h at 2/s)
+MAX_PENDING = 8192
+
+
+def ensure_heartbeat_table(conn: Connection, table: str = HEARTBEAT_TABLE) -> None:
+    """Create the heartbeat table (DMS replicates it like any other table in the schema)."""
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {table} ("
+        " source_id VARCHAR(64) NOT NULL PRIMARY KEY,"
+        " seq BIGINT NOT NULL,"
+        " written_us BIGINT NOT NULL)"
+    )
+
+
+def percentile(ordered, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class HeartbeatLagMonitor:
+    """
+    Measures source -> target replication lag from a heartbeat row.
+
+    Use `start()`/`stop()` for background sampling, or call `beat()` and
+    `poll()` directly to drive it step by step.
+    """
+
+    def __init__(
+        self,
+        source: Connection,
+        target: Connection,
+        interval: float = 0.5,
+        poll_interval: Optional[float] = None,
+        window: float = 300.0,
+        source_id: Optional[str] = None,
+        table: str = HEARTBEAT_TABLE,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.source = source
+        self.target = target
+        self.interval = interval
+        self.poll_interval = poll_interval or interval / 5
+        self.window = window
+        self.source_id = source_id or socket.gethostname()[:64]
+        self.table = table
+        self.clock = clock
+        self.errors = 0
+        self._pending = OrderedDict()  # seq -> written_at, not yet seen on the target
+        self._samples = deque()  # (observed_at, lag_seconds)
+        self._last_lag = None
+        self._seen_seq = None
+        self._seq = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    # -- sampling ----------------------------------------------------------
+
+    def beat(self) -> int:
+        """Write the next heartbeat to the source; returns its sequence number."""
+        if self._seq is None:
+            ensure_heartbeat_table(self.source, self.table)
+            row = self.source.query_one(f"SELECT seq FROM {self.table} WHERE source_id = %s", (self.source_id,))
+            self._seq = row[0] if row else 0
+            if not row:
+                self.source.execute(
+                    f"INSERT INTO {self.table} (source_id, seq, written_us) VALUES (%s, %s, %s)",
+                    (self.source_id, self._seq, int(self.clock() * 1_000_000)),
+                )
+        self._seq += 1
+        written_at = self.clock()
+        self.source.execute(
+            f"UPDATE {self.table} SET seq = %s, written_us = %s WHERE source_id = %s",
+            (self._seq, int(written_at * 1_000_000), self.source_id),
+        )
+        with self._lock:
+            self._pending[self._seq] = written_at
+            while len(self._pending) > MAX_PENDING:
+                self._pending.popitem(last=False)
+        return self._seq
+
+    def poll(self) -> Optional[float]:
+        """Read the heartbeat on the target; returns a new lag sample (seconds) if one arrived."""
+        try:
+            row = self.target.query_one(
+                f"SELECT seq, written_us FROM {self.table} WHERE source_id = %s", (self.source_id,)
+            )
+        except Exception:
+            # Table not replicated yet, or a transient error on the target
+            self._count_error()
+            try:
+                self.target.ping()
+            except Exception:
+                self._count_error()  # still unreachable: try again on the next poll
+            return None
+        if row is None:
+            return None
+        seq, written_us = row
+        with self._lock:
+            if seq not in self._pending:
+                return None  # already seen, or written before this run
+            observed_at = self.clock()
+            lag = max(0.0, observed_at - written_us / 1_000_000)
+            for pending in list(self._pending):
+                if pending > seq:
+                    break
+                del self._pending[pending]
+            self._seen_seq = seq
+            self._last_lag = lag
+            self._samples.append((observed_at, lag))
+            while self._samples and self._samples[0][0] < observed_at - self.window:
+                self._samples.popleft()
+        return lag
+
+    def _count_error(self) -> None:
+        # Both background threads and callers of poll() count errors
+        with self._lock:
+            self.errors += 1
+
+    def current_lag(self) -> Optional[float]:
+        """Lag right now: grows while heartbeats are written but not replicated."""
+        with self._lock:
+            if not self._pending:
+                return self._last_lag
+            # The oldest unseen heartbeat has been in flight this long, so the
+            # lag is at least that even before it shows up on the target
+            in_flight = self.clock() - next(iter(self._pending.values()))
+            return max(in_flight, self._last_lag or 0.0)
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Window percentiles and current lag, in milliseconds."""
+        with self._lock:
+            lags = sorted(lag for _, lag in self._samples)
+            errors = self.errors
+        current = self.current_lag()
+
+        def ms(value):
+            return round(value * 1000, 2) if value is not None else None
+
+        return {
+            "samples": len(lags),
+            "errors": errors,
+            "current_ms": ms(current),
+            "p50_ms": ms(percentile(lags, 50)) if lags else None,
+            "p95_ms": ms(percentile(lags, 95)) if lags else None,
+            "p99_ms": ms(percentile(lags, 99)) if lags else None,
+            "max_ms": ms(lags[-1]) if lags else None,
+        }
+
+    def wait_for_seq(self, seq: int, timeout: float) -> bool:
+        """Poll the target (adaptively) until heartbeat `seq` or a later one has arrived."""
+        def arrived():
+            self.poll()
+            with self._lock:
+                return self._seen_seq is not None and self._seen_seq >= seq
+
+        return poll_until(arrived, timeout)
+
+    # -- background threads ------------------------------------------------
+
+    def _loop(self, step: Callable[[], object], every: float) -> None:
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                step()
+            except Exception:
+                self._count_error()
+            self._stop.wait(max(0.0, every - (time.monotonic() - started)))
+
+    def start(self) -> "HeartbeatLagMonitor":
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._loop, args=(self.beat, self.interval), name="heartbeat-writer", daemon=True),
+            threading.Thread(target=self._loop, args=(self.poll, self.poll_interval), name="heartbeat-poller", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def wait_for_lag(self, max_lag: float, timeout: float) -> bool:
+        """Block until a heartbeat written after this call arrives within `max_lag` seconds."""
+        deadline = time.monotonic() + timeout
+        after = self._seq or 0
+        while time.monotonic() < deadline:
+            with self._lock:
+                fresh = self._seen_seq is not None and self._seen_seq > after
+                lag = self._last_lag
+            if fresh and lag is not None and lag <= max_lag:
+                return True
+            time.sleep(self.poll_interval)
+        return False
+
+    # -- Prometheus --------------------------------------------------------
+
+    def prometheus_text(self) -> str:
+        with self._lock:
+            lags = sorted(lag for _, lag in self._samples)
+        current = self.current_lag()
+        label = f'source_id="{self.source_id}"'
+        lines = [
+            "# HELP replication_lag_seconds Heartbeat replication lag over the sliding window.",
+            "# TYPE replication_lag_seconds summary",
+        ]
+        for quantile in (0.5, 0.95, 0.99):
+            lines.append(f'replication_lag_seconds{{{label},quantile="{quantile}"}} {percentile(lags, quantile * 100)!r}')
+        lines += [
+            f"replication_lag_seconds_sum{{{label}}} {sum(lags)!r}",
+            f"replication_lag_seconds_count{{{label}}} {len(lags)}",
+            "# HELP replication_lag_current_seconds Current replication lag (grows while replication is stalled).",
+            "# TYPE replication_lag_current_seconds gauge",
+            f"replication_lag_current_seconds{{{label}}} {current if current is not None else float('nan')!r}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def serve_metrics(monitor: HeartbeatLagMonitor, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve `monitor` on http://host:port/metrics from a daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = monitor.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="lag-metrics", daemon=True).start()
+    return server
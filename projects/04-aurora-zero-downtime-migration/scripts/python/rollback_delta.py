@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Delta replay of writes made on Aurora after cutover, for a fast rollback.
+
+During the cutover prepare phase, change-capture triggers are installed on
+Aurora: every INSERT/UPDATE/DELETE on a tracked table appends (table, row id)
+to a changelog table. Inside the cutover window, when the two databases are
+known to be identical, the boundary is recorded:
+
+- the changelog sequence number (entries after it are post-cutover writes)
+- the high-water id of every tracked table
+- Aurora's wall-clock time and binlog position (when binlog is enabled)
+
+A rollback then reads only the changelog after the boundary, keyset-paginated
+by sequence number, fetches the current version of those rows from Aurora and
+applies them to RDS in bulk: idempotent upserts for rows that exist, deletes
+for rows that don't. Replaying the same entries twice gives the same result,
+so passes can be repeated until the remaining delta is empty.
+
+Without change capture the boundary still holds the high-water ids, and the
+replay falls back to copying rows above them (inserts only).
+
+The triggers cost a changelog row per write for as long as they exist. An
+aborted cutover removes them; after a successful one, remove them once the
+rollback window is over:
+
+    python rollback_delta.py --remove-change-capture --url mysql://admin@<aurora>/db --tables students
+
+With binary logging enabled on Aurora, creating the triggers needs
+log_bin_trust_function_creators=1 in the cluster parameter group.
+"""
+
+import sys
+import argparse
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from db import Connection, connect  # noqa: E402
+
+CHANGELOG_TABLE = "migration_rollback_changelog"
+
+
+def _trigger_name(table: str, operation: str) -> str:
+    return f"{table}_rollback_{operation.lower()}"
+
+
+def install_change_capture(conn: Connection, tables: Sequence[str]) -> None:
+    """Create the changelog table and the capture triggers on `tables` (idempotent)."""
+    if conn.dialect == "sqlite":
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {CHANGELOG_TABLE} ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT, table_name VARCHAR(64) NOT NULL, row_id BIGINT NOT NULL)"
+        )
+    else:
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {CHANGELOG_TABLE} ("
+            " seq BIGINT AUTO_INCREMENT PRIMARY KEY, table_name VARCHAR(64) NOT NULL, row_id BIGINT NOT NULL)"
+        )
+    for table in tables:
+        for operation, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            name = _trigger_name(table, operation)
+            body = f"INSERT INTO {CHANGELOG_TABLE} (table_name, row_id) VALUES ('{table}', {row}.id)"
+            if conn.dialect == "sqlite":
+                conn.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {operation} ON {table} BEGIN {body}; END"
+                )
+            else:
+                conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+                conn.execute(f"CREATE TRIGGER {name} AFTER {operation} ON {table} FOR EACH ROW {body}")
+
+
+def remove_change_capture(conn: Connection, tables: Sequence[str]) -> None:
+    """Drop the capture triggers and the changelog."""
+    for table in tables:
+        for operation in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(f"DROP TRIGGER IF EXISTS {_trigger_name(table, operation)}")
+    conn.execute(f"DROP TABLE IF EXISTS {CHANGELOG_TABLE}")
+
+
+def capture_boundary(conn: Connection, tables: Sequence[str]) -> Dict:
+    """
+    Record the cutover boundary on Aurora (call while writes are stopped).
+
+    Args:
+        conn: Connection to Aurora
+        tables: Tables whose post-cutover writes a rollback must replay
+
+    Returns:
+        JSON-serialisable boundary (see module docstring)
+    """
+    boundary = {
+        "captured_at": time.time(),
+        "tables": {
+            table: {"high_water_id": conn.query_one(f"SELECT MAX(id) FROM {table}")[0] or 0}
+            for table in tables
+        },
+        "changelog_seq": None,
+        "binlog": None,
+    }
+    try:
+        boundary["changelog_seq"] = conn.query_one(f"SELECT COALESCE(MAX(seq), 0) FROM {CHANGELOG_TABLE}")[0]
+    except Exception:
+        pass  # change capture not installed: high-water ids only
+    if conn.dialect == "mysql":
+        try:
+            status = conn.query_one("SHOW MASTER STATUS")
+            if status:
+                boundary["binlog"] = {"file": status[0], "position": status[1]}
+        except Exception:
+            pass  # binlog disabled on the cluster
+    return boundary
+
+
+def save_boundary(path: str, boundary: Dict) -> None:
+    Path(path).write_text(json.dumps(boundary, indent=2))
+
+
+def load_boundary(path: str) -> Dict:
+    return json.loads(Path(path).read_text())
+
+
+@dataclass
+class ReplayReport:
+    changelog_entries: int = 0
+    rows_upserted: int = 0
+    rows_deleted: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows(self) -> int:
+        return self.rows_upserted + self.rows_deleted
+
+    @property
+    def rows_per_second(self) -> float:
+        return round(self.rows / self.seconds, 1) if self.seconds else 0.0
+
+
+class DeltaReplayer:
+    """Applies post-boundary changes from Aurora (`source`) to RDS (`dest`)."""
+
+    def __init__(self, source: Connection, dest: Connection, boundary: Dict, batch_size: int = 1000):
+        self.source = source
+        self.dest = dest
+        self.boundary = boundary
+        self.batch_size = batch_size
+        self.report = ReplayReport()
+        self.changelog = boundary.get("changelog_seq") is not None
+        self._last_seq = boundary.get("changelog_seq") or 0
+        self._last_ids = {table: info["high_water_id"] for table, info in boundary["tables"].items()}
+        self._columns: Dict[str, List[str]] = {}
+
+    def columns(self, table: str) -> List[str]:
+        if table not in self._columns:
+            self._columns[table] = self.source.columns(table)
+        return self._columns[table]
+
+    def pending(self) -> int:
+        """Changelog entries (or high-water rows) not replayed yet."""
+        if self.changelog:
+            return self.source.query_one(f"SELECT COUNT(*) FROM {CHANGELOG_TABLE} WHERE seq > %s", (self._last_seq,))[0]
+        return sum(
+            self.source.query_one(f"SELECT COUNT(*) FROM {table} WHERE id > %s", (last_id,))[0]
+            for table, last_id in self._last_ids.items()
+        )
+
+    def _apply(self, table: str, ids: Sequence[int]) -> None:
+        columns = self.columns(table)
+        placeholders = ", ".join(["%s"] * len(ids))
+        rows = self.source.query(f"SELECT {', '.join(columns)} FROM {table} WHERE id IN ({placeholders})", ids)
+        key = columns.index("id")
+        gone = sorted(set(ids) - {row[key] for row in rows})
+        with self.dest.transaction():
+            if rows:
+                self.dest.executemany(self.dest.upsert_sql(table, columns), rows)
+            if gone:
+                self.dest.execute(
+                    f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(gone))})", gone
+                )
+        self.report.rows_upserted += len(rows)
+        self.report.rows_deleted += len(gone)
+
+    def replay_batch(self) -> int:
+        """Replay the next batch; returns the number of changelog entries / rows consumed."""
+        started = time.perf_counter()
+        consumed = 0
+        if self.changelog:
+            entries = self.source.query(
+                f"SELECT seq, table_name, row_id FROM {CHANGELOG_TABLE} WHERE seq > %s ORDER BY seq LIMIT %s",
+                (self._last_seq, self.batch_size),
+            )
+            by_table: Dict[str, set] = {}
+            for _, table, row_id in entries:
+                by_table.setdefault(table, set()).add(row_id)
+            for table, ids in by_table.items():
+                self._apply(table, sorted(ids))
+            if entries:
+                self._last_seq = entries[-1][0]
+            consumed = len(entries)
+            self.report.changelog_entries += consumed
+        else:
+            for table, last_id in self._last_ids.items():
+                ids = [row[0] for row in self.source.query(
+                    f"SELECT id FROM {table} WHERE id > %s ORDER BY id LIMIT %s", (last_id, self.batch_size)
+                )]
+                if ids:
+                    self._apply(table, ids)
+                    self._last_ids[table] = ids[-1]
+                    consumed += len(ids)
+        if consumed:
+            self.report.batches += 1
+        self.report.seconds += time.perf_counter() - started
+        return consumed
+
+    def rewind(self, entries: int) -> None:
+        """
+        Step back over the last `entries` changelog entries so they are replayed again.
+
+        Sequence numbers are assigned at insert but become visible at commit, so
+        an online pass can read past a concurrent transaction's lower number.
+        Replays are idempotent: the final pass, with writes stopped, rewinds by
+        a margin to pick up any such stragglers.
+        """
+        if self.changelog:
+            self._last_seq = max(self.boundary["changelog_seq"], self._last_seq - entries)
+
+    def replay(self) -> int:
+        """Replay batches until the changelog is drained; returns the entries consumed."""
+        consumed = 0
+        while True:
+            done = self.replay_batch()
+            consumed += done
+            if done < self.batch_size:
+                return consumed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Remove the rollback change capture (triggers and changelog) from Aurora"
+    )
+    parser.add_argument(
+        "--remove-change-capture",
+        action="store_true",
+        required=True,
+        help="Drop the capture triggers on --tables and the changelog table"
+    )
+    parser.add_argument(
+        "--url",
+        required=True,
+        help="Aurora database URL (mysql://user@host/db); password from DB_PASSWORD"
+    )
+    parser.add_argument(
+        "--tables",
+        default="students",
+        help="Comma-separated tables the cutover captured (default: students)"
+    )
+
+    args = parser.parse_args()
+
+    tables = [t.strip() for t in args.tables.split(",") if t.strip()]
+    with connect(args.url) as conn:
+        remove_change_capture(conn, tables)
+    print(f"✓ Change capture removed from {', '.join(tables)}")
+
+
+if __name__ == "__main__":
+    main()
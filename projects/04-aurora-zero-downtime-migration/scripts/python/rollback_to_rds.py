@@ -2,61 +2,150 @@
 """
 Rollback script for reverting from Aurora MySQL back to RDS MySQL.
 
-This script performs a rollback:
-1. Flips Route 53 CNAME back to RDS
-2. Restores write access to RDS
+Writes Aurora accepted after the cutover are replayed to RDS instead of being
+lost (see rollback_delta.py), using the boundary saved by cutover_to_aurora.py.
+
+Prepare (writes still flowing to Aurora):
+1. Creates the shared AWS clients, opens connections, loads the boundary and
+   validates the Route 53 change batch
+2. Stops the RDS -> Aurora DMS task (--dms-task-arn) if it is still running:
+   otherwise every replayed write would be applied back to Aurora, overwriting
+   newer updates there
+3. Restores write access to RDS (the replay writes to it)
+4. Replays the delta online until only the last few writes remain
+
+Write-unavailable window:
+5. Sets Aurora to read-only
+6. Replays the remaining delta
+7. Flips the Route 53 CNAME back to RDS and waits for INSYNC
+
+Post-flip, --resolvers are queried until they answer with RDS and the sessions
+left on Aurora are terminated in batches (dns_convergence.py). The run reports the replay rate and the Aurora read-only to writable-on-RDS
+window. --dry-run runs the same sequence against local stand-ins.
 """
 
 import sys
 import argparse
-import boto3
+import json
+from pathlib import Path
+from typing import Optional, Sequence
+
 from botocore.exceptions import ClientError
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from check_replication_status import resolve_endpoints  # noqa: E402
+from cutover_to_aurora import (  # noqa: E402
+    CutoverTimeline, DryRunReplicator, DryRunRoute53, find_read_only_parameter_group, prepare_route53_change,
+    set_rds_read_only, update_route53_record, wait_for_read_only
+)
+from db import Connection, connect  # noqa: E402
+from dns_convergence import INSYNC, ConvergenceStage, print_convergence  # noqa: E402
+from rollback_delta import DeltaReplayer, load_boundary  # noqa: E402
+from utils import (  # noqa: E402
+    create_dms_client, create_rds_client, create_route53_client, poll_until, print_call_summary, reset_call_stats
+)
+
+WINDOW = ("aurora_read_only_requested", "writable_on_rds")
+# DMS task states in which nothing is being applied to the target
+DMS_IDLE_STATES = ("stopped", "failed", "ready")
+
+
+class DryRunDms:
+    """Stand-in for the DMS API: the task is the given DryRunReplicator (None: already stopped)."""
+
+    def __init__(self, replicator: Optional[DryRunReplicator] = None):
+        self.replicator = replicator
+
+    def describe_replication_tasks(self, **kwargs) -> dict:
+        running = self.replicator is not None and self.replicator.running
+        return {"ReplicationTasks": [{"Status": "running" if running else "stopped"}]}
+
+    def stop_replication_task(self, ReplicationTaskArn: str) -> dict:
+        self.replicator.stop()
+        return {"ReplicationTask": {"ReplicationTaskArn": ReplicationTaskArn, "Status": "stopping"}}
+
 
-def update_route53_record(hosted_zone_id: str, record_name: str, rds_endpoint: str, region: str = "us-east-1") -> bool:
+def dms_task_status(dms_client, task_arn: str) -> Optional[str]:
+    """Status of the DMS replication task, None if it no longer exists."""
+    try:
+        tasks = dms_client.describe_replication_tasks(
+            Filters=[{"Name": "replication-task-arn", "Values": [task_arn]}], WithoutSettings=True
+        )["ReplicationTasks"]
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ResourceNotFoundFault":
+            return None
+        raise
+    return tasks[0]["Status"] if tasks else None
+
+
+def ensure_dms_task_stopped(dms_client, task_arn: str, timeout: float = 300.0) -> bool:
     """
-    Update Route 53 CNAME to point back to RDS endpoint.
-    
+    Stop the RDS -> Aurora replication task before RDS takes writes again.
+
+    While it runs, each write replayed into RDS reaches the binlog and DMS
+    applies it back to Aurora, where it can overwrite a newer update (which the
+    changelog then records and replays as well).
+
     Args:
-        hosted_zone_id: Route 53 hosted zone ID
-        record_name: DNS record name to update
-        rds_endpoint: RDS instance endpoint
-        region: AWS region
-        
+        dms_client: boto3 DMS client (DryRunDms in dry-run mode)
+        task_arn: Replication task ARN
+        timeout: Seconds to wait for the task to stop
+
     Returns:
-        True if successful, False otherwise
+        True once the task is stopped (or doesn't exist), False on timeout
     """
-    try:
-        route53_client = boto3.client('route53', region_name=region)
-        print(f"Updating Route 53 record {record_name} to point back to RDS ({rds_endpoint})...")
-        # Placeholder: In real implementation, update Route 53 record
-        print("✓ Route 53 CNAME updated to RDS (placeholder)")
+    status = dms_task_status(dms_client, task_arn)
+    if status is None or status in DMS_IDLE_STATES:
+        print(f"  DMS task {status or 'not found'}: nothing replicates into Aurora")
         return True
-    except ClientError as e:
-        print(f"Error updating Route 53 record: {e}", file=sys.stderr)
-        return False
+    if status != "stopping":
+        print(f"  Stopping DMS task ({status})...")
+        dms_client.stop_replication_task(ReplicationTaskArn=task_arn)
+    return poll_until(lambda: dms_task_status(dms_client, task_arn) in DMS_IDLE_STATES + (None,), timeout)
+
+
+def find_aurora_parameter_group(rds_client, aurora_cluster_id: str) -> str:
+    """
+    Cluster parameter group whose `read_only` setting controls the Aurora writer.
+
+    Raises:
+        ValueError: If the cluster uses a default (unmodifiable) parameter group
+    """
+    cluster = rds_client.describe_db_clusters(DBClusterIdentifier=aurora_cluster_id)['DBClusters'][0]
+    name = cluster['DBClusterParameterGroup']
+    if name.startswith("default."):
+        raise ValueError(f"{aurora_cluster_id} uses {name}; read_only needs a custom parameter group")
+    return name
+
+
+def set_aurora_read_only(rds_client, parameter_group: str, read_only: bool = True) -> None:
+    """Set `read_only` on the Aurora cluster parameter group, applied immediately."""
+    rds_client.modify_db_cluster_parameter_group(
+        DBClusterParameterGroupName=parameter_group,
+        Parameters=[{
+            "ParameterName": "read_only",
+            "ParameterValue": "1" if read_only else "0",
+            "ApplyMethod": "immediate",
+        }]
+    )
 
 
-def restore_rds_write_access(rds_instance_id: str, region: str = "us-east-1") -> bool:
+def restore_rds_write_access(rds_client, parameter_group: Optional[str], conn: Connection) -> bool:
     """
-    Restore write access to RDS instance.
-    
+    Restore write access to the RDS instance and wait until it takes effect.
+
     Args:
-        rds_instance_id: The RDS instance identifier
-        region: AWS region
-        
+        rds_client: boto3 RDS client (None in dry-run mode)
+        parameter_group: RDS parameter group name (None in dry-run mode)
+        conn: Open connection to RDS
+
     Returns:
-        True if successful, False otherwise
+        True once RDS reports read_only=0
     """
-    try:
-        rds_client = boto3.client('rds', region_name=region)
-        print(f"Restoring write access to RDS instance {rds_instance_id}...")
-        # Placeholder: In real implementation, modify DB parameter group or use SQL
-        print("✓ RDS write access restored (placeholder)")
-        return True
-    except ClientError as e:
-        print(f"Error restoring RDS write access: {e}", file=sys.stderr)
-        return False
+    if rds_client is not None:
+        set_rds_read_only(rds_client, parameter_group, read_only=False)
+    return wait_for_read_only(conn, read_only=False)
 
 
 def perform_rollback(
@@ -64,44 +153,196 @@ def perform_rollback(
     rds_endpoint: str,
     hosted_zone_id: str,
     record_name: str,
-    region: str = "us-east-1"
+    region: str = "us-east-1",
+    aurora_cluster_id: Optional[str] = None,
+    aurora_url: Optional[str] = None,
+    rds_url: Optional[str] = None,
+    db_user: str = "admin",
+    db_name: str = "devops_raf_demo",
+    boundary_file: str = "cutover-boundary.json",
+    batch_size: int = 1000,
+    rewind: int = 10000,
+    ttl: int = 5,
+    dns_timeout: float = 120.0,
+    dry_run: bool = False,
+    timeline: Optional[CutoverTimeline] = None,
+    report_json: Optional[str] = None,
+    resolvers: Sequence[str] = (),
+    drain_old_sessions: bool = False,
+    drain_users: Sequence[str] = (),
+    drain_batch_size: int = 50,
+    drain_timeout: float = 60.0,
+    dms_task_arn: Optional[str] = None,
+    dry_run_replicator: Optional[DryRunReplicator] = None
 ) -> bool:
     """
     Perform the complete rollback process.
-    
+
     Args:
         rds_instance_id: The RDS instance identifier
         rds_endpoint: RDS instance endpoint
         hosted_zone_id: Route 53 hosted zone ID
         record_name: DNS record name to update
         region: AWS region
-        
+        aurora_cluster_id: The Aurora cluster identifier (needed unless dry-run)
+        aurora_url: Aurora database URL (default: resolved from aurora_cluster_id)
+        rds_url: RDS database URL (default: resolved from rds_instance_id)
+        db_user: Database user for resolved endpoints
+        db_name: Database name for resolved endpoints
+        boundary_file: Cutover boundary saved by cutover_to_aurora.py
+        batch_size: Changelog entries per replay batch
+        rewind: Entries re-replayed in the final pass (see DeltaReplayer.rewind)
+        ttl: TTL of the record pointing back at RDS
+        dns_timeout: Seconds to wait for the Route 53 change to be INSYNC
+        dry_run: Run against local stand-ins without calling AWS
+        timeline: Timeline to record the phases in (default: a new one)
+        report_json: Write the timeline and replay report to this file (optional)
+        resolvers: DNS resolvers ("host[:port]") that must answer with RDS before draining
+        drain_old_sessions: Terminate the sessions left on Aurora once DNS has converged
+        drain_users: Only drain sessions of these users (default: all but system accounts)
+        drain_batch_size: Sessions terminated per round
+        drain_timeout: Seconds to keep draining
+        dms_task_arn: RDS -> Aurora DMS task, stopped before RDS is made writable (needed unless dry-run)
+        dry_run_replicator: Dry-run stand-in for that task, if it is still running
+
     Returns:
         True if rollback successful, False otherwise
     """
+    timeline = timeline or CutoverTimeline(window=WINDOW)
+    mode = " (dry run)" if dry_run else ""
     print("=" * 60)
-    print("Starting rollback from Aurora to RDS")
+    print(f"Starting rollback from Aurora to RDS{mode}")
     print("=" * 60)
-    
-    # Step 1: Update Route 53 CNAME back to RDS
-    if not update_route53_record(hosted_zone_id, record_name, rds_endpoint, region):
-        print("❌ Failed to update Route 53 record", file=sys.stderr)
-        return False
-    
-    # Step 2: Restore write access to RDS
-    if not restore_rds_write_access(rds_instance_id, region):
-        print("❌ Failed to restore RDS write access", file=sys.stderr)
+
+    reset_call_stats()
+    aurora = rds = replayer = convergence = None
+    rds_client = rds_parameter_group = aurora_parameter_group = None
+    aurora_read_only = False
+    try:
+        # -- prepare: Aurora keeps taking writes --------------------------
+        timeline.mark("prepare_start")
+        if dry_run:
+            if not (aurora_url and rds_url):
+                print("❌ --dry-run needs --aurora-url and --rds-url", file=sys.stderr)
+                return False
+            route53_client = DryRunRoute53(record_name, f"{aurora_cluster_id or 'aurora'}.dry-run.invalid")
+            dms_client, dms_task_arn = DryRunDms(dry_run_replicator), "arn:aws:dms:dry-run:task:dry-run"
+        else:
+            if not (aurora_cluster_id and dms_task_arn):
+                print("❌ --aurora-cluster-id and --dms-task-arn are required", file=sys.stderr)
+                return False
+            rds_client = create_rds_client(region)
+            route53_client = create_route53_client(region)
+            dms_client = create_dms_client(region)
+            if not (aurora_url and rds_url):
+                resolved_rds, resolved_aurora = resolve_endpoints(
+                    rds_instance_id, aurora_cluster_id, db_user, db_name, region
+                )
+                rds_url = rds_url or resolved_rds
+                aurora_url = aurora_url or resolved_aurora
+            rds_parameter_group = find_read_only_parameter_group(rds_client, rds_instance_id)
+            aurora_parameter_group = find_aurora_parameter_group(rds_client, aurora_cluster_id)
+        timeline.mark("clients_ready")
+
+        aurora, rds = connect(aurora_url), connect(rds_url)
+        replayer = DeltaReplayer(aurora, rds, load_boundary(boundary_file), batch_size)
+        if not replayer.changelog:
+            print("  ⚠ No change capture in the boundary: replaying inserts above the high-water ids only")
+        _, change_batch = prepare_route53_change(
+            route53_client, hosted_zone_id, record_name, rds_endpoint, ttl, resolve=not dry_run
+        )
+        timeline.mark("change_batch_validated")
+
+        if not ensure_dms_task_stopped(dms_client, dms_task_arn):
+            raise TimeoutError("DMS task did not stop")
+        timeline.mark("dms_task_stopped")
+
+        if not restore_rds_write_access(rds_client, rds_parameter_group, rds):
+            raise TimeoutError("RDS did not report read_only=0")
+        timeline.mark("rds_writable")
+
+        # Online passes while Aurora still takes writes, so the window only
+        # has to replay what arrives during the last pass
+        for _ in range(10):
+            replayer.replay()
+            if replayer.pending() <= batch_size:
+                break
+        timeline.mark("online_replay_done")
+
+        # -- write-unavailable window -------------------------------------
+        timeline.mark(WINDOW[0])
+        aurora_read_only = True
+        if not dry_run:
+            set_aurora_read_only(rds_client, aurora_parameter_group)
+            if not wait_for_read_only(aurora):
+                raise TimeoutError("Aurora did not report read_only=1")
+        timeline.mark("aurora_read_only_confirmed")
+
+        replayer.rewind(rewind)
+        replayer.replay()
+        timeline.mark("delta_replayed")
+
+        change_id = update_route53_record(route53_client, hosted_zone_id, change_batch)
+        timeline.mark("dns_change_submitted")
+        # The CNAME points at RDS now: Aurora stays read-only
+        aurora_read_only = False
+
+        # -- post-flip: Route 53, resolvers and old sessions ---------------
+        convergence = ConvergenceStage(
+            route53_client, change_id, record_name, rds_endpoint, resolvers,
+            old_conn=aurora if drain_old_sessions else None, timeout=dns_timeout,
+            grace=0 if dry_run else ttl, drain_timeout=drain_timeout,
+            on_phase=lambda phase: timeline.mark(WINDOW[1] if phase == INSYNC else phase),
+            batch_size=drain_batch_size, users=drain_users
+        ).run()
+        if convergence.insync_ms is None:
+            print(f"❌ Route 53 change {change_id} not INSYNC after {dns_timeout:g}s", file=sys.stderr)
+            return False
+
+    except (ClientError, ValueError, TimeoutError, OSError) as e:
+        print(f"❌ Rollback failed: {e}", file=sys.stderr)
         return False
-    
+    finally:
+        if aurora_read_only:
+            try:
+                if not dry_run:
+                    set_aurora_read_only(rds_client, aurora_parameter_group, read_only=False)
+                timeline.mark("aborted_aurora_writes_restored")
+            except ClientError as e:
+                print(f"❌ Could not restore writes on Aurora: {e}", file=sys.stderr)
+        for conn in (aurora, rds):
+            if conn:
+                conn.close()
+        if report_json:
+            report = timeline.report()
+            if replayer:
+                report["replay"] = dict(vars(replayer.report), rows_per_second=replayer.report.rows_per_second)
+            if convergence:
+                report["convergence"] = convergence.to_dict()
+            Path(report_json).write_text(json.dumps(report, indent=2))
+        print_call_summary()
+
+    replay = replayer.report
     print("=" * 60)
-    print("✓ Rollback to RDS completed successfully")
+    print(f"✓ Rollback to RDS completed successfully{mode}")
+    print(
+        f"  Delta replayed: {replay.changelog_entries} changelog entries -> {replay.rows_upserted} upserts, "
+        f"{replay.rows_deleted} deletes in {replay.batches} batches ({replay.rows_per_second:,.0f} rows/s)"
+    )
+    print(f"  Write-unavailable window (Aurora read-only -> writable on RDS): {timeline.write_unavailable_ms:.1f} ms")
+    print(f"    Aurora read-only confirmed: {timeline.between_ms(WINDOW[0], 'aurora_read_only_confirmed'):.1f} ms")
+    print(f"    Final delta replayed:       {timeline.between_ms('aurora_read_only_confirmed', 'delta_replayed'):.1f} ms")
+    print(f"    DNS INSYNC:                 {timeline.between_ms('delta_replayed', WINDOW[1]):.1f} ms")
+    print_convergence(convergence)
+    if not convergence.converged:
+        print("  ⚠ Clients have not all moved back to RDS; check the resolvers and sessions above")
     print("=" * 60)
     print("\nNext steps:")
     print("  1. Validate application connectivity to RDS")
     print("  2. Verify application functionality")
     print("  3. Investigate issues that caused rollback")
     print("  4. Plan follow-up actions to re-attempt migration")
-    
+
     return True
 
 
@@ -134,20 +375,107 @@ def main():
         default="us-east-1",
         help="AWS region (default: us-east-1)"
     )
-    
+    parser.add_argument(
+        "--aurora-cluster-id",
+        help="Aurora cluster identifier (required unless --dry-run)"
+    )
+    parser.add_argument(
+        "--aurora-url",
+        help="Aurora database URL (default: Aurora cluster endpoint)"
+    )
+    parser.add_argument(
+        "--rds-url",
+        help="RDS database URL (default: RDS instance endpoint)"
+    )
+    parser.add_argument(
+        "--db-user",
+        default="admin",
+        help="Database user for resolved endpoints; password from DB_PASSWORD (default: admin)"
+    )
+    parser.add_argument(
+        "--db-name",
+        default="devops_raf_demo",
+        help="Database name (default: devops_raf_demo)"
+    )
+    parser.add_argument(
+        "--dms-task-arn",
+        help="RDS -> Aurora DMS replication task, stopped before RDS takes writes (required unless --dry-run)"
+    )
+    parser.add_argument(
+        "--boundary-file",
+        default="cutover-boundary.json",
+        help="Cutover boundary saved by cutover_to_aurora.py (default: cutover-boundary.json)"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1000,
+        help="Changelog entries per replay batch (default: 1000)"
+    )
+    parser.add_argument(
+        "--resolvers",
+        default="",
+        help="Comma-separated DNS resolvers (host[:port]) that must answer with RDS after the flip"
+    )
+    parser.add_argument(
+        "--dns-timeout",
+        type=float,
+        default=120.0,
+        help="Seconds to wait for Route 53 INSYNC and the resolvers after the flip (default: 120)"
+    )
+    parser.add_argument(
+        "--no-drain",
+        action="store_true",
+        help="Leave the sessions still open on Aurora after DNS has converged"
+    )
+    parser.add_argument(
+        "--drain-users",
+        default="",
+        help="Only terminate sessions of these comma-separated users on Aurora (default: all but system accounts)"
+    )
+    parser.add_argument(
+        "--drain-batch-size",
+        type=int,
+        default=50,
+        help="Sessions on Aurora terminated per round (default: 50)"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Run against --aurora-url/--rds-url stand-ins without calling AWS"
+    )
+    parser.add_argument(
+        "--report-json",
+        help="Write the phase timeline and replay report to this JSON file"
+    )
+
     args = parser.parse_args()
-    
+
     success = perform_rollback(
         args.rds_instance_id,
         args.rds_endpoint,
         args.hosted_zone_id,
         args.record_name,
-        args.region
+        args.region,
+        aurora_cluster_id=args.aurora_cluster_id,
+        aurora_url=args.aurora_url,
+        rds_url=args.rds_url,
+        db_user=args.db_user,
+        db_name=args.db_name,
+        boundary_file=args.boundary_file,
+        batch_size=args.batch_size,
+        dry_run=args.dry_run,
+        report_json=args.report_json,
+        dns_timeout=args.dns_timeout,
+        resolvers=[r.strip() for r in args.resolvers.split(",") if r.strip()],
+        drain_old_sessions=not args.no_drain,
+        drain_users=[u.strip() for u in args.drain_users.split(",") if u.strip()],
+        drain_batch_size=args.drain_batch_size,
+        dms_task_arn=args.dms_task_arn
     )
-    
+
     sys.exit(0 if success else 1)
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Apply sql/migrations to the source without stalling replication.
+
+Files run in name order and each one is recorded in `schema_migrations`
+(version, checksum, statements_applied, applied_at), so re-running only applies
+new files; a file that changed after it was applied is an error. Progress is
+recorded after every statement, and applied_at only once the backfills finish:
+a rerun after an interruption (e.g. a backfill that gave up on lag) resumes
+after the DDL that already ran instead of repeating it.
+
+DDL is applied online on MySQL: ALTER TABLE is tried with ALGORITHM=INSTANT,
+then INPLACE/LOCK=NONE, and a blocking table copy is refused unless
+--allow-blocking. Only "algorithm not supported" errors (1845/1846, and 1800
+for INSTANT on MySQL 5.7) move on to the next algorithm; anything else, such as a lock_wait_timeout (1205), fails the
+run. A short lock_wait_timeout keeps a metadata-lock wait from queueing
+application writes behind it.
+
+Data changes are declared as backfills and run in primary-key chunks:
+
+    -- backfill: students SET grade_band = 'upper' WHERE grade_band IS NULL AND grade_level >= 11
+
+The WHERE clause must make the backfill idempotent (it is re-run from the
+start after an interruption). Chunk size adapts (AIMD) to the replication lag
+measured by the heartbeat monitor (--target-url) and to source load (chunk
+time, Threads_running): it grows while both are low, halves when either
+rises, and the backfill pauses while lag is above --max-lag-ms.
+"""
+
+import sys
+import argparse
+import hashlib
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from db import Connection, connect  # noqa: E402
+from replication_lag import HeartbeatLagMonitor, percentile  # noqa: E402
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / "sql" / "migrations"
+MIGRATIONS_TABLE = "schema_migrations"
+# ER_UNKNOWN_ALTER_ALGORITHM (INSTANT on MySQL 5.7 / before 8.0.12),
+# ER_ALTER_OPERATION_NOT_SUPPORTED, ER_ALTER_OPERATION_NOT_SUPPORTED_REASON
+ALGORITHM_NOT_SUPPORTED = (1800, 1845, 1846)
+BACKFILL_RE = re.compile(r"^--\s*backfill:\s*(\w+)\s+SET\s+(.+?)\s+WHERE\s+(.+)$", re.IGNORECASE)
+
+
+@dataclass
+class Backfill:
+    table: str
+    assignments: str
+    where: str
+
+
+@dataclass
+class Migration:
+    version: str
+    path: Path
+    statements: List[str]
+    backfills: List[Backfill]
+    checksum: str
+
+
+@dataclass
+class BackfillReport:
+    table: str
+    rows: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+    pauses: int = 0
+    paused_seconds: float = 0.0
+    min_batch: Optional[int] = None
+    max_batch: int = 0
+    baseline_lag_ms: Optional[float] = None
+    lag_samples_ms: List[float] = field(default_factory=list, repr=False)
+
+    @property
+    def rows_per_second(self) -> float:
+        return round(self.rows / self.seconds, 1) if self.seconds else 0.0
+
+    @property
+    def max_lag_ms(self) -> Optional[float]:
+        return max(self.lag_samples_ms) if self.lag_samples_ms else None
+
+    @property
+    def lag_impact_ms(self) -> Optional[float]:
+        """How far lag rose above where it was before the backfill started."""
+        if self.baseline_lag_ms is None or not self.lag_samples_ms:
+            return None
+        return round(max(0.0, self.max_lag_ms - self.baseline_lag_ms), 2)
+
+
+def load_migrations(directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    """Parse the *.sql files in `directory`, in name order."""
+    migrations = []
+    for path in sorted(Path(directory).glob("*.sql")):
+        text = path.read_text()
+        backfills, lines = [], []
+        for line in text.splitlines():
+            stripped = line.strip()
+            match = BACKFILL_RE.match(stripped)
+            if match:
+                backfills.append(Backfill(*(part.strip().rstrip(";") for part in match.groups())))
+            elif not stripped.startswith("--"):
+                lines.append(line)
+        statements = [s.strip() for s in "\n".join(lines).split(";") if s.strip()]
+        migrations.append(Migration(
+            path.stem, path, statements, backfills, hashlib.sha256(text.encode()).hexdigest()
+        ))
+    return migrations
+
+
+def ensure_migrations_table(conn: Connection) -> None:
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} ("
+        " version VARCHAR(255) NOT NULL PRIMARY KEY,"
+        " checksum CHAR(64) NOT NULL,"
+        " statements_applied INT NOT NULL DEFAULT 0,"
+        " applied_at TIMESTAMP NULL DEFAULT NULL,"
+        " seconds DOUBLE)"
+    )
+
+
+def applied_versions(conn: Connection) -> Dict[str, Tuple[str, int, bool]]:
+    """version -> (checksum, statements applied, finished) of every migration started."""
+    rows = conn.query(f"SELECT version, checksum, statements_applied, applied_at FROM {MIGRATIONS_TABLE}")
+    return {version: (checksum, done, applied_at is not None) for version, checksum, done, applied_at in rows}
+
+
+def threads_running(conn: Connection) -> Optional[int]:
+    """MySQL Threads_running (statements executing right now), None for SQLite."""
+    if conn.dialect != "mysql":
+        return None
+    return int(conn.query_one("SHOW GLOBAL STATUS LIKE 'Threads_running'")[1])
+
+
+def algorithm_not_supported(error: Exception) -> bool:
+    """True if MySQL rejected the ALGORITHM/LOCK clause itself (the change needs a heavier one)."""
+    return bool(error.args) and error.args[0] in ALGORITHM_NOT_SUPPORTED
+
+
+def apply_statement(conn: Connection, statement: str, allow_blocking: bool = False) -> None:
+    """Run one DDL/DML statement; ALTER TABLE on MySQL only with an online algorithm."""
+    if conn.dialect != "mysql" or not statement.upper().startswith("ALTER TABLE") or "ALGORITHM" in statement.upper():
+        conn.execute(statement)
+        return
+    errors = []
+    for algorithm in ("ALGORITHM=INSTANT", "ALGORITHM=INPLACE, LOCK=NONE"):
+        try:
+            conn.execute(f"{statement}, {algorithm}")
+            return
+        except Exception as e:
+            if not algorithm_not_supported(e):
+                raise  # lock_wait_timeout, syntax error, ...: not a reason to try a heavier algorithm
+            errors.append(f"{algorithm}: {e}")
+    if not allow_blocking:
+        raise RuntimeError(
+            "ALTER can't run online (needs a table copy); rerun with --allow-blocking "
+            f"or use an online schema change tool. Tried {'; '.join(errors)}"
+        )
+    conn.execute(statement)
+
+
+class AdaptiveBatch:
+    """Additive-increase / multiplicative-decrease chunk size."""
+
+    def __init__(self, initial: int = 1000, minimum: int = 100, maximum: int = 50000, step: float = 0.25):
+        self.size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.step = step
+
+    def grow(self) -> None:
+        self.size = min(self.maximum, self.size + max(1, int(self.size * self.step)))
+
+    def shrink(self) -> None:
+        self.size = max(self.minimum, self.size // 2)
+
+
+def run_backfill(
+    conn: Connection,
+    backfill: Backfill,
+    lag_probe: Optional[Callable[[], Optional[float]]] = None,
+    batch: Optional[AdaptiveBatch] = None,
+    max_lag: float = 2.0,
+    target_chunk_seconds: float = 0.5,
+    max_threads_running: int = 25,
+    pause_poll: float = 0.5,
+    max_pause: float = 600.0
+) -> BackfillReport:
+    """
+    Run `backfill` in primary-key chunks, adapting to lag and source load.
+
+    Args:
+        conn: Source connection
+        backfill: The backfill to run
+        lag_probe: Returns current replication lag in seconds (None: no lag signal)
+        batch: Chunk size controller (default: AdaptiveBatch())
+        max_lag: Pause while lag is above this many seconds
+        target_chunk_seconds: Shrink the chunk when one takes longer than this
+        max_threads_running: Shrink the chunk when the source is busier than this
+        pause_poll: Seconds between lag checks while paused
+        max_pause: Give up after pausing this long in one go
+
+    Returns:
+        Rows, throughput, pauses and lag impact
+    """
+    batch = batch or AdaptiveBatch()
+    report = BackfillReport(backfill.table)
+    if lag_probe:
+        baseline = lag_probe()
+        report.baseline_lag_ms = round(baseline * 1000, 2) if baseline is not None else None
+    low, high = conn.query_one(f"SELECT MIN(id), MAX(id) FROM {backfill.table}")
+    sql = (
+        f"UPDATE {backfill.table} SET {backfill.assignments}"
+        f" WHERE id >= %s AND id < %s AND ({backfill.where})"
+    )
+    started = time.perf_counter()
+    lo = low
+    while lo is not None and lo <= high:
+        lag = lag_probe() if lag_probe else None
+        if lag is not None:
+            report.lag_samples_ms.append(round(lag * 1000, 2))
+            if lag > max_lag:
+                report.pauses += 1
+                batch.shrink()
+                paused = time.perf_counter()
+                # Resume only once lag is well under the threshold, not just at it
+                while (lag is None or lag > max_lag / 2) and time.perf_counter() - paused < max_pause:
+                    time.sleep(pause_poll)
+                    lag = lag_probe()
+                    if lag is not None:
+                        report.lag_samples_ms.append(round(lag * 1000, 2))
+                report.paused_seconds += time.perf_counter() - paused
+                if lag is None or lag > max_lag / 2:
+                    raise TimeoutError(f"Replication lag stayed above {max_lag / 2:g}s for {max_pause:g}s")
+
+        size = batch.size
+        chunk_started = time.perf_counter()
+        report.rows += max(0, conn.execute(sql, (lo, lo + size)))
+        chunk_seconds = time.perf_counter() - chunk_started
+        report.chunks += 1
+        report.min_batch = size if report.min_batch is None else min(report.min_batch, size)
+        report.max_batch = max(report.max_batch, size)
+        lo += size
+
+        busy = threads_running(conn)
+        lag_rising = lag is not None and lag > max_lag / 2
+        if chunk_seconds > target_chunk_seconds or lag_rising or (busy is not None and busy > max_threads_running):
+            batch.shrink()
+        else:
+            batch.grow()
+
+    report.seconds = round(time.perf_counter() - started, 3)
+    report.paused_seconds = round(report.paused_seconds, 3)
+    return report
+
+
+def run_migrations(
+    url: str,
+    directory: Path = MIGRATIONS_DIR,
+    lag_probe: Optional[Callable[[], Optional[float]]] = None,
+    allow_blocking: bool = False,
+    lock_wait_timeout: int = 5,
+    **backfill_options
+) -> List[BackfillReport]:
+    """
+    Apply every migration in `directory` that hasn't been applied to `url` yet.
+
+    Args:
+        url: Source database URL
+        directory: Migrations directory (*.sql, applied in name order)
+        lag_probe: Current replication lag in seconds, for backfill pacing
+        allow_blocking: Allow ALTERs that need a blocking table copy
+        lock_wait_timeout: MySQL metadata-lock wait limit for DDL, in seconds
+        **backfill_options: Passed to run_backfill (max_lag, target_chunk_seconds, ...)
+
+    Returns:
+        One report per backfill that ran
+
+    Raises:
+        ValueError: If a started or applied migration file has been modified since
+    """
+    reports = []
+    with connect(url) as conn:
+        ensure_migrations_table(conn)
+        applied = applied_versions(conn)
+        if conn.dialect == "mysql":
+            conn.execute("SET SESSION lock_wait_timeout = %s", (lock_wait_timeout,))
+        for migration in load_migrations(directory):
+            done = 0
+            if migration.version in applied:
+                checksum, done, finished = applied[migration.version]
+                if checksum != migration.checksum:
+                    raise ValueError(f"{migration.path.name} changed after it was applied")
+                if finished:
+                    continue
+                print(f"Resuming {migration.path.name} after {done} of {len(migration.statements)} statements...")
+            else:
+                print(f"Applying {migration.path.name}...")
+                conn.execute(
+                    f"INSERT INTO {MIGRATIONS_TABLE} (version, checksum) VALUES (%s, %s)",
+                    (migration.version, migration.checksum),
+                )
+            started = time.perf_counter()
+            for done, statement in enumerate(migration.statements[done:], done + 1):
+                apply_statement(conn, statement, allow_blocking)
+                conn.execute(
+                    f"UPDATE {MIGRATIONS_TABLE} SET statements_applied = %s WHERE version = %s",
+                    (done, migration.version),
+                )
+            for backfill in migration.backfills:
+                report = run_backfill(conn, backfill, lag_probe, **backfill_options)
+                print_backfill_report(report)
+                reports.append(report)
+            seconds = time.perf_counter() - started
+            conn.execute(
+                f"UPDATE {MIGRATIONS_TABLE} SET applied_at = CURRENT_TIMESTAMP, seconds = %s WHERE version = %s",
+                (round(seconds, 3), migration.version),
+            )
+            print(f"✓ {migration.path.name} applied in {seconds:.1f}s")
+    return reports
+
+
+def print_backfill_report(report: BackfillReport) -> None:
+    print(
+        f"  backfill {report.table}: {report.rows:,} rows in {report.chunks} chunks, {report.seconds:.1f}s "
+        f"({report.rows_per_second:,.0f} rows/s), batch {report.min_batch}-{report.max_batch}"
+    )
+    if report.lag_samples_ms:
+        lags = sorted(report.lag_samples_ms)
+        print(
+            f"  lag ms: baseline {report.baseline_lag_ms}  p50 {percentile(lags, 50)}  max {report.max_lag_ms}  "
+            f"impact +{report.lag_impact_ms}  paused {report.pauses}x / {report.paused_seconds:.1f}s"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Apply sql/migrations online, pacing backfills by replication lag"
+    )
+    parser.add_argument(
+        "--url",
+        required=True,
+        help="Source database URL (mysql://user@host/db or sqlite:///path); password from DB_PASSWORD"
+    )
+    parser.add_argument(
+        "--target-url",
+        help="Replication target URL; enables lag-aware backfills via the heartbeat monitor"
+    )
+    parser.add_argument(
+        "--migrations-dir",
+        default=str(MIGRATIONS_DIR),
+        help="Directory of *.sql migrations (default: sql/migrations)"
+    )
+    parser.add_argument(
+        "--max-lag-ms",
+        type=float,
+        default=2000.0,
+        help="Pause backfills while replication lag is above this (default: 2000)"
+    )
+    parser.add_argument(
+        "--target-chunk-seconds",
+        type=float,
+        default=0.5,
+        help="Shrink backfill chunks that take longer than this (default: 0.5)"
+    )
+    parser.add_argument(
+        "--max-threads-running",
+        type=int,
+        default=25,
+        help="Shrink backfill chunks while source Threads_running is above this (default: 25)"
+    )
+    parser.add_argument(
+        "--allow-blocking",
+        action="store_true",
+        help="Allow ALTER TABLE statements that can't run with INSTANT/INPLACE"
+    )
+
+    args = parser.parse_args()
+
+    source = target = monitor = None
+    if args.target_url:
+        source, target = connect(args.url), connect(args.target_url)
+        monitor = HeartbeatLagMonitor(source, target, interval=0.5).start()
+    else:
+        print("No --target-url: backfills are paced by source load only")
+    try:
+        run_migrations(
+            args.url,
+            Path(args.migrations_dir),
+            lag_probe=monitor.current_lag if monitor else None,
+            allow_blocking=args.allow_blocking,
+            max_lag=args.max_lag_ms / 1000,
+            target_chunk_seconds=args.target_chunk_seconds,
+            max_threads_running=args.max_threads_running
+        )
+    except (ValueError, RuntimeError, TimeoutError) as e:
+        print(f"❌ Migration failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if monitor:
+            monitor.stop()
+            source.close()
+            target.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# Shared fixtures for the migration script tests: two SQLite files stand in for
+# the RDS source and the Aurora target.
+# Run from the scripts/python/ directory:
+# pip install -r requirements.txt pytest
+# python -m pytest tests/
+
+import os
+import socket
+import struct
+import threading
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import pytest
+
+from db import connect
+
+
+@pytest.fixture
+def stand_ins(tmp_path):
+    """(source_url, target_url) for two empty local databases."""
+    return f"sqlite:///{tmp_path / 'source.db'}", f"sqlite:///{tmp_path / 'target.db'}"
+
+
+@pytest.fixture
+def source(stand_ins):
+    with connect(stand_ins[0]) as conn:
+        yield conn
+
+
+@pytest.fixture
+def target(stand_ins):
+    with connect(stand_ins[1]) as conn:
+        yield conn
+
+
+class StubDnsServer:
+    """
+    Authoritative-style UDP DNS server on 127.0.0.1 answering CNAME queries from `records`.
+
+    `set(name, value, after)` changes an answer `after` seconds from now, to
+    play a resolver whose cache still holds the old answer.
+    """
+
+    def __init__(self, records=None):
+        self.records = {self._key(name): value for name, value in (records or {}).items()}
+        self.queries = 0
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.settimeout(0.05)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _key(name):
+        return name.rstrip(".").lower()
+
+    @property
+    def address(self):
+        return "%s:%d" % self._sock.getsockname()
+
+    def set(self, name, value, after=0.0):
+        timer = threading.Timer(after, self.records.__setitem__, (self._key(name), value))
+        timer.daemon = True
+        timer.start()
+
+    def _serve(self):
+        while not self._stop.is_set():
+            try:
+                query, client = self._sock.recvfrom(512)
+            except socket.timeout:
+                continue
+            self.queries += 1
+            query_id = struct.unpack_from("!H", query)[0]
+            offset, labels = 12, []
+            while query[offset]:
+                labels.append(query[offset + 1:offset + 1 + query[offset]].decode())
+                offset += 1 + query[offset]
+            question = query[12:offset + 5]
+            target = self.records.get(".".join(labels).lower())
+            if target is None:
+                self._sock.sendto(struct.pack("!HHHHHH", query_id, 0x8183, 1, 0, 0, 0) + question, client)
+                continue
+            rdata = b"".join(bytes([len(label)]) + label.encode() for label in target.split(".")) + b"\0"
+            answer = struct.pack("!HHHIH", 0xC00C, 5, 1, 60, len(rdata)) + rdata  # name compressed to the question
+            self._sock.sendto(struct.pack("!HHHHHH", query_id, 0x8180, 1, 1, 0, 0) + question + answer, client)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._sock.close()
+
+
+@pytest.fixture
+def stub_dns():
+    """Factory for StubDnsServer instances, stopped after the test."""
+    servers = []
+
+    def start(records=None):
+        servers.append(StubDnsServer(records))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.stop()
@@ -0,0 +1,158 @@
+# Tests for fleet mode: several SQLite stand-in pairs, each replicated by its own
+# fake DMS, checked concurrently from one manifest.
+
+import json
+import time
+
+import pytest
+
+import check_replication_status
+from check_replication_status import check_fleet, load_manifest, resolve_fleet_endpoints
+from cutover_to_aurora import DryRunReplicator
+from db import connect
+from load_synthetic_data import bulk_load
+
+
+def stand_in_pair(tmp_path, name, replicated=True):
+    urls = f"sqlite:///{tmp_path / (name + '-rds.db')}", f"sqlite:///{tmp_path / (name + '-aurora.db')}"
+    for url in urls:
+        bulk_load(url, 200, writers=1)
+    replicator = DryRunReplicator(*urls, lag=0.02).start() if replicated else None
+    pair = {"name": name, "rds_instance_id": f"{name}-rds", "aurora_cluster_id": f"{name}-aurora",
+            "source_url": urls[0], "target_url": urls[1], "interval": 0.05, "check_tables": ["students"]}
+    return pair, replicator
+
+
+def write_manifest(tmp_path, manifest):
+    path = tmp_path / "fleet.json"
+    path.write_text(json.dumps(manifest))
+    return str(path)
+
+
+def test_checks_the_wave_concurrently_and_streams_results(tmp_path, capsys):
+    ok_pair, ok_dms = stand_in_pair(tmp_path, "sis")
+    slow_pair, slow_dms = stand_in_pair(tmp_path, "lms")
+    stalled_pair, _ = stand_in_pair(tmp_path, "hr", replicated=False)
+    drift_pair, drift_dms = stand_in_pair(tmp_path, "fin")
+    with connect(drift_pair["target_url"]) as target:
+        target.execute("DELETE FROM students WHERE id = 7")
+    slow_pair["duration"] = 1.0
+    drift_pair["recheck_delay"] = 0.05
+    manifest = write_manifest(tmp_path, {
+        "defaults": {"duration": 0.4, "max_lag_ms": 1000},
+        "pairs": [ok_pair, slow_pair, stalled_pair, drift_pair],
+    })
+    report = tmp_path / "fleet-report.json"
+
+    started = time.perf_counter()
+    try:
+        ok = check_fleet(load_manifest(manifest), workers=4, report_json=str(report))
+    finally:
+        for dms in (ok_dms, slow_dms, drift_dms):
+            dms.stop()
+    elapsed = time.perf_counter() - started
+
+    assert ok is False  # one failing pair fails the wave
+    assert elapsed < 1.0 + 0.4 + 0.4 + 0.4  # close to the slowest pair, not the sum
+    result = json.loads(report.read_text())
+    assert (result["passed"], result["failed"]) == (2, 2)
+    by_name = {pair["name"]: pair for pair in result["pairs"]}
+    assert [pair["name"] for pair in result["pairs"]] == ["sis", "lms", "hr", "fin"]
+    assert by_name["sis"]["status"] == "pass" and by_name["sis"]["lag"]["samples"] > 0
+    assert by_name["hr"]["status"] == "no-heartbeat"
+    assert by_name["fin"]["status"] == "inconsistent"
+    assert by_name["fin"]["consistency"][0]["missing_on_target"] == [7]
+
+    streamed = [line.split()[1] for line in capsys.readouterr().out.splitlines() if line[:1] in ("✓", "❌")]
+    assert streamed[-1] == "lms"  # printed as it finished, not in manifest order
+    assert sorted(streamed) == ["fin", "hr", "lms", "sis"]
+
+
+def test_a_broken_pair_is_reported_not_raised(tmp_path):
+    pair, dms = stand_in_pair(tmp_path, "sis")
+    broken = dict(pair, name="broken", source_url=f"sqlite:///{tmp_path / 'missing-dir' / 'x.db'}")
+    report = tmp_path / "report.json"
+    try:
+        ok = check_fleet(load_manifest(write_manifest(tmp_path, [dict(pair, duration=0.2), broken])),
+                         report_json=str(report))
+    finally:
+        dms.stop()
+
+    assert ok is False
+    sis, broken = json.loads(report.read_text())["pairs"]
+    assert sis["ok"] is True
+    assert broken["status"] == "error" and "OperationalError" in broken["error"]
+
+
+def test_manifest_defaults_and_validation(tmp_path):
+    pairs = load_manifest(write_manifest(tmp_path, {
+        "defaults": {"region": "eu-west-1", "check_tables": "students, courses"},
+        "pairs": [{"rds_instance_id": "a-rds", "aurora_cluster_id": "a-aurora"},
+                  {"name": "b", "rds_instance_id": "b-rds", "aurora_cluster_id": "b-aurora", "region": "us-east-1"}],
+    }), duration=5.0, region="us-east-1")
+
+    assert [(p["name"], p["region"], p["duration"]) for p in pairs] == [
+        ("a-rds", "eu-west-1", 5.0), ("b", "us-east-1", 5.0)
+    ]
+    assert pairs[0]["check_tables"] == ["students", "courses"]
+    with pytest.raises(ValueError, match="Unknown manifest keys: max_lag"):
+        load_manifest(write_manifest(tmp_path, [{"rds_instance_id": "a", "aurora_cluster_id": "b", "max_lag": 1}]))
+    with pytest.raises(ValueError, match="Duplicate"):
+        load_manifest(write_manifest(tmp_path, [{"rds_instance_id": "a", "aurora_cluster_id": "b"}] * 2))
+
+
+class FakeRds:
+    """Two pages of instances and one of clusters; counts describe calls."""
+
+    def __init__(self, region):
+        self.region = region
+        self.calls = []
+
+    def describe_db_instances(self, Marker=None):
+        self.calls.append(("instances", Marker))
+        if Marker is None:
+            return {"DBInstances": [self._instance("a-rds")], "Marker": "page2"}
+        return {"DBInstances": [self._instance("b-rds")]}
+
+    def describe_db_clusters(self, Marker=None):
+        self.calls.append(("clusters", Marker))
+        return {"DBClusters": [{"DBClusterIdentifier": f"{n}-aurora", "Endpoint": f"{n}.cluster.{self.region}",
+                                "Port": 3306} for n in ("a", "b")]}
+
+    def _instance(self, name):
+        return {"DBInstanceIdentifier": name, "Endpoint": {"Address": f"{name}.{self.region}", "Port": 3306}}
+
+
+def test_endpoints_resolved_with_one_describe_per_region(monkeypatch):
+    clients = {}
+    monkeypatch.setattr(check_replication_status, "create_rds_client",
+                        lambda region: clients.setdefault(region, FakeRds(region)))
+    pairs = [
+        {"name": "a", "rds_instance_id": "a-rds", "aurora_cluster_id": "a-aurora", "region": "us-east-1"},
+        {"name": "b", "rds_instance_id": "b-rds", "aurora_cluster_id": "b-aurora", "region": "us-east-1"},
+        {"name": "c", "rds_instance_id": "a-rds", "aurora_cluster_id": "a-aurora", "region": "eu-west-1"},
+        {"name": "d", "rds_instance_id": "zz-rds", "aurora_cluster_id": "a-aurora", "region": "eu-west-1"},
+    ]
+
+    resolve_fleet_endpoints(pairs)
+
+    assert clients["us-east-1"].calls == [("instances", None), ("instances", "page2"), ("clusters", None)]
+    assert len(clients["eu-west-1"].calls) == 3
+    assert pairs[1]["source_url"] == "mysql://admin@b-rds.us-east-1:3306/devops_raf_demo"
+    assert pairs[2]["target_url"] == "mysql://admin@a.cluster.eu-west-1:3306/devops_raf_demo"
+    assert pairs[3]["error"] == "zz-rds not found in eu-west-1"
+
+
+def test_missing_credentials_fail_every_pair_not_the_run(tmp_path, monkeypatch):
+    from botocore.exceptions import NoCredentialsError
+
+    def no_credentials(region):
+        raise NoCredentialsError()
+
+    monkeypatch.setattr(check_replication_status, "create_rds_client", no_credentials)
+    pairs = load_manifest(write_manifest(tmp_path, [{"rds_instance_id": "a-rds", "aurora_cluster_id": "a-aurora"}]))
+    report = tmp_path / "report.json"
+
+    assert check_fleet(pairs, report_json=str(report)) is False
+    pair, = json.loads(report.read_text())["pairs"]
+    assert pair["status"] == "error" and "Unable to locate credentials" in pair["error"]
@@ -0,0 +1,144 @@
+# Tests for the chunked checksum comparison against two local SQLite stand-ins.
+
+import json
+
+import pytest
+
+import consistency_check
+from consistency_check import ConsistencyChecker, check_consistency
+
+ROWS = 50_000
+
+
+def seed(conn, rows=ROWS):
+    conn.execute("CREATE TABLE students (id INTEGER PRIMARY KEY, name VARCHAR(100), email VARCHAR(255), grade INTEGER)")
+    with conn.transaction():
+        conn.executemany(
+            "INSERT INTO students (id, name, email, grade) VALUES (%s, %s, %s, %s)",
+            ((i, f"student {i}", f"s{i}@example.com" if i % 7 else None, i % 100) for i in range(1, rows + 1)),
+        )
+
+
+def test_identical_tables_are_consistent(stand_ins, source, target):
+    seed(source)
+    seed(target)
+
+    report, = check_consistency(*stand_ins, ["students"], chunk_size=5000, concurrency=4)
+
+    assert report.consistent
+    assert report.rows_checked == ROWS
+    assert report.chunks == 10
+    assert report.mismatched_chunks == report.bisections == 0
+    assert report.rows_per_second > 0
+
+
+def test_bisection_finds_exact_divergent_keys(stand_ins, source, target):
+    seed(source)
+    seed(target)
+    target.execute("DELETE FROM students WHERE id IN (17, 30001)")
+    target.execute("UPDATE students SET grade = grade + 1 WHERE id = 42000")
+    target.execute("UPDATE students SET email = NULL WHERE id = 12345")  # value -> NULL
+    target.execute("INSERT INTO students (id, name, email, grade) VALUES (%s, %s, %s, %s)", (ROWS + 5, "extra", None, 1))
+    source.execute("UPDATE students SET name = 'x' WHERE id = 1")
+
+    report, = check_consistency(*stand_ins, ["students"], chunk_size=5000, concurrency=4, recheck_delay=0)
+
+    assert not report.consistent
+    assert report.missing_on_target == [17, 30001]
+    assert report.missing_on_source == [ROWS + 5]
+    assert report.changed == [1, 12345, 42000]
+    assert report.mismatched_chunks == report.rechecks == 5
+    # Only the mismatching halves are bisected: a handful of levels per bad chunk
+    assert 0 < report.bisections < 5 * 8
+
+
+def test_empty_and_one_sided_tables(stand_ins, source, target):
+    seed(source, rows=0)
+    seed(target, rows=0)
+    report, = check_consistency(*stand_ins, ["students"])
+    assert report.consistent and report.rows_checked == 0 and report.chunks == 0
+
+    source.executemany("INSERT INTO students (id, name, email, grade) VALUES (%s, %s, %s, %s)",
+                       [(i, "n", None, 0) for i in (5, 6, 100)])
+    report, = check_consistency(*stand_ins, ["students"], chunk_size=10, recheck_delay=0)
+    assert report.missing_on_target == [5, 6, 100]
+
+
+def test_chunks_follow_existing_keys_not_the_key_span(stand_ins, source, target):
+    for conn in (source, target):
+        seed(conn, rows=0)
+        conn.executemany("INSERT INTO students (id, name, email, grade) VALUES (%s, %s, %s, %s)",
+                         [(i * 1_000_000, "n", None, 0) for i in range(1, 2001)])  # ids up to 2e9
+
+    report, = check_consistency(*stand_ins, ["students"], chunk_size=500)
+
+    assert report.consistent and report.rows_checked == 2000
+    assert report.chunks == 4
+
+
+def test_mismatch_that_catches_up_is_not_flagged(stand_ins, source, target):
+    seed(source, rows=1000)
+    seed(target, rows=1000)
+    target.execute("DELETE FROM students WHERE id = 17")
+    checker = ConsistencyChecker(*stand_ins, chunk_size=100, recheck_delay=0.05)
+    checksum = checker._checksum
+
+    def replicate_after_first_look(*args):
+        result = checksum(*args)
+        if result[0] != result[1]:  # the missing row arrives while the chunk waits for its re-check
+            target.execute("INSERT OR IGNORE INTO students (id, name, email, grade) VALUES (17, 'student 17', "
+                           "'s17@example.com', 17)")
+        return result
+
+    checker._checksum = replicate_after_first_look
+    try:
+        report = checker.check_table("students")
+    finally:
+        checker.close()
+
+    assert report.consistent
+    assert (report.rechecks, report.mismatched_chunks, report.bisections) == (1, 0, 0)
+
+
+def test_rejects_tables_without_the_key(stand_ins, source, target):
+    source.execute("CREATE TABLE t (name VARCHAR(10))")
+    checker = ConsistencyChecker(*stand_ins)
+    with pytest.raises(ValueError):
+        checker.check_table("t")
+    checker.close()
+
+
+def test_cli_exit_code_and_json_report(stand_ins, source, target, tmp_path, monkeypatch, capsys):
+    seed(source, rows=1000)
+    seed(target, rows=999)
+    out = tmp_path / "report.json"
+    monkeypatch.setattr("sys.argv", [
+        "consistency_check.py", "--source-url", stand_ins[0], "--target-url", stand_ins[1],
+        "--chunk-size", "100", "--recheck-delay", "0", "--json", str(out),
+    ])
+
+    with pytest.raises(SystemExit) as exit_info:
+        consistency_check.main()
+
+    assert exit_info.value.code == 1
+    assert "DIVERGENT" in capsys.readouterr().out
+    assert json.loads(out.read_text())[0]["missing_on_target"] == [1000]
+
+
+def test_check_replication_status_compares_tables(stand_ins, source, target, monkeypatch, capsys):
+    import check_replication_status
+
+    seed(source, rows=500)
+    seed(target, rows=500)
+    stats = {"samples": 5, "errors": 0, "current_ms": 20.0, "p50_ms": 10.0, "p95_ms": 15.0, "p99_ms": 20.0, "max_ms": 20.0}
+    monkeypatch.setattr(check_replication_status, "measure_replication_lag", lambda *args: stats)
+
+    def check():
+        return check_replication_status.check_replication_status(
+            "rds-1", "aurora-1", source_url=stand_ins[0], target_url=stand_ins[1], check_tables=["students"]
+        )
+
+    assert check() is True
+    target.execute("UPDATE students SET name = 'drift' WHERE id = 250")
+    assert check() is False
+    assert "changed: [250]" in capsys.readouterr().out
@@ -0,0 +1,150 @@
+# Tests for the pipelined cutover: dry runs against SQLite stand-ins, and the
+# AWS path with fake RDS / Route 53 clients.
+
+import json
+
+import pytest
+
+import cutover_to_aurora
+from cutover_to_aurora import CutoverTimeline, DryRunReplicator, DryRunRoute53, perform_cutover, prepare_route53_change
+
+ARGS = ("rds-1", "aurora-1", "aurora-1.cluster.local", "Z123", "db.eduphoria.ex")
+
+
+def phases(timeline):
+    return [name for name, _ in timeline.marks]
+
+
+def test_dry_run_reports_write_unavailable_window(stand_ins, tmp_path, capsys):
+    timeline = CutoverTimeline()
+    report = tmp_path / "timeline.json"
+
+    ok = perform_cutover(
+        *ARGS, source_url=stand_ins[0], target_url=stand_ins[1], dry_run=True, dry_run_lag=0.02,
+        timeline=timeline, report_json=str(report)
+    )
+
+    assert ok is True
+    assert phases(timeline) == [
+        "prepare_start", "clients_ready", "connections_open", "change_batch_validated", "ttl_lowered",
+        "lag_within_budget", "read_only_requested", "read_only_confirmed", "replication_caught_up",
+        "dns_change_submitted", "writable_on_aurora",
+    ]
+    window = timeline.write_unavailable_ms
+    assert 0 < window < 2000
+    assert window == timeline.between_ms("read_only_requested", "writable_on_aurora")
+    assert json.loads(report.read_text())["write_unavailable_ms"] == window
+    assert "Write-unavailable window" in capsys.readouterr().out
+
+
+def test_aborts_and_restores_writes_when_replication_does_not_catch_up(stand_ins, monkeypatch):
+    monkeypatch.setattr(cutover_to_aurora, "ensure_replication_caught_up", lambda *args, **kwargs: False)
+    timeline = CutoverTimeline()
+
+    ok = perform_cutover(*ARGS, source_url=stand_ins[0], target_url=stand_ins[1], dry_run=True, timeline=timeline)
+
+    assert ok is False
+    assert phases(timeline)[-2:] == ["read_only_confirmed", "aborted_writes_restored"]
+    assert timeline.write_unavailable_ms is None
+
+
+class FakeRds:
+    def __init__(self, parameter_group="migration-source", others=()):
+        self.instances = {"rds-1": parameter_group, "reporting-1": "reporting", **dict(others)}
+        self.read_only = []
+
+    def describe_db_instances(self, DBInstanceIdentifier=None, Marker=None):
+        if DBInstanceIdentifier:
+            return {"DBInstances": [self._instance(DBInstanceIdentifier)]}
+        names = list(self.instances)
+        if Marker is None:  # one instance on the first page, the rest on the second
+            return {"DBInstances": [self._instance(names[0])], "Marker": "page2"}
+        return {"DBInstances": [self._instance(name) for name in names[1:]]}
+
+    def _instance(self, name):
+        return {"DBInstanceIdentifier": name, "DBParameterGroups": [{"DBParameterGroupName": self.instances[name]}]}
+
+    def modify_db_parameter_group(self, DBParameterGroupName, Parameters):
+        self.read_only.append((DBParameterGroupName, Parameters[0]["ParameterValue"]))
+
+
+def test_aws_path_prepares_before_the_flip(stand_ins, monkeypatch):
+    rds = FakeRds()
+    route53 = DryRunRoute53("db.eduphoria.ex", "rds-1.example.internal", ttl=1)
+    calls = []
+    monkeypatch.setattr(cutover_to_aurora, "create_rds_client", lambda region: calls.append("rds") or rds)
+    monkeypatch.setattr(cutover_to_aurora, "create_route53_client", lambda region: calls.append("route53") or route53)
+    monkeypatch.setattr(cutover_to_aurora.socket, "getaddrinfo", lambda *args: [])
+    replicator = DryRunReplicator(*stand_ins, lag=0.02).start()
+    try:
+        ok = perform_cutover(*ARGS, source_url=stand_ins[0], target_url=stand_ins[1], ttl=5)
+    finally:
+        replicator.stop()
+
+    assert ok is True
+    assert calls == ["rds", "route53"]  # clients created once, up front
+    assert rds.read_only == [("migration-source", "1")]
+    assert route53.records[("db.eduphoria.ex.", "CNAME")] == {"TTL": 5, "Value": "aurora-1.cluster.local"}
+
+
+def test_refuses_default_parameter_group_and_missing_record(stand_ins, monkeypatch):
+    monkeypatch.setattr(cutover_to_aurora, "create_rds_client", lambda region: FakeRds("default.mysql8.0"))
+    monkeypatch.setattr(cutover_to_aurora, "create_route53_client", lambda region: None)
+    assert perform_cutover(*ARGS, source_url=stand_ins[0], target_url=stand_ins[1]) is False
+
+    with pytest.raises(ValueError, match="also attached to analytics-1"):
+        cutover_to_aurora.find_read_only_parameter_group(FakeRds(others={"analytics-1": "migration-source"}), "rds-1")
+
+    with pytest.raises(ValueError):
+        prepare_route53_change(DryRunRoute53("other.eduphoria.ex", "x"), "Z123", "db.eduphoria.ex", "aurora", 5, resolve=False)
+
+
+def test_fence_is_written_after_read_only_is_confirmed(stand_ins, monkeypatch):
+    events = []
+    rds = FakeRds()
+    rds.modify_db_parameter_group = lambda DBParameterGroupName, Parameters: events.append("read_only")
+    beat = cutover_to_aurora.HeartbeatLagMonitor.beat
+    monkeypatch.setattr(cutover_to_aurora.HeartbeatLagMonitor, "beat",
+                        lambda self: events.append("beat") or beat(self))
+    monkeypatch.setattr(cutover_to_aurora, "create_rds_client", lambda region: rds)
+    monkeypatch.setattr(cutover_to_aurora, "create_route53_client",
+                        lambda region: DryRunRoute53("db.eduphoria.ex", "rds-1.example.internal", ttl=1))
+    monkeypatch.setattr(cutover_to_aurora.socket, "getaddrinfo", lambda *args: [])
+    replicator = DryRunReplicator(*stand_ins, lag=0.02).start()
+    try:
+        assert perform_cutover(*ARGS, source_url=stand_ins[0], target_url=stand_ins[1], ttl=5) is True
+    finally:
+        replicator.stop()
+
+    assert events.index("read_only") < len(events) - 1
+    assert events[-1] == "beat"  # the fence covers every write before read_only took effect
+
+
+class ReadOnlyMonitor:
+    """A monitor whose source refuses writes, as RDS does under read_only."""
+
+    def __init__(self, source):
+        self.source = source
+
+    def beat(self):
+        raise RuntimeError("(1290, 'The MySQL server is running with the --read-only option')")
+
+
+def test_falls_back_to_binlog_position_against_dms_status(source, target, monkeypatch):
+    monkeypatch.setattr(cutover_to_aurora, "source_binlog_position", lambda conn: "mysql-bin-changelog.000024:373")
+    target.execute("CREATE TABLE awsdms_status (task_name TEXT, source_current_position TEXT, pending_changes INT)")
+    target.execute("INSERT INTO awsdms_status VALUES ('wave-3', 'mysql-bin-changelog.000024:100', 0)")
+    target.execute("INSERT INTO awsdms_status VALUES ('other', 'mysql-bin-changelog.000001:5', 9)")
+    monitor = ReadOnlyMonitor(source)
+
+    def caught_up():
+        return cutover_to_aurora.ensure_replication_caught_up(
+            monitor, target, timeout=0.05, dms_status_table="awsdms_status", dms_task_name="wave-3"
+        )
+
+    assert caught_up() is False  # DMS hasn't read up to the final position
+    target.execute("UPDATE awsdms_status SET source_current_position = 'mysql-bin-changelog.000025:4',"
+                   " pending_changes = 2 WHERE task_name = 'wave-3'")
+    assert caught_up() is False  # read past it, not applied yet
+    target.execute("UPDATE awsdms_status SET pending_changes = 0 WHERE task_name = 'wave-3'")
+    assert caught_up() is True
@@ -0,0 +1,146 @@
+# Tests for the post-flip convergence stage: stub DNS servers on 127.0.0.1 play
+# the resolvers and a stub processlist plays the old endpoint.
+
+import asyncio
+import json
+import time
+
+import cutover_to_aurora
+from cutover_to_aurora import CutoverTimeline, DryRunRoute53, perform_cutover
+from dns_convergence import DNS_CONVERGED, INSYNC, SESSIONS_DRAINED, ConvergenceStage, SessionDrainer, query_cname
+
+RECORD = "db.eduphoria.ex"
+OLD, NEW = "rds-1.example.internal", "aurora-1.cluster.local"
+
+
+class StubProcesslist:
+    """The processlist queries SessionDrainer makes, on a mutable list of sessions."""
+
+    dialect = "mysql"
+
+    def __init__(self, sessions, reconnect=()):
+        self.sessions = {row[0]: row for row in sessions}
+        self.reconnect = dict(reconnect)  # killed id -> id it comes back as (stale DNS cache)
+        self.killed = []
+
+    def query_one(self, sql, params=()):
+        return self.query(sql, params)[0]
+
+    def query(self, sql, params=()):
+        if "CONNECTION_ID" in sql:
+            return [(1,)]
+        if "routines" in sql:
+            return [(1,)]
+        return list(self.sessions.values())
+
+    def execute(self, sql, params=()):
+        assert sql == "CALL mysql.rds_kill(%s)"
+        row = self.sessions.pop(params[0])
+        self.killed.append(params[0])
+        if params[0] in self.reconnect:
+            new_id = self.reconnect.pop(params[0])
+            self.sessions[new_id] = (new_id,) + row[1:3] + ("Sleep", 0)
+        return 0
+
+
+def test_query_cname_against_stub_resolver(stub_dns):
+    server = stub_dns({RECORD: OLD})
+
+    assert asyncio.run(query_cname(RECORD + ".", server.address)) == OLD
+    assert asyncio.run(query_cname("missing.eduphoria.ex", server.address)) is None
+
+
+def test_waits_for_route53_and_every_resolver_concurrently(stub_dns):
+    fast, slow = stub_dns({RECORD: OLD}), stub_dns({RECORD: OLD})
+    route53 = DryRunRoute53(RECORD, OLD, propagation=0.05)
+    change_id = route53.change_resource_record_sets("Z123", {"Changes": [{"ResourceRecordSet": {
+        "Name": RECORD, "Type": "CNAME", "TTL": 5, "ResourceRecords": [{"Value": NEW}]}}]})["ChangeInfo"]["Id"]
+    fast.set(RECORD, NEW, after=0.02)
+    slow.set(RECORD, NEW, after=0.3)
+    phases = []
+
+    started = time.perf_counter()
+    report = ConvergenceStage(
+        route53, change_id, RECORD, NEW, [fast.address, slow.address], timeout=5, on_phase=phases.append
+    ).run()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    assert phases == [INSYNC, DNS_CONVERGED]
+    assert report.converged and report.drain is None
+    fast_report, slow_report = report.resolvers
+    assert fast_report.converged_ms < 300 <= slow_report.converged_ms
+    assert slow_report.answer == NEW and slow_report.queries > 1
+    assert report.dns_converged_ms >= slow_report.converged_ms
+    assert report.time_to_full_convergence_ms < elapsed_ms < 1500  # not INSYNC + each resolver in turn
+
+
+def test_does_not_drain_while_a_resolver_serves_the_old_answer(stub_dns):
+    stale = stub_dns({RECORD: OLD})
+    route53 = DryRunRoute53(RECORD, NEW, propagation=0)
+    change_id = route53.change_resource_record_sets("Z123", {"Changes": []})["ChangeInfo"]["Id"]
+    old_endpoint = StubProcesslist([(7, "app", "10.0.0.7:5000", "Sleep", 30)])
+
+    report = ConvergenceStage(
+        route53, change_id, RECORD, NEW, [stale.address, "127.0.0.1:9"], old_conn=old_endpoint,
+        timeout=0.3, query_timeout=0.05
+    ).run()
+
+    assert report.insync_ms is not None
+    assert not report.dns_converged and report.time_to_full_convergence_ms is None
+    assert report.resolvers[0].answer == OLD and report.resolvers[1].errors > 0
+    assert report.drain is None and old_endpoint.killed == []
+
+
+def test_drains_old_sessions_in_batches_idle_first():
+    old_endpoint = StubProcesslist(
+        [(1, "admin", "localhost", "Query", 0),  # our own connection
+         (2, "rdsadmin", "localhost", "Sleep", 5),
+         (3, "dms", "10.0.0.3:4000", "Binlog Dump", 900)]
+        + [(i, "app", f"10.0.1.{i}:5000", "Sleep", i) for i in range(10, 15)]
+        + [(20, "app", "10.0.1.20:5000", "Query", 1)],
+        reconnect={10: 30},  # one pool still resolving the old answer comes back
+    )
+
+    report = SessionDrainer(old_endpoint, batch_size=2, interval=0).drain(timeout=5)
+
+    assert old_endpoint.killed[:6] == [14, 13, 12, 11, 10, 20]
+    assert 30 in old_endpoint.killed
+    assert (report.sessions_found, report.sessions_killed, report.late_sessions, report.remaining) == (6, 7, 1, 0)
+    assert report.rounds == 4
+    assert set(old_endpoint.sessions) == {1, 2, 3}
+
+
+def test_drainer_only_touches_the_given_users():
+    old_endpoint = StubProcesslist([(10, "app", "h", "Sleep", 1), (11, "reporting", "h", "Sleep", 1)])
+
+    report = SessionDrainer(old_endpoint, interval=0, users=["app"]).drain(timeout=5)
+
+    assert old_endpoint.killed == [10] and report.remaining == 0
+
+
+def test_cutover_waits_for_resolvers_and_reports_convergence(stand_ins, stub_dns, monkeypatch, tmp_path):
+    resolvers = [stub_dns({RECORD: OLD}), stub_dns({RECORD: OLD})]
+    submit = cutover_to_aurora.update_route53_record
+
+    def flip(*args):
+        for lag, resolver in zip((0.0, 0.2), resolvers):
+            resolver.set(RECORD, NEW, after=lag)
+        return submit(*args)
+
+    monkeypatch.setattr(cutover_to_aurora, "update_route53_record", flip)
+    timeline = CutoverTimeline()
+    report_file = tmp_path / "timeline.json"
+
+    ok = perform_cutover(
+        "rds-1", "aurora-1", NEW, "Z123", RECORD, source_url=stand_ins[0], target_url=stand_ins[1],
+        dry_run=True, dry_run_lag=0.02, timeline=timeline, report_json=str(report_file),
+        resolvers=[r.address for r in resolvers], drain_old_sessions=True
+    )
+
+    assert ok is True
+    assert [name for name, _ in timeline.marks][-4:] == [
+        "dns_change_submitted", "writable_on_aurora", DNS_CONVERGED, SESSIONS_DRAINED
+    ]
+    convergence = json.loads(report_file.read_text())["convergence"]
+    assert convergence["converged"] is True
+    assert convergence["time_to_full_convergence_ms"] >= convergence["resolvers"][1]["converged_ms"] >= 200
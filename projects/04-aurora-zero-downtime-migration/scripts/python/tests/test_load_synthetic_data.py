@@ -0,0 +1,68 @@
+# Tests for the synthetic data loader and live traffic generator on SQLite stand-ins.
+
+import random
+import sys
+import time
+import types
+
+import pytest
+
+from db import connect
+import load_synthetic_data
+from load_synthetic_data import LiveTraffic, TrafficReport, bulk_load, synthetic_row
+
+
+def test_bulk_load_fills_contiguous_ids_with_parallel_writers(stand_ins, source):
+    report = bulk_load(stand_ins[0], 25_000, writers=3, chunk_size=4000, batch_size=500)
+
+    assert report.rows == 25_000 and report.chunks == 7
+    assert report.rows_per_second > 0
+    assert source.query_one("SELECT COUNT(*), MIN(id), MAX(id) FROM students") == (25_000, 1, 25_000)
+    assert source.query_one("SELECT id, name, grade_level, created_at FROM students WHERE id = 777") == synthetic_row(777)
+
+    # A second load continues after the highest id
+    bulk_load(stand_ins[0], 10, writers=1)
+    assert source.query_one("SELECT MAX(id) FROM students")[0] == 25_010
+
+
+def test_rows_are_deterministic_and_load_data_needs_mysql(stand_ins):
+    assert synthetic_row(42) == synthetic_row(42)
+    assert synthetic_row(42) != synthetic_row(43)
+    assert 9 <= synthetic_row(10)[2] <= 12
+    with pytest.raises(ValueError):
+        bulk_load(stand_ins[0], 10, method="load-data")
+
+
+def test_only_the_loader_allows_local_infile(monkeypatch):
+    opened = []
+    monkeypatch.setitem(sys.modules, "pymysql", types.SimpleNamespace(connect=lambda **kwargs: opened.append(kwargs)))
+
+    connect("mysql://admin@rds.example.internal/db")
+    connect("mysql://admin@rds.example.internal/db", local_infile=True)
+
+    assert [kwargs["local_infile"] for kwargs in opened] == [False, True]
+
+
+def test_live_traffic_hits_target_rate_and_mix(stand_ins, source):
+    bulk_load(stand_ins[0], 1000, writers=1)
+    traffic = LiveTraffic(stand_ins[0], ops_per_sec=200, mix=(50, 40, 10), seed=1).start()
+    time.sleep(1.0)
+    report = traffic.stop()
+
+    assert report.errors == 0
+    assert 150 <= report.achieved_ops <= 230
+    assert report.ops["insert"] > report.ops["update"] > report.ops["delete"] > 0
+    assert report.latency_ms(50) <= report.latency_ms(99)
+    # Inserts took fresh ids above the loaded range
+    assert source.query_one("SELECT MAX(id) FROM students")[0] == 1000 + report.ops["insert"]
+
+
+def test_traffic_latencies_are_a_bounded_reservoir(monkeypatch):
+    monkeypatch.setattr(load_synthetic_data, "LATENCY_RESERVOIR", 100)
+    report = TrafficReport(target_ops=100)
+    rng = random.Random(1)
+    for ms in range(10_000):
+        report.record_latency(float(ms), rng)
+
+    assert len(report.latencies_ms) == 100 and report.latency_samples == 10_000
+    assert 3000 < report.latency_ms(50) < 7000  # a sample of the whole run, not its first 100
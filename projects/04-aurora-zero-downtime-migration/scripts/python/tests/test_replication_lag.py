@@ -0,0 +1,138 @@
+# Tests for the heartbeat lag engine against two local SQLite stand-ins, with a
+# fake "DMS" that copies the heartbeat row from source to target.
+
+import threading
+import time
+import urllib.request
+
+import check_replication_status
+from replication_lag import HEARTBEAT_TABLE, HeartbeatLagMonitor, ensure_heartbeat_table, serve_metrics
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def replicate(source, target):
+    """Copy the heartbeat rows from source to target, as DMS CDC would."""
+    ensure_heartbeat_table(target)
+    for row in source.query(f"SELECT source_id, seq, written_us FROM {HEARTBEAT_TABLE}"):
+        target.execute(f"DELETE FROM {HEARTBEAT_TABLE} WHERE source_id = %s", row[:1])
+        target.execute(f"INSERT INTO {HEARTBEAT_TABLE} (source_id, seq, written_us) VALUES (%s, %s, %s)", row)
+
+
+def test_lag_is_time_from_write_to_visible_on_target(source, target):
+    clock = FakeClock()
+    monitor = HeartbeatLagMonitor(source, target, source_id="rds-1", clock=clock)
+
+    monitor.beat()
+    assert monitor.poll() is None  # not replicated yet
+
+    clock.now += 0.25
+    replicate(source, target)
+    assert round(monitor.poll(), 3) == 0.25
+    assert monitor.poll() is None  # same heartbeat is only counted once
+
+    for lag in (0.1, 0.2, 0.3, 0.4):
+        monitor.beat()
+        clock.now += lag
+        replicate(source, target)
+        monitor.poll()
+    stats = monitor.stats()
+    assert stats["samples"] == 5
+    assert stats["p50_ms"] == 250.0
+    assert stats["max_ms"] == 400.0
+    assert stats["current_ms"] == 400.0
+
+
+class DroppedConnection:
+    """A target whose server went away: every query and the reconnect fail."""
+
+    def query_one(self, sql, params=()):
+        raise ConnectionResetError("server closed the connection")
+
+    def ping(self):
+        raise ConnectionRefusedError("reconnect failed")
+
+
+def test_poll_survives_a_failed_reconnect(source):
+    monitor = HeartbeatLagMonitor(source, DroppedConnection(), source_id="rds-1")
+    seq = monitor.beat()
+
+    assert monitor.poll() is None
+    assert monitor.wait_for_seq(seq, timeout=0.05) is False  # a timeout, not an exception
+    assert monitor.stats()["errors"] >= 4
+
+
+def test_current_lag_grows_while_replication_is_stalled(source, target):
+    clock = FakeClock()
+    monitor = HeartbeatLagMonitor(source, target, source_id="rds-1", clock=clock)
+    monitor.beat()
+    clock.now += 0.05
+    replicate(source, target)
+    monitor.poll()
+
+    # DMS stops applying: heartbeats keep being written, none arrive
+    for _ in range(10):
+        clock.now += 1
+        monitor.beat()
+        assert monitor.poll() is None
+    # The first unreplicated heartbeat was written 9s ago
+    assert monitor.stats()["current_ms"] == 9000.0
+
+
+def test_window_drops_old_samples(source, target):
+    clock = FakeClock()
+    monitor = HeartbeatLagMonitor(source, target, source_id="rds-1", window=10, clock=clock)
+    for _ in range(5):
+        monitor.beat()
+        clock.now += 5
+        replicate(source, target)
+        monitor.poll()
+    assert monitor.stats()["samples"] == 3  # observed at +15, +20, +25
+
+
+def test_background_monitor_with_replicating_stand_ins(stand_ins, source, target):
+    from db import connect
+
+    stop = threading.Event()
+
+    def fake_dms():
+        with connect(stand_ins[0]) as src, connect(stand_ins[1]) as dst:
+            ensure_heartbeat_table(src)
+            while not stop.is_set():
+                time.sleep(0.03)
+                replicate(src, dst)
+
+    dms = threading.Thread(target=fake_dms)
+    dms.start()
+    monitor = HeartbeatLagMonitor(source, target, interval=0.05).start()
+    server = serve_metrics(monitor, 0, host="127.0.0.1")
+    try:
+        time.sleep(0.6)
+        assert monitor.wait_for_lag(1.0, timeout=2)
+        body = urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics").read().decode()
+    finally:
+        monitor.stop()
+        server.shutdown()
+        stop.set()
+        dms.join()
+
+    stats = monitor.stats()
+    assert stats["samples"] >= 3
+    assert 0 < stats["p50_ms"] < 500
+    assert 'replication_lag_seconds{source_id=' in body
+    assert "replication_lag_current_seconds" in body
+
+
+def test_check_replication_status_fails_without_replication(stand_ins, capsys):
+    source_url, target_url = stand_ins
+    ok = check_replication_status.check_replication_status(
+        "rds-1", "aurora-1", source_url=source_url, target_url=target_url, duration=0.3, interval=0.05
+    )
+    assert ok is False
+    assert "No heartbeat reached the target" in capsys.readouterr().err
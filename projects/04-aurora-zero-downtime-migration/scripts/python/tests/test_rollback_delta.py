@@ -0,0 +1,155 @@
+# Tests for the rollback delta replay: the "source" stand-in plays RDS and the
+# "target" stand-in plays Aurora after cutover.
+
+import time
+
+import cutover_to_aurora
+import rollback_delta
+import rollback_to_rds
+from consistency_check import check_consistency
+from cutover_to_aurora import CutoverTimeline, DryRunReplicator, perform_cutover
+from load_synthetic_data import LiveTraffic, bulk_load
+from rollback_delta import DeltaReplayer, capture_boundary, install_change_capture, load_boundary, save_boundary
+from rollback_to_rds import WINDOW, perform_rollback
+
+ROLLBACK_ARGS = ("rds-1", "rds-1.example.internal", "Z123", "db.eduphoria.ex")
+
+
+def cut_over(stand_ins, source, target, tmp_path, rows=3000):
+    """Identical tables on both sides, change capture on 'Aurora', boundary saved."""
+    for url in stand_ins:
+        bulk_load(url, rows, writers=1)
+    install_change_capture(target, ["students"])
+    boundary_file = tmp_path / "boundary.json"
+    save_boundary(str(boundary_file), capture_boundary(target, ["students"]))
+    return str(boundary_file)
+
+
+def test_replays_inserts_updates_and_deletes(stand_ins, source, target, tmp_path):
+    boundary_file = cut_over(stand_ins, source, target, tmp_path)
+    target.execute("UPDATE students SET grade_level = 12 WHERE id IN (1, 2, 3)")
+    target.execute("DELETE FROM students WHERE id IN (10, 2999)")
+    target.execute("INSERT INTO students (id, name, grade_level) VALUES (5000, 'After Cutover', 9)")
+    target.execute("UPDATE students SET name = 'Renamed' WHERE id = 5000")
+
+    timeline = CutoverTimeline(window=WINDOW)
+    ok = perform_rollback(
+        *ROLLBACK_ARGS, aurora_url=stand_ins[1], rds_url=stand_ins[0], boundary_file=boundary_file,
+        batch_size=2, dry_run=True, timeline=timeline
+    )
+
+    assert ok is True
+    report, = check_consistency(*stand_ins, ["students"])
+    assert report.consistent
+    assert source.query_one("SELECT name FROM students WHERE id = 5000") == ("Renamed",)
+    assert 0 < timeline.write_unavailable_ms < 2000
+    assert [name for name, _ in timeline.marks][-4:] == [
+        "aurora_read_only_confirmed", "delta_replayed", "dns_change_submitted", "writable_on_rds"
+    ]
+
+
+def test_replay_catches_up_with_live_traffic_and_is_idempotent(stand_ins, source, target, tmp_path):
+    boundary_file = cut_over(stand_ins, source, target, tmp_path)
+    traffic = LiveTraffic(stand_ins[1], ops_per_sec=300, seed=3).start()
+    time.sleep(0.5)
+    traffic.stop()
+
+    for _ in range(2):  # replaying everything twice gives the same result
+        replayer = DeltaReplayer(target, source, load_boundary(boundary_file), batch_size=50)
+        replayer.replay()
+        assert replayer.pending() == 0
+    assert replayer.report.changelog_entries == sum(traffic.report.ops.values())
+    assert replayer.report.rows_per_second > 0
+    assert check_consistency(*stand_ins, ["students"])[0].consistent
+
+
+def test_high_water_fallback_replays_inserts_only(stand_ins, source, target):
+    for url in stand_ins:
+        bulk_load(url, 100, writers=1)
+    boundary = capture_boundary(target, ["students"])  # no change capture installed
+    assert boundary["changelog_seq"] is None and boundary["tables"]["students"]["high_water_id"] == 100
+    bulk_load(stand_ins[1], 25, writers=1)
+
+    replayer = DeltaReplayer(target, source, boundary, batch_size=10)
+    replayer.replay()
+
+    assert replayer.report.rows_upserted == 25
+    assert source.query_one("SELECT COUNT(*) FROM students")[0] == 125
+
+
+def test_cutover_captures_boundary_for_rollback(stand_ins, source, target, tmp_path):
+    for url in stand_ins:
+        bulk_load(url, 10, writers=1)
+    boundary_file = tmp_path / "boundary.json"
+
+    assert perform_cutover(
+        "rds-1", "aurora-1", "aurora-1.cluster.local", "Z123", "db.eduphoria.ex",
+        source_url=stand_ins[0], target_url=stand_ins[1], dry_run=True,
+        capture_tables=["students"], boundary_file=str(boundary_file)
+    )
+    target.execute("DELETE FROM students WHERE id = 4")
+
+    assert perform_rollback(
+        *ROLLBACK_ARGS, aurora_url=stand_ins[1], rds_url=stand_ins[0], boundary_file=str(boundary_file), dry_run=True
+    )
+    assert source.query_one("SELECT COUNT(*) FROM students WHERE id = 4")[0] == 0
+
+
+def test_stops_the_dms_task_before_rds_takes_writes(stand_ins, source, target, tmp_path, monkeypatch):
+    boundary_file = cut_over(stand_ins, source, target, tmp_path, rows=100)
+    target.execute("UPDATE students SET grade_level = 12 WHERE id = 1")
+    dms = DryRunReplicator(*stand_ins).start()  # RDS -> Aurora CDC left running after the cutover
+    restore = rollback_to_rds.restore_rds_write_access
+    replicating_when_writable = []
+
+    def writable(*args):
+        replicating_when_writable.append(dms.running)
+        return restore(*args)
+
+    monkeypatch.setattr(rollback_to_rds, "restore_rds_write_access", writable)
+    timeline = CutoverTimeline(window=WINDOW)
+
+    ok = perform_rollback(
+        *ROLLBACK_ARGS, aurora_url=stand_ins[1], rds_url=stand_ins[0], boundary_file=boundary_file,
+        dry_run=True, timeline=timeline, dry_run_replicator=dms
+    )
+
+    assert ok is True
+    assert replicating_when_writable == [False]
+    marks = [name for name, _ in timeline.marks]
+    assert marks.index("dms_task_stopped") < marks.index("rds_writable")
+    assert source.query_one("SELECT grade_level FROM students WHERE id = 1") == (12,)
+
+
+def test_refuses_to_run_without_the_dms_task(stand_ins, tmp_path):
+    assert perform_rollback(*ROLLBACK_ARGS, aurora_cluster_id="aurora-1", boundary_file=str(tmp_path / "b.json")) is False
+
+
+def capture_objects(conn):
+    return conn.query("SELECT name FROM sqlite_master WHERE type = 'trigger' OR name = 'migration_rollback_changelog'")
+
+
+def test_aborted_cutover_removes_the_change_capture(stand_ins, source, target, monkeypatch):
+    for url in stand_ins:
+        bulk_load(url, 10, writers=1)
+    monkeypatch.setattr(cutover_to_aurora.HeartbeatLagMonitor, "wait_for_lag", lambda *args, **kwargs: False)
+    timeline = CutoverTimeline()
+
+    ok = perform_cutover(
+        "rds-1", "aurora-1", "aurora-1.cluster.local", "Z123", "db.eduphoria.ex", source_url=stand_ins[0],
+        target_url=stand_ins[1], dry_run=True, capture_tables=["students"], timeline=timeline
+    )
+
+    assert ok is False
+    assert [name for name, _ in timeline.marks][-2:] == ["change_capture_installed", "aborted_change_capture_removed"]
+    assert capture_objects(target) == []
+
+
+def test_change_capture_removed_from_the_command_line(stand_ins, source, target, tmp_path, monkeypatch):
+    cut_over(stand_ins, source, target, tmp_path, rows=10)
+    assert len(capture_objects(target)) == 4
+    monkeypatch.setattr("sys.argv", ["rollback_delta.py", "--remove-change-capture", "--url", stand_ins[1]])
+
+    rollback_delta.main()
+
+    assert capture_objects(target) == []
@@ -0,0 +1,132 @@
+# Tests for the migration runner: tracking, online DDL and lag-aware backfills.
+
+import pytest
+
+from load_synthetic_data import bulk_load
+from run_migrations import (
+    MIGRATIONS_DIR, AdaptiveBatch, Backfill, apply_statement, load_migrations, run_backfill, run_migrations
+)
+
+BACKFILL_MIGRATION = """-- Grade band for reporting
+ALTER TABLE students ADD COLUMN grade_band VARCHAR(8) NULL;
+-- backfill: students SET grade_band = 'upper' WHERE grade_band IS NULL AND grade_level >= 11
+-- backfill: students SET grade_band = 'lower' WHERE grade_band IS NULL AND grade_level < 11
+"""
+
+
+def test_applies_repo_migrations_once(stand_ins, source):
+    bulk_load(stand_ins[0], 100, writers=1)
+
+    run_migrations(stand_ins[0])
+    assert "last_login_at" in source.columns("students")
+    versions = [row[0] for row in source.query("SELECT version FROM schema_migrations")]
+    assert versions == [m.version for m in load_migrations(MIGRATIONS_DIR)]
+
+    assert run_migrations(stand_ins[0]) == []  # nothing new: the ALTER is not re-run
+
+
+def test_rejects_migration_edited_after_apply(stand_ins, source, tmp_path):
+    bulk_load(stand_ins[0], 10, writers=1)
+    migration = tmp_path / "001_band.sql"
+    migration.write_text(BACKFILL_MIGRATION)
+    run_migrations(stand_ins[0], tmp_path)
+
+    migration.write_text(BACKFILL_MIGRATION + "-- edited\n")
+    with pytest.raises(ValueError):
+        run_migrations(stand_ins[0], tmp_path)
+
+
+def test_backfill_runs_in_growing_chunks(stand_ins, source, tmp_path):
+    bulk_load(stand_ins[0], 20_000, writers=1)
+    (tmp_path / "001_band.sql").write_text(BACKFILL_MIGRATION)
+
+    upper, lower = run_migrations(stand_ins[0], tmp_path, batch=AdaptiveBatch(initial=500))
+
+    assert upper.rows + lower.rows == 20_000
+    assert source.query_one("SELECT COUNT(*) FROM students WHERE grade_band IS NULL")[0] == 0
+    assert source.query_one("SELECT COUNT(*) FROM students WHERE grade_band = 'upper'")[0] == upper.rows
+    assert upper.min_batch == 500 and upper.max_batch > 500  # no lag signal, fast chunks: grows
+    assert upper.rows_per_second > 0
+
+
+def test_rerun_after_backfill_timeout_does_not_repeat_ddl(stand_ins, source, tmp_path):
+    bulk_load(stand_ins[0], 2000, writers=1)
+    (tmp_path / "001_band.sql").write_text(BACKFILL_MIGRATION)
+
+    with pytest.raises(TimeoutError):
+        run_migrations(stand_ins[0], tmp_path, lag_probe=lambda: 5.0, max_pause=0.05, pause_poll=0.01)
+    assert "grade_band" in source.columns("students")
+    assert source.query_one("SELECT statements_applied, applied_at FROM schema_migrations") == (1, None)
+
+    upper, lower = run_migrations(stand_ins[0], tmp_path)  # ADD COLUMN again would fail: duplicate column
+
+    assert upper.rows + lower.rows == 2000
+    assert source.query_one("SELECT applied_at FROM schema_migrations")[0] is not None
+    assert run_migrations(stand_ins[0], tmp_path) == []
+
+
+def test_backfill_pauses_and_shrinks_when_lag_rises(stand_ins, source):
+    bulk_load(stand_ins[0], 5000, writers=1)
+    source.execute("ALTER TABLE students ADD COLUMN note VARCHAR(8) NULL")
+    lags = iter([0.1, 0.1, 0.1, 3.0, 2.5, 0.5, 0.2])
+
+    report = run_backfill(
+        source, Backfill("students", "note = 'x'", "note IS NULL"),
+        lag_probe=lambda: next(lags, 0.1), batch=AdaptiveBatch(initial=1000), max_lag=2.0, pause_poll=0.01
+    )
+
+    assert report.rows == 5000
+    assert report.pauses == 1 and report.paused_seconds > 0
+    assert report.baseline_lag_ms == 100.0
+    assert report.max_lag_ms == 3000.0 and report.lag_impact_ms == 2900.0
+    assert report.min_batch < 1000
+
+
+class FakeMysqlError(Exception):
+    """pymysql-style error: args are (errno, message)."""
+
+
+class FakeMysql:
+    dialect = "mysql"
+
+    def __init__(self, supported, error=None):
+        self.supported = supported
+        self.error = error
+        self.executed = []
+
+    def execute(self, sql, params=()):
+        if self.error:
+            raise self.error
+        if "ALGORITHM" in sql and not any(a in sql for a in self.supported):
+            raise FakeMysqlError(1846, "ALGORITHM=INPLACE is not supported. Try ALGORITHM=COPY.")
+        self.executed.append(sql)
+
+
+def test_alter_table_runs_online_or_not_at_all():
+    conn = FakeMysql(supported=["INPLACE"])
+    apply_statement(conn, "ALTER TABLE students ADD INDEX idx_grade (grade_level)")
+    assert conn.executed == ["ALTER TABLE students ADD INDEX idx_grade (grade_level), ALGORITHM=INPLACE, LOCK=NONE"]
+
+    conn = FakeMysql(supported=[])
+    with pytest.raises(RuntimeError):
+        apply_statement(conn, "ALTER TABLE students MODIFY name TEXT")
+    apply_statement(conn, "ALTER TABLE students MODIFY name TEXT", allow_blocking=True)
+    assert conn.executed == ["ALTER TABLE students MODIFY name TEXT"]
+
+
+def test_only_unsupported_algorithm_falls_back():
+    lock_timeout = FakeMysqlError(1205, "Lock wait timeout exceeded; try restarting transaction")
+    conn = FakeMysql(supported=["INSTANT", "INPLACE"], error=lock_timeout)
+    with pytest.raises(FakeMysqlError) as raised:
+        apply_statement(conn, "ALTER TABLE students ADD COLUMN note VARCHAR(8) NULL", allow_blocking=True)
+    assert raised.value is lock_timeout and conn.executed == []  # not reported as "needs a table copy"
+
+    class Mysql57(FakeMysql):  # no INSTANT before 8.0.12: unknown algorithm, not "not supported"
+        def execute(self, sql, params=()):
+            if "INSTANT" in sql:
+                raise FakeMysqlError(1800, "Unknown ALGORITHM 'INSTANT'")
+            super().execute(sql, params)
+
+    conn = Mysql57(supported=["INPLACE"])
+    apply_statement(conn, "ALTER TABLE students ADD COLUMN note VARCHAR(8) NULL")
+    assert conn.executed == ["ALTER TABLE students ADD COLUMN note VARCHAR(8) NULL, ALGORITHM=INPLACE, LOCK=NONE"]
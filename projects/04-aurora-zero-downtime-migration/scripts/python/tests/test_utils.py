@@ -0,0 +1,50 @@
+# Tests for the shared AWS client registry, with botocore's Stubber in place of AWS.
+
+import pytest
+from botocore.exceptions import ClientError
+from botocore.stub import Stubber
+
+import utils
+from utils import AwsClientRegistry, poll_until
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    return AwsClientRegistry()
+
+
+def test_clients_are_shared_per_service_and_region(registry):
+    route53 = registry.client("route53")
+    assert registry.client("route53") is route53
+    assert registry.client("route53", "eu-west-1") is not route53
+    assert registry.client("rds")._client_config.retries["mode"] == "adaptive"
+    assert route53.meta.config.connect_timeout == utils.BOTO_CONFIG.connect_timeout
+
+
+def test_call_summary_traces_latency_errors_and_retries(registry):
+    route53 = registry.client("route53")
+    with Stubber(route53) as stub:
+        stub.add_response("get_change", {
+            "ChangeInfo": {"Id": "/change/C1", "Status": "INSYNC", "SubmittedAt": "2026-01-01T00:00:00Z"},
+            "ResponseMetadata": {"RetryAttempts": 2},
+        }, {"Id": "/change/C1"})
+        stub.add_client_error("get_change", "NoSuchChange")
+        route53.get_change(Id="/change/C1")
+        with pytest.raises(ClientError):
+            route53.get_change(Id="/change/C2")
+
+    row, = registry.call_summary()
+    assert row["operation"] == "route53.GetChange"
+    assert (row["calls"], row["errors"], row["retries"]) == (2, 1, 2)
+    assert 0 <= row["p50_ms"] <= row["max_ms"]
+
+    registry.reset_call_stats()
+    assert registry.call_summary() == []
+
+
+def test_poll_until_backs_off_and_times_out():
+    checks = []
+    assert poll_until(lambda: checks.append(1) or len(checks) == 3, timeout=1) is True
+    assert poll_until(lambda: False, timeout=0.05, first_interval=0.01) is False
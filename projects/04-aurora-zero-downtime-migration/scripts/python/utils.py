@@ -3,14 +3,32 @@ Shared utilities for migration scripts.
 
 This module provides common functionality used across multiple migration scripts,
 including AWS client creation, error handling, and logging utilities.
+
+AWS clients come from one process-wide registry: a single boto3 session
+(credentials are resolved once) and one client per service and region, all
+sharing a tuned botocore config. Every API call made through them is timed, so
+scripts can print a per-operation latency/retry summary when they finish.
 """
 
 import sys
 import logging
-from typing import Optional
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError, BotoCoreError
 
+# Cutover/rollback calls are few and latency-sensitive: fail fast on a dead
+# connection, retry throttling with client-side rate limiting, keep connections warm
+BOTO_CONFIG = Config(
+    retries={"mode": "adaptive", "max_attempts": 5},
+    connect_timeout=2,
+    read_timeout=10,
+    max_pool_connections=20,
+    tcp_keepalive=True,
+)
+
 
 def setup_logging(level: int = logging.INFO) -> logging.Logger:
     """
@@ -30,6 +48,119 @@ def setup_logging(level: int = logging.INFO) -> logging.Logger:
     return logging.getLogger(__name__)
 
 
+class AwsClientRegistry:
+    """
+    Shared boto3 session and clients, with per-operation call tracing.
+
+    Clients are created once per (service, region) and are safe to share
+    between threads; creation itself is serialized because boto3 sessions
+    are not thread-safe.
+    """
+
+    def __init__(self, config: Config = BOTO_CONFIG):
+        self.config = config
+        self._session = None
+        self._clients: Dict[Tuple[str, str], object] = {}
+        self._calls: Dict[str, List] = {}  # "service.Operation" -> [latencies_ms, errors, retries]
+        self._lock = threading.Lock()
+
+    def session(self) -> boto3.Session:
+        with self._lock:
+            if self._session is None:
+                self._session = boto3.Session()
+            return self._session
+
+    def client(self, service: str, region: str = "us-east-1"):
+        """Return the shared client for `service` in `region`, creating it on first use."""
+        key = (service, region)
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        session = self.session()
+        with self._lock:
+            if key not in self._clients:
+                client = session.client(service, region_name=region, config=self.config)
+                events = client.meta.events
+                events.register("before-parameter-build", self._call_started)
+                events.register("after-call", self._call_finished)
+                events.register("after-call-error", self._call_failed)
+                self._clients[key] = client
+            return self._clients[key]
+
+    # -- tracing -----------------------------------------------------------
+
+    def _call_started(self, model, context, **kwargs):
+        context["trace_operation"] = f"{model.service_model.endpoint_prefix}.{model.name}"
+        context["trace_started"] = time.perf_counter()
+
+    def _call_finished(self, http_response, parsed, model, context, **kwargs):
+        retries = parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+        self._record(context, error=http_response.status_code >= 300, retries=retries)
+
+    def _call_failed(self, exception, context, **kwargs):
+        self._record(context, error=True, retries=0)
+
+    def _record(self, context, error: bool, retries: int) -> None:
+        started = context.pop("trace_started", None)
+        if started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        operation = context["trace_operation"]
+        with self._lock:
+            stats = self._calls.setdefault(operation, [[], 0, 0])
+            stats[0].append(elapsed_ms)
+            stats[1] += int(error)
+            stats[2] += retries
+
+    def call_summary(self) -> List[Dict]:
+        """One row per traced operation: calls, errors, retries and latency in ms."""
+        with self._lock:
+            calls = {op: (sorted(lat), errors, retries) for op, (lat, errors, retries) in self._calls.items()}
+        return [
+            {
+                "operation": op,
+                "calls": len(latencies),
+                "errors": errors,
+                "retries": retries,
+                "total_ms": round(sum(latencies), 1),
+                "p50_ms": round(latencies[(len(latencies) - 1) // 2], 1),
+                "max_ms": round(latencies[-1], 1),
+            }
+            for op, (latencies, errors, retries) in sorted(calls.items())
+        ]
+
+    def reset_call_stats(self) -> None:
+        with self._lock:
+            self._calls.clear()
+
+
+REGISTRY = AwsClientRegistry()
+
+
+def get_client(service: str, region: str = "us-east-1"):
+    """Shared client for `service` in `region` from the process-wide registry."""
+    return REGISTRY.client(service, region)
+
+
+def reset_call_stats() -> None:
+    """Forget the traced AWS calls (e.g. at the start of a cutover run)."""
+    REGISTRY.reset_call_stats()
+
+
+def print_call_summary() -> None:
+    """Print per-operation AWS call latency and retries, if any calls were made."""
+    summary = REGISTRY.call_summary()
+    if not summary:
+        return
+    print(f"AWS API calls ({sum(row['calls'] for row in summary)} calls, "
+          f"{sum(row['total_ms'] for row in summary):.1f} ms total):")
+    for row in summary:
+        print(
+            f"  {row['operation']:<40} calls {row['calls']:>3}  errors {row['errors']}  "
+            f"retries {row['retries']}  p50 {row['p50_ms']:.1f} ms  max {row['max_ms']:.1f} ms"
+        )
+
+
 def create_rds_client(region: str = "us-east-1") -> boto3.client:
     """
     Create and return an RDS client.
@@ -44,11 +175,30 @@ def create_rds_client(region: str = "us-east-1") -> boto3.client:
         BotoCoreError: If client creation fails
     """
     try:
-        return boto3.client('rds', region_name=region)
+        return get_client('rds', region)
     except BotoCoreError as e:
         raise RuntimeError(f"Failed to create RDS client: {e}") from e
 
 
+def create_dms_client(region: str = "us-east-1") -> boto3.client:
+    """
+    Create and return a DMS client.
+    
+    Args:
+        region: AWS region (default: us-east-1)
+        
+    Returns:
+        boto3 DMS client
+        
+    Raises:
+        BotoCoreError: If client creation fails
+    """
+    try:
+        return get_client('dms', region)
+    except BotoCoreError as e:
+        raise RuntimeError(f"Failed to create DMS client: {e}") from e
+
+
 def create_route53_client(region: str = "us-east-1") -> boto3.client:
     """
     Create and return a Route 53 client.
@@ -63,7 +213,7 @@ def create_route53_client(region: str = "us-east-1") -> boto3.client:
         BotoCoreError: If client creation fails
     """
     try:
-        return boto3.client('route53', region_name=region)
+        return get_client('route53', region)
     except BotoCoreError as e:
         raise RuntimeError(f"Failed to create Route 53 client: {e}") from e
 
@@ -101,7 +251,7 @@ def validate_aws_credentials() -> bool:
         True if credentials are available, False otherwise
     """
     try:
-        sts = boto3.client('sts')
+        sts = get_client('sts')
         sts.get_caller_identity()
         return True
     except (ClientError, BotoCoreError):
@@ -111,3 +261,39 @@ def validate_aws_credentials() -> bool:
         )
         return False
 
+
+
+def poll_until(
+    check: Callable[[], bool],
+    timeout: float,
+    first_interval: float = 0.005,
+    max_interval: float = 0.25,
+    backoff: float = 1.5
+) -> bool:
+    """
+    Call `check` until it returns True, starting with very short sleeps.
+
+    Polls that are expected to succeed quickly (a read-only flag, a replicated
+    row) are answered within a few milliseconds; the interval then grows
+    geometrically so a slow wait doesn't hammer the endpoint.
+
+    Args:
+        check: Returns True once the condition holds
+        timeout: Seconds to keep polling
+        first_interval: First sleep between checks
+        max_interval: Upper bound for the sleep
+        backoff: Growth factor of the sleep
+
+    Returns:
+        True if the condition held before the timeout, False otherwise
+    """
+    deadline = time.monotonic() + timeout
+    interval = first_interval
+    while True:
+        if check():
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(interval, remaining))
+        interval = min(interval * backoff, max_interval)
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Offline load simulation for the auto-healer Lambda.
+
+Drives lambda_handler against stubbed ecs/elbv2/ec2 clients that serve a
+synthetic cluster, so the healer can be measured without an AWS account.
+Each scenario reports wall time, API calls per operation and peak memory,
+for a cold container (empty caches) and a warm repeat alarm.
+
+Usage:
+    pip install boto3
+    python benchmarks/bench_auto_healer.py
+    python benchmarks/bench_auto_healer.py --tasks 1000,20000 --bridge-fraction 0.5 \
+        --unhealthy 0.05 --latency-ms 20 --throttle-rate 0.1 --json results.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "lambda"))
+
+from botocore.exceptions import ClientError  # noqa: E402
+
+import auto_heal_service  # noqa: E402
+
+ACCOUNT = "123456789012"
+REGION = "us-east-1"
+CLUSTER = "bench"
+LIST_TASKS_PAGE_SIZE = 100
+
+
+class ApiStats:
+    """Thread-safe API call counter with injected latency and throttling."""
+
+    def __init__(self, latency_ms=0.0, throttle_rate=0.0, seed=0):
+        self.latency = latency_ms / 1000.0
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+        self.calls = Counter()
+        self.throttled = Counter()
+        self.lock = threading.Lock()
+
+    def call(self, operation, throttleable=False):
+        with self.lock:
+            self.calls[operation] += 1
+            throttle = throttleable and self.random.random() < self.throttle_rate
+            if throttle:
+                self.throttled[operation] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if throttle:
+            raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}}, operation)
+
+
+class SyntheticCluster:
+    """
+    A cluster of `num_tasks` tasks across `services`, a share of them in bridge
+    mode on EC2 container instances, the rest awsvpc. Every task is registered
+    in one of `target_groups` and `unhealthy` of them fail health checks.
+    """
+
+    def __init__(self, num_tasks, bridge_fraction=0.0, unhealthy=0.05, services=10,
+                 target_groups=4, tasks_per_instance=4, seed=0):
+        rng = random.Random(seed)
+        self.tasks = {}
+        self.services = {}
+        self.container_instances = {}
+        self.target_groups = [
+            f"arn:aws:elasticloadbalancing:{REGION}:{ACCOUNT}:targetgroup/bench-{n}/{n:016x}"
+            for n in range(target_groups)
+        ]
+        self.targets = {tg: [] for tg in self.target_groups}
+
+        for n in range(num_tasks):
+            service = f"svc-{n % services}"
+            self.services[service] = self.services.get(service, 0) + 1
+            arn = f"arn:aws:ecs:{REGION}:{ACCOUNT}:task/{CLUSTER}/{n:032x}"
+            task = {
+                "taskArn": arn,
+                "group": f"service:{service}",
+                "lastStatus": "RUNNING",
+                "desiredStatus": "RUNNING",
+                "containers": [{"name": "app", "networkBindings": []}],
+                "attachments": [],
+            }
+            if rng.random() < bridge_fraction:
+                instance = n // tasks_per_instance
+                ci_arn = f"arn:aws:ecs:{REGION}:{ACCOUNT}:container-instance/{CLUSTER}/{instance:032x}"
+                instance_id = f"i-{instance:017x}"
+                ip = f"10.1.{instance // 250}.{instance % 250}"
+                self.container_instances[ci_arn] = (instance_id, ip)
+                host_port = 32768 + n % tasks_per_instance
+                task["containerInstanceArn"] = ci_arn
+                task["containers"][0]["networkBindings"] = [
+                    {"bindIP": "0.0.0.0", "containerPort": 80, "hostPort": host_port, "protocol": "tcp"}
+                ]
+                target_id, port = ip, host_port
+            else:
+                ip = f"10.0.{n // 250}.{n % 250}"
+                task["attachments"] = [{
+                    "type": "ElasticNetworkInterface",
+                    "details": [{"name": "privateIPv4Address", "value": ip}],
+                }]
+                target_id, port = ip, 80
+
+            state = "unhealthy" if rng.random() < unhealthy else "healthy"
+            self.targets[self.target_groups[n % target_groups]].append(
+                {"Target": {"Id": target_id, "Port": port}, "TargetHealth": {"State": state}}
+            )
+            self.tasks[arn] = task
+
+        self.instance_ips = {iid: ip for iid, ip in self.container_instances.values()}
+
+    @property
+    def unhealthy_count(self):
+        return sum(
+            1 for targets in self.targets.values() for t in targets
+            if t["TargetHealth"]["State"] == "unhealthy"
+        )
+
+
+class _Paginator:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def paginate(self, **kwargs):
+        return self.pages(**kwargs)
+
+
+class StubEcs:
+    def __init__(self, cluster, stats):
+        self.cluster = cluster
+        self.stats = stats
+
+    def get_paginator(self, name):
+        assert name == "list_tasks", name
+
+        def pages(**kwargs):
+            arns = list(self.cluster.tasks)
+            for i in range(0, max(len(arns), 1), LIST_TASKS_PAGE_SIZE):
+                self.stats.call("ListTasks")
+                yield {"taskArns": arns[i:i + LIST_TASKS_PAGE_SIZE]}
+
+        return _Paginator(pages)
+
+    def describe_tasks(self, cluster, tasks):
+        self.stats.call("DescribeTasks")
+        return {"tasks": [self.cluster.tasks[arn] for arn in tasks if arn in self.cluster.tasks]}
+
+    def describe_services(self, cluster, services):
+        self.stats.call("DescribeServices")
+        return {"services": [
+            {"serviceName": name, "desiredCount": self.cluster.services[name]}
+            for name in services if name in self.cluster.services
+        ]}
+
+    def describe_container_instances(self, cluster, containerInstances):
+        self.stats.call("DescribeContainerInstances")
+        return {"containerInstances": [
+            {"containerInstanceArn": arn, "ec2InstanceId": self.cluster.container_instances[arn][0]}
+            for arn in containerInstances
+        ]}
+
+    def stop_task(self, cluster, task, reason):
+        self.stats.call("StopTask", throttleable=True)
+        return {"task": {"taskArn": task, "desiredStatus": "STOPPED"}}
+
+
+class StubElbv2:
+    def __init__(self, cluster, stats):
+        self.cluster = cluster
+        self.stats = stats
+
+    def get_paginator(self, name):
+        assert name == "describe_target_groups", name
+
+        def pages(**kwargs):
+            self.stats.call("DescribeTargetGroups")
+            yield {"TargetGroups": [{"TargetGroupArn": arn} for arn in self.cluster.target_groups]}
+
+        return _Paginator(pages)
+
+    def describe_target_health(self, TargetGroupArn):
+        self.stats.call("DescribeTargetHealth")
+        return {"TargetHealthDescriptions": self.cluster.targets[TargetGroupArn]}
+
+
+class StubEc2:
+    def __init__(self, cluster, stats):
+        self.cluster = cluster
+        self.stats = stats
+
+    def describe_instances(self, InstanceIds):
+        self.stats.call("DescribeInstances")
+        return {"Reservations": [{"Instances": [
+            {"InstanceId": iid, "PrivateIpAddress": self.cluster.instance_ips[iid]} for iid in InstanceIds
+        ]}]}
+
+
+def alarm_event():
+    """A 5xx alarm on the load balancer, as wired up in terraform/main.tf."""
+    return {
+        "region": REGION,
+        "account": ACCOUNT,
+        "detail-type": "CloudWatch Alarm State Change",
+        "detail": {"configuration": {"metrics": [{
+            "metricStat": {"metric": {"dimensions": {"LoadBalancer": f"app/{CLUSTER}/0123456789abcdef"}}}
+        }]}},
+    }
+
+
+def install(cluster, stats):
+    """Point the handler at stub clients and reset every warm-container cache."""
+    auto_heal_service.CLUSTER_NAME = CLUSTER
+    auto_heal_service.CLIENTS = {
+        "ecs": StubEcs(cluster, stats),
+        "elbv2": StubElbv2(cluster, stats),
+        "ec2": StubEc2(cluster, stats),
+    }
+    auto_heal_service.TOPOLOGY = auto_heal_service.TaskTopology()
+    auto_heal_service.CONTAINER_INSTANCES = {}
+    auto_heal_service.KILL_LEDGER = auto_heal_service.InMemoryKillLedger()
+    auto_heal_service.STOP_BUCKET = auto_heal_service.TokenBucket(
+        auto_heal_service.STOP_RATE_PER_SECOND, auto_heal_service.STOP_BURST
+    )
+
+
+def run_invocation(cluster, stats, measure_memory=False):
+    if measure_memory:
+        tracemalloc.start()
+    calls_before = stats.calls.copy()
+    emf = io.StringIO()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(emf):
+        result = auto_heal_service.lambda_handler(alarm_event(), None)
+    wall_ms = (time.perf_counter() - started) * 1000
+    # The handler's own EMF document carries the per-phase breakdown
+    metrics = json.loads(emf.getvalue().strip().splitlines()[-1])
+    phases = {
+        m["Name"]: metrics[m["Name"]]
+        for m in metrics["_aws"]["CloudWatchMetrics"][0]["Metrics"] if m["Unit"] == "Milliseconds"
+    }
+    peak_mb = None
+    if measure_memory:
+        peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+    return {
+        "wall_ms": round(wall_ms, 2),
+        "api_calls": dict(stats.calls - calls_before),
+        "api_calls_total": sum((stats.calls - calls_before).values()),
+        "peak_mb": round(peak_mb, 2) if peak_mb is not None else None,
+        "phases_ms": phases,
+        "stopped": len(result.get("killed_tasks", [])),
+        "deferred": len(result.get("deferred_tasks", [])),
+        "suppressed": len(result.get("suppressed_tasks", [])),
+        "status": result.get("status", "ok"),
+    }
+
+
+def run_scenario(num_tasks, args):
+    cluster = SyntheticCluster(
+        num_tasks,
+        bridge_fraction=args.bridge_fraction,
+        unhealthy=args.unhealthy,
+        services=args.services,
+        target_groups=args.target_groups,
+        seed=args.seed,
+    )
+
+    # Peak memory is measured in its own cold run: tracemalloc skews wall time.
+    stats = ApiStats(args.latency_ms, args.throttle_rate, args.seed)
+    install(cluster, stats)
+    memory = run_invocation(cluster, stats, measure_memory=True)
+
+    stats = ApiStats(args.latency_ms, args.throttle_rate, args.seed)
+    install(cluster, stats)
+    cold = run_invocation(cluster, stats)
+    warm = run_invocation(cluster, stats)
+    cold["peak_mb"] = memory["peak_mb"]
+
+    return {
+        "tasks": num_tasks,
+        "unhealthy_targets": cluster.unhealthy_count,
+        "container_instances": len(cluster.container_instances),
+        "throttled": dict(stats.throttled),
+        "cold": cold,
+        "warm": warm,
+    }
+
+
+def print_report(results):
+    header = f"{'tasks':>7} {'unhealthy':>9} {'run':>5} {'wall ms':>10} {'api calls':>9} {'peak MB':>8} {'stopped':>8} {'deferred':>8} {'suppressed':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        for run in ("cold", "warm"):
+            m = r[run]
+            peak = f"{m['peak_mb']:.2f}" if m["peak_mb"] is not None else "-"
+            print(
+                f"{r['tasks']:>7} {r['unhealthy_targets']:>9} {run:>5} {m['wall_ms']:>10.1f} "
+                f"{m['api_calls_total']:>9} {peak:>8} {m['stopped']:>8} {m['deferred']:>8} {m['suppressed']:>10}"
+            )
+    print()
+    for r in results:
+        print(f"{r['tasks']} tasks, cold API calls: {r['cold']['api_calls']}")
+        print(f"{r['tasks']} tasks, cold phases (ms): {r['cold']['phases_ms']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load simulation for the ECS auto-healer Lambda")
+    parser.add_argument("--tasks", default="10,1000,5000,20000",
+                        help="Comma-separated cluster sizes (default: 10,1000,5000,20000)")
+    parser.add_argument("--bridge-fraction", type=float, default=0.5,
+                        help="Share of tasks in bridge mode on EC2 (default: 0.5)")
+    parser.add_argument("--unhealthy", type=float, default=0.01,
+                        help="Share of targets failing health checks (default: 0.01)")
+    parser.add_argument("--services", type=int, default=10, help="Number of ECS services (default: 10)")
+    parser.add_argument("--target-groups", type=int, default=4, help="Target groups behind the ALB (default: 4)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Injected latency per API call (default: 0)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0,
+                        help="Probability that a StopTask call is throttled (default: 0)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Backoff sleeps would dominate throttling scenarios; keep them short but present.
+    auto_heal_service.STOP_BACKOFF_BASE_SECONDS = min(auto_heal_service.STOP_BACKOFF_BASE_SECONDS, 0.01)
+
+    results = [run_scenario(int(n), args) for n in args.tasks.split(",")]
+    print_report(results)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the auto-healer Lambda: time to first StopTask.
+
+Every sample is a fresh Python process that imports auto_heal_service and runs
+one alarm invocation with real boto3 clients. A 'before-call' hook on the
+default session answers each API call with a canned response (after request
+serialization, before any network I/O), so client creation, service-model
+loading and parameter handling are all measured without an AWS account.
+
+Modes:
+    eager  - what the module used to do: ecs/elbv2/ec2 clients created at import
+             with the default botocore config
+    lazy   - the current module: clients created on first use with the tuned config
+
+Usage:
+    pip install boto3
+    python benchmarks/bench_cold_start.py --runs 30 --latency-ms 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+LAMBDA_DIR = Path(__file__).resolve().parent.parent / "lambda"
+REGION = "us-east-1"
+ACCOUNT = "123456789012"
+TG_ARN = f"arn:aws:elasticloadbalancing:{REGION}:{ACCOUNT}:targetgroup/cold/0123456789abcdef"
+NUM_TASKS = 20
+
+
+def _canned_responses():
+    task_arns = [f"arn:aws:ecs:{REGION}:{ACCOUNT}:task/cold/{n:032x}" for n in range(NUM_TASKS)]
+    tasks = [{
+        "taskArn": arn,
+        "group": "service:cold",
+        "containers": [{"name": "app", "networkBindings": []}],
+        "attachments": [{
+            "type": "ElasticNetworkInterface",
+            "details": [{"name": "privateIPv4Address", "value": f"10.0.0.{n}"}],
+        }],
+    } for n, arn in enumerate(task_arns)]
+    targets = [{
+        "Target": {"Id": f"10.0.0.{n}", "Port": 80},
+        "TargetHealth": {"State": "unhealthy" if n < 2 else "healthy"},
+    } for n in range(NUM_TASKS)]
+    return {
+        "DescribeTargetGroups": {"TargetGroups": [{"TargetGroupArn": TG_ARN}]},
+        "DescribeTargetHealth": {"TargetHealthDescriptions": targets},
+        "ListTasks": {"taskArns": task_arns},
+        "DescribeTasks": {"tasks": tasks},
+        "DescribeServices": {"services": [{"serviceName": "cold", "desiredCount": NUM_TASKS}]},
+        "StopTask": {"task": {}},
+    }
+
+
+def child(mode, latency_ms):
+    """Runs inside the fresh interpreter; prints one JSON line with its timings."""
+    os.environ.setdefault("AWS_DEFAULT_REGION", REGION)
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+    os.environ["CLUSTER_NAME"] = "cold"
+    sys.path.insert(0, str(LAMBDA_DIR))
+
+    import boto3
+    from botocore.awsrequest import AWSResponse
+
+    responses = _canned_responses()
+    first_stop = {}
+
+    def respond(model, **kwargs):
+        if latency_ms:
+            time.sleep(latency_ms / 1000.0)
+        if model.name == "StopTask" and not first_stop:
+            first_stop["epoch"] = time.time()
+        return AWSResponse(None, 200, {}, None), responses[model.name]
+
+    boto3.setup_default_session(region_name=REGION)
+    boto3.DEFAULT_SESSION.events.register("before-call", respond)
+
+    import auto_heal_service
+
+    if mode == "eager":
+        for service in ("ecs", "elbv2", "ec2"):
+            auto_heal_service.CLIENTS[service] = boto3.client(service)
+
+    event = {
+        "region": REGION,
+        "account": ACCOUNT,
+        "detail": {"configuration": {"metrics": [{
+            "metricStat": {"metric": {"dimensions": {"LoadBalancer": "app/cold/0123456789abcdef"}}}
+        }]}},
+    }
+    result = auto_heal_service.lambda_handler(event, None)
+    print(json.dumps({
+        "first_stop_epoch": first_stop["epoch"],
+        "stopped": len(result["killed_tasks"]),
+        "cold_start": result.get("cold_start"),
+    }))
+
+
+def sample(mode, latency_ms):
+    spawned = time.time()
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", mode, "--latency-ms", str(latency_ms)],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    data = json.loads(out.strip().splitlines()[-1])
+    return (data["first_stop_epoch"] - spawned) * 1000, data
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start time-to-first-stop benchmark for the auto-healer")
+    parser.add_argument("--runs", type=int, default=20, help="Fresh processes per mode (default: 20)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Injected latency per API call (default: 0)")
+    parser.add_argument("--json", help="Also write the raw samples to this JSON file")
+    parser.add_argument("--child", choices=["eager", "lazy"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.latency_ms)
+        return
+
+    samples = {"eager": [], "lazy": []}
+    details = {"eager": [], "lazy": []}
+    # Interleave the modes so machine noise hits both equally
+    for _ in range(args.runs):
+        for mode in samples:
+            ms, data = sample(mode, args.latency_ms)
+            samples[mode].append(ms)
+            details[mode].append(data)
+
+    print(f"Time from process spawn to first StopTask ({args.runs} runs, {args.latency_ms} ms/API call)")
+    print(f"{'mode':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'mean ms':>9}  clients created")
+    for mode, values in samples.items():
+        clients = details[mode][-1]["cold_start"]["client_init_ms"]
+        print(
+            f"{mode:>6} {percentile(values, 50):>9.1f} {percentile(values, 90):>9.1f} "
+            f"{percentile(values, 99):>9.1f} {statistics.mean(values):>9.1f}  {sorted(clients) or 'at import'}"
+        )
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"samples_ms": samples, "details": details}, indent=2))
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
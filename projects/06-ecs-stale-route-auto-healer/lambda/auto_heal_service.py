@@ -1,71 +1,923 @@
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
 import boto3
 import os
+import json
+import random
 import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError, ConnectionError as BotoConnectionError, HTTPClientError
 
-ecs = boto3.client('ecs')
-elbv2 = boto3.client('elbv2')
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 CLUSTER_NAME = os.environ.get('CLUSTER_NAME') # Retrieved from Terraform env var
 
-def lambda_handler(event, context):
-    # 1. Get TargetGroup ARN from Alarm
-    # (Note: Alarm dimension parsing logic remains the same)
-    tg_arn = event['detail']['configuration']['metrics'][0]['metricStat']['metric']['dimensions']['TargetGroup']
-    
-    # 2. Find unhealthy targets
-    health = elbv2.describe_target_health(TargetGroupArn=tg_arn)
-    unhealthy_targets = [
-        t for t in health['TargetHealthDescriptions']
-        if t['TargetHealth']['State'] in ['unhealthy', 'draining']
-    ]
+# AWS allows describing up to 100 tasks (and container instances) at once.
+DESCRIBE_TASKS_BATCH_SIZE = 100
+DESCRIBE_CONTAINER_INSTANCES_BATCH_SIZE = 100
+DESCRIBE_INSTANCES_BATCH_SIZE = 500
+
+# Warm containers reuse the cluster topology between alarms. It is rebuilt after
+# the TTL, or on a lookup miss once it is older than the miss-refresh interval.
+TOPOLOGY_CACHE_TTL_SECONDS = float(os.environ.get('TOPOLOGY_CACHE_TTL_SECONDS', '300'))
+TOPOLOGY_MISS_REFRESH_SECONDS = float(os.environ.get('TOPOLOGY_MISS_REFRESH_SECONDS', '30'))
+
+# Stops run in a bounded pool behind a token bucket sized under the ECS StopTask
+# quota; the bucket rate halves on throttling and creeps back up on success.
+STOP_CONCURRENCY = int(os.environ.get('STOP_CONCURRENCY', '8'))
+STOP_RATE_PER_SECOND = float(os.environ.get('STOP_RATE_PER_SECOND', '20'))
+STOP_BURST = int(os.environ.get('STOP_BURST', '40'))
+STOP_MAX_ATTEMPTS = int(os.environ.get('STOP_MAX_ATTEMPTS', '5'))
+STOP_BACKOFF_BASE_SECONDS = float(os.environ.get('STOP_BACKOFF_BASE_SECONDS', '0.1'))
+
+# Never stop more than this fraction of a service's desiredCount per invocation.
+MAX_KILL_FRACTION = float(os.environ.get('MAX_KILL_FRACTION', '0.5'))
+
+# Flap suppression: tasks still warming up are left alone, a task is stopped at
+# most once per cooldown, MAX_KILL_FRACTION applies to kills over a sliding
+# window (not just one invocation), and a target group with at least
+# STAND_DOWN_UNHEALTHY_FRACTION of its targets unhealthy is a fleet-wide problem
+# (bad deploy, broken dependency) that stopping tasks cannot fix.
+WARMUP_GRACE_SECONDS = float(os.environ.get('WARMUP_GRACE_SECONDS', '120'))
+TASK_KILL_COOLDOWN_SECONDS = float(os.environ.get('TASK_KILL_COOLDOWN_SECONDS', '600'))
+SERVICE_KILL_WINDOW_SECONDS = float(os.environ.get('SERVICE_KILL_WINDOW_SECONDS', '300'))
+STAND_DOWN_UNHEALTHY_FRACTION = float(os.environ.get('STAND_DOWN_UNHEALTHY_FRACTION', '0.9'))
+
+# Kill history lives in DynamoDB when KILL_LEDGER_TABLE is set, so every
+# concurrent container shares it; otherwise in memory for this container only.
+KILL_LEDGER_TABLE = os.environ.get('KILL_LEDGER_TABLE')
+
+# AWS allows describing up to 10 services at once.
+DESCRIBE_SERVICES_BATCH_SIZE = 10
+
+# Target groups are described concurrently; an alarm with no TargetGroup
+# dimension (composite alarms) falls back to this comma-separated list.
+HEALTH_CONCURRENCY = int(os.environ.get('HEALTH_CONCURRENCY', '8'))
+TARGET_GROUP_ARNS = [arn for arn in os.environ.get('TARGET_GROUP_ARNS', '').split(',') if arn]
+
+THROTTLING_ERROR_CODES = {'ThrottlingException', 'Throttling', 'TooManyRequestsException', 'RequestLimitExceeded'}
+# Retried by stop_task itself, whose client makes a single attempt per call
+TRANSIENT_ERROR_CODES = {'ServerException', 'ServiceUnavailable', 'InternalFailure', 'InternalError'}
+TRANSIENT_ERRORS = (BotoConnectionError, HTTPClientError)
+
+# Clients are created on first use (a Fargate-only cluster never loads the large
+# EC2 service model) and reused by warm containers. The pool is sized for the
+# stop/health thread pools; adaptive retries client-side rate limit on throttles.
+# StopTask is the exception: stop_task retries it behind the token bucket, so its
+# client makes one attempt per call instead of stacking botocore's retries on top.
+CONNECT_TIMEOUT_SECONDS = float(os.environ.get('CONNECT_TIMEOUT_SECONDS', '2'))
+READ_TIMEOUT_SECONDS = float(os.environ.get('READ_TIMEOUT_SECONDS', '10'))
+MAX_RETRY_ATTEMPTS = int(os.environ.get('MAX_RETRY_ATTEMPTS', '5'))
+
+CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+# Cold-start timeline, reported once by the first invocation of this container.
+INIT_TIMINGS = {'client_init_ms': {}}
+
+# Per-phase timings and counts are printed as one CloudWatch Embedded Metric
+# Format document per alarm invocation; no PutMetricData on the hot path.
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'ECSAutoHealer')
+
+
+class InvocationMetrics:
+    """Phase timers (ms) and counters for one invocation; safe to update from worker threads."""
+
+    def __init__(self):
+        self.timings = {}
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, (time.perf_counter() - started) * 1000)
+
+    def add_time(self, name, milliseconds):
+        with self.lock:
+            self.timings[name] = self.timings.get(name, 0.0) + milliseconds
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def to_emf(self, dimensions):
+        metrics = [
+            {"Name": name, "Unit": "Milliseconds", "StorageResolution": 1} for name in self.timings
+        ] + [
+            {"Name": name, "Unit": "Count", "StorageResolution": 1} for name in self.counts
+        ]
+        document = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": METRICS_NAMESPACE,
+                    "Dimensions": [sorted(dimensions)],
+                    "Metrics": metrics,
+                }],
+            },
+        }
+        document.update(dimensions)
+        document.update({name: round(value, 3) for name, value in self.timings.items()})
+        document.update(self.counts)
+        return document
+
+    def emit(self, **dimensions):
+        # EMF must be the whole log line, so bypass the logger's prefix
+        print(json.dumps(self.to_emf(dimensions)), flush=True)
+
+
+METRICS = InvocationMetrics()
+
+
+def _record_api_call(parsed=None, **kwargs):
+    """botocore 'after-call' hook: count every API call and its SDK-level retries."""
+    METRICS.count('ApiCalls')
+    retries = (parsed or {}).get('ResponseMetadata', {}).get('RetryAttempts', 0)
+    if retries:
+        METRICS.count('ApiRetries', retries)
+
+
+def client_config(single_attempt=False):
+    return Config(
+        max_pool_connections=max(STOP_CONCURRENCY, HEALTH_CONCURRENCY) + 2,
+        retries=({'mode': 'standard', 'total_max_attempts': 1} if single_attempt
+                 else {'mode': 'adaptive', 'max_attempts': MAX_RETRY_ATTEMPTS}),
+        connect_timeout=CONNECT_TIMEOUT_SECONDS,
+        read_timeout=READ_TIMEOUT_SECONDS,
+    )
+
+
+def get_client(service, single_attempt=False):
+    """Return the cached boto3 client for a service, creating it on first use."""
+    key = f"{service}:single-attempt" if single_attempt else service
+    client = CLIENTS.get(key)
+    if client is None:
+        # boto3 client creation is not thread-safe; the stop/health pools may race here
+        with _CLIENTS_LOCK:
+            client = CLIENTS.get(key)
+            if client is None:
+                started = time.perf_counter()
+                client = boto3.client(service, config=client_config(single_attempt))
+                client.meta.events.register('after-call', _record_api_call)
+                INIT_TIMINGS['client_init_ms'][key] = round((time.perf_counter() - started) * 1000, 2)
+                CLIENTS[key] = client
+    return client
+
+
+def list_running_task_arns(cluster):
+    """Return every RUNNING task ARN in the cluster, following all pages."""
+    paginator = get_client('ecs').get_paginator('list_tasks')
+    task_arns = []
+    for page in paginator.paginate(cluster=cluster, desiredStatus='RUNNING'):
+        task_arns.extend(page['taskArns'])
+    return task_arns
+
+
+def describe_tasks(cluster, task_arns):
+    """Describe tasks in chunks of DESCRIBE_TASKS_BATCH_SIZE."""
+    tasks = []
+    for i in range(0, len(task_arns), DESCRIBE_TASKS_BATCH_SIZE):
+        chunk = task_arns[i:i + DESCRIBE_TASKS_BATCH_SIZE]
+        tasks.extend(get_client('ecs').describe_tasks(cluster=cluster, tasks=chunk)['tasks'])
+    return tasks
+
+
+# containerInstanceArn -> {'instanceId', 'privateIp'}; an instance keeps its
+# private IP for life, so warm containers only resolve new instances.
+CONTAINER_INSTANCES = {}
+
+
+def stopped_task_arns(task_arns):
+    """The task_arns ECS no longer reports as running (stopping, stopped or gone)."""
+    running = {
+        t['taskArn'] for t in describe_tasks(CLUSTER_NAME, task_arns)
+        if t.get('lastStatus') == 'RUNNING' and t.get('desiredStatus') != 'STOPPED'
+    }
+    return [arn for arn in task_arns if arn not in running]
+
+
+def resolve_container_instances(container_instance_arns):
+    """
+    Resolve container instances to EC2 instance ID and private IP, in batches.
+
+    Only ARNs missing from CONTAINER_INSTANCES cost API calls: one
+    describe_container_instances per 100 plus one describe_instances per 500.
+    """
+    missing = sorted(a for a in set(container_instance_arns) if a and a not in CONTAINER_INSTANCES)
+    if not missing:
+        return
+
+    instance_ids = {}
+    for i in range(0, len(missing), DESCRIBE_CONTAINER_INSTANCES_BATCH_SIZE):
+        chunk = missing[i:i + DESCRIBE_CONTAINER_INSTANCES_BATCH_SIZE]
+        resp = get_client('ecs').describe_container_instances(cluster=CLUSTER_NAME, containerInstances=chunk)
+        for ci in resp['containerInstances']:
+            instance_ids[ci['ec2InstanceId']] = ci['containerInstanceArn']
+
+    ids = sorted(instance_ids)
+    for i in range(0, len(ids), DESCRIBE_INSTANCES_BATCH_SIZE):
+        resp = get_client('ec2').describe_instances(InstanceIds=ids[i:i + DESCRIBE_INSTANCES_BATCH_SIZE])
+        for reservation in resp['Reservations']:
+            for instance in reservation['Instances']:
+                CONTAINER_INSTANCES[instance_ids[instance['InstanceId']]] = {
+                    'instanceId': instance['InstanceId'],
+                    'privateIp': instance.get('PrivateIpAddress'),
+                }
+
+
+def _needs_container_instance(task):
+    return task.get('containerInstanceArn') and not any(
+        a['type'] == 'ElasticNetworkInterface' for a in task.get('attachments', [])
+    )
+
+
+def task_index_keys(task):
+    """
+    Return the (ip, port) index keys a task answers on.
+
+    In 'awsvpc' mode (Fargate) every task owns its ENI, so the IP alone
+    identifies the task and it is indexed with port None (any port).
+    Explicit network bindings, when present, are indexed by their host port.
+    In 'bridge'/'host' mode the target is the container instance plus a host
+    port, indexed by both its private IP (ip targets) and instance ID
+    (instance targets); the instance must already be in CONTAINER_INSTANCES.
+    """
+    keys = []
+    for attachment in task.get('attachments', []):
+        if attachment['type'] != 'ElasticNetworkInterface':
+            continue
+        for detail in attachment['details']:
+            if detail['name'] == 'privateIPv4Address':
+                ip = detail['value']
+                keys.append((ip, None))
+                for container in task.get('containers', []):
+                    for binding in container.get('networkBindings', []):
+                        if 'hostPort' in binding:
+                            keys.append((ip, binding['hostPort']))
+
+    if _needs_container_instance(task):
+        instance = CONTAINER_INSTANCES.get(task['containerInstanceArn'])
+        if instance:
+            for container in task.get('containers', []):
+                for binding in container.get('networkBindings', []):
+                    if 'hostPort' not in binding:
+                        continue
+                    if instance['privateIp']:
+                        keys.append((instance['privateIp'], binding['hostPort']))
+                    keys.append((instance['instanceId'], binding['hostPort']))
+    return keys
+
+
+def build_target_index(tasks):
+    """Build a single (ip, port) -> taskArn index for the whole cluster."""
+    index = {}
+    for task in tasks:
+        for key in task_index_keys(task):
+            index[key] = task['taskArn']
+    return index
+
+
+def resolve_target(index, ip, port):
+    """Constant-time lookup: exact (ip, port) first, then the awsvpc ENI IP."""
+    return index.get((ip, port)) or index.get((ip, None))
+
+
+def _elb_arn(value, event, resource):
+    """CloudWatch dimensions carry ARN suffixes ('targetgroup/name/id'); expand them."""
+    if value.startswith('arn:'):
+        return value
+    return f"arn:aws:elasticloadbalancing:{event.get('region')}:{event.get('account')}:{resource}{value}"
+
+
+def extract_target_groups(event):
+    """
+    Collect every target group ARN referenced by one alarm event or a list of them.
+
+    Each metric's TargetGroup dimension is used directly; a metric with only a
+    LoadBalancer dimension expands to all target groups behind that ALB. Alarms
+    with no usable dimensions (composite alarms) fall back to TARGET_GROUP_ARNS.
+    """
+    alarm_events = event if isinstance(event, list) else [event]
+    tg_arns, lb_arns = [], []
+    for alarm_event in alarm_events:
+        for metric in alarm_event.get('detail', {}).get('configuration', {}).get('metrics', []):
+            dimensions = metric.get('metricStat', {}).get('metric', {}).get('dimensions', {})
+            if 'TargetGroup' in dimensions:
+                tg_arns.append(_elb_arn(dimensions['TargetGroup'], alarm_event, ''))
+            elif 'LoadBalancer' in dimensions:
+                lb_arns.append(_elb_arn(dimensions['LoadBalancer'], alarm_event, 'loadbalancer/'))
+
+    paginator = get_client('elbv2').get_paginator('describe_target_groups') if lb_arns else None
+    for lb_arn in dict.fromkeys(lb_arns):
+        for page in paginator.paginate(LoadBalancerArn=lb_arn):
+            tg_arns.extend(tg['TargetGroupArn'] for tg in page['TargetGroups'])
+
+    return list(dict.fromkeys(tg_arns or TARGET_GROUP_ARNS))
+
+
+def describe_target_health(tg_arns):
+    """Describe all target groups concurrently; returns {tg_arn: descriptions}."""
+    if not tg_arns:
+        return {}
+
+    def describe(tg_arn):
+        return tg_arn, get_client('elbv2').describe_target_health(TargetGroupArn=tg_arn)['TargetHealthDescriptions']
+
+    with ThreadPoolExecutor(max_workers=min(HEALTH_CONCURRENCY, len(tg_arns))) as pool:
+        return dict(pool.map(describe, tg_arns))
+
+
+def _epoch(value):
+    """startedAt is a datetime from describe_tasks but an ISO string in events."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return value.timestamp()
+
+
+class TaskTopology:
+    """
+    Module-level (warm container) cache of the cluster's (ip, port) -> taskArn index.
+
+    `version` is bumped on every change so callers can tell which snapshot they
+    resolved against; ECS Task State Change events update it incrementally.
+    """
+
+    def __init__(self):
+        self.index = {}
+        self.tasks = {}
+        self.task_versions = {}
+        self.version = 0
+        self.built_at = None
+
+    def age(self, now=None):
+        if self.built_at is None:
+            return float('inf')
+        return (now if now is not None else time.monotonic()) - self.built_at
+
+    def is_fresh(self, now=None):
+        return self.age(now) < TOPOLOGY_CACHE_TTL_SECONDS
+
+    def rebuild(self, tasks):
+        self.index = {}
+        self.tasks = {}
+        self.task_versions = {}
+        for task in tasks:
+            self._add(task)
+        self.version += 1
+        self.built_at = time.monotonic()
+
+    def upsert_task(self, task, event_version=None):
+        task_arn = task['taskArn']
+        if not self._is_newer(task_arn, event_version):
+            return False
+        self._discard(task_arn)
+        self._add(task)
+        self.task_versions[task_arn] = event_version
+        self.version += 1
+        return True
+
+    def remove_task(self, task_arn, event_version=None):
+        if not self._is_newer(task_arn, event_version):
+            return False
+        self._discard(task_arn)
+        self.task_versions[task_arn] = event_version
+        self.version += 1
+        return True
+
+    def resolve(self, ip, port):
+        return resolve_target(self.index, ip, port)
+
+    def started_at(self, task_arn):
+        return self.tasks.get(task_arn, {}).get('startedAt')
+
+    def service_of(self, task_arn):
+        """Service name for a task started by a service, else None."""
+        group = self.tasks.get(task_arn, {}).get('group') or ''
+        return group[len('service:'):] if group.startswith('service:') else None
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def _is_newer(self, task_arn, event_version):
+        # ECS stamps every task state change with an increasing detail.version;
+        # drop events that arrive out of order.
+        seen = self.task_versions.get(task_arn)
+        return event_version is None or seen is None or event_version > seen
+
+    def _add(self, task):
+        keys = task_index_keys(task)
+        for key in keys:
+            self.index[key] = task['taskArn']
+        self.tasks[task['taskArn']] = {
+            'keys': keys,
+            'group': task.get('group'),
+            'startedAt': _epoch(task.get('startedAt')),
+        }
+
+    def _discard(self, task_arn):
+        for key in self.tasks.pop(task_arn, {}).get('keys', []):
+            if self.index.get(key) == task_arn:
+                del self.index[key]
+
+
+TOPOLOGY = TaskTopology()
+
+
+def refresh_topology():
+    """Full rebuild: list every running task and describe them in batches."""
+    with METRICS.phase('ListTasksTime'):
+        task_arns = list_running_task_arns(CLUSTER_NAME)
+    with METRICS.phase('DescribeTasksTime'):
+        tasks = describe_tasks(CLUSTER_NAME, task_arns)
+    METRICS.count('TasksScanned', len(tasks))
+    in_use = {t['containerInstanceArn'] for t in tasks if _needs_container_instance(t)}
+    with METRICS.phase('ResolveInstancesTime'):
+        resolve_container_instances(in_use)
+    # Forget instances no task runs on any more so the cache tracks the cluster
+    for arn in set(CONTAINER_INSTANCES) - in_use:
+        del CONTAINER_INSTANCES[arn]
+    TOPOLOGY.rebuild(tasks)
+    logger.info(f"Rebuilt task topology v{TOPOLOGY.version}: {len(TOPOLOGY)} tasks")
+
+
+def handle_task_state_change(event):
+    """Apply an EventBridge 'ECS Task State Change' event to the cached topology."""
+    task = event['detail']
+    cluster_arn = task.get('clusterArn', '')
+    if CLUSTER_NAME and cluster_arn.split('/')[-1] != CLUSTER_NAME:
+        return {"status": "Ignored event for another cluster.", "topology_version": TOPOLOGY.version}
+
+    if task.get('desiredStatus') == 'STOPPED' or task.get('lastStatus') == 'STOPPED':
+        changed = TOPOLOGY.remove_task(task['taskArn'], task.get('version'))
+    elif task.get('lastStatus') == 'RUNNING':
+        if _needs_container_instance(task):
+            resolve_container_instances([task['containerInstanceArn']])
+        changed = TOPOLOGY.upsert_task(task, task.get('version'))
+    else:
+        changed = False
+
+    return {"topology_version": TOPOLOGY.version, "updated": changed}
+
+
+class TokenBucket:
+    """Thread-safe token bucket with multiplicative decrease on throttling."""
+
+    def __init__(self, rate, burst, clock=time.monotonic, sleep=time.sleep):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.clock = clock
+        self.sleep = sleep
+        self.updated_at = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+
+    def throttled(self):
+        with self.lock:
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+            self.tokens = 0.0
+
+    def succeeded(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+STOP_BUCKET = TokenBucket(STOP_RATE_PER_SECOND, STOP_BURST)
+
+
+def describe_desired_counts(service_names):
+    """Return {service name: desiredCount}, describing 10 services per call."""
+    names = sorted(service_names)
+    desired = {}
+    for i in range(0, len(names), DESCRIBE_SERVICES_BATCH_SIZE):
+        chunk = names[i:i + DESCRIBE_SERVICES_BATCH_SIZE]
+        for service in get_client('ecs').describe_services(cluster=CLUSTER_NAME, services=chunk)['services']:
+            desired[service['serviceName']] = service['desiredCount']
+    return desired
+
+
+class InMemoryKillLedger:
+    """
+    Recent-kill memory for one container; also the interface any ledger implements:
+    record_kills([(task_arn, service)], at), last_task_kill(task_arn),
+    last_task_kills(task_arns) -> {task_arn: at} and service_kills_since(service, since).
+    Timestamps are epoch seconds.
+    """
+
+    def __init__(self):
+        self.task_kills = {}
+        self.service_kills = {}
+        self.lock = threading.Lock()
+
+    def record_kills(self, kills, at):
+        with self.lock:
+            for task_arn, service in kills:
+                self.task_kills[task_arn] = at
+                if service:
+                    self.service_kills.setdefault(service, []).append(at)
+
+    def last_task_kill(self, task_arn):
+        return self.task_kills.get(task_arn)
+
+    def last_task_kills(self, task_arns):
+        return {arn: self.task_kills[arn] for arn in task_arns if arn in self.task_kills}
+
+    def service_kills_since(self, service, since):
+        with self.lock:
+            recent = [t for t in self.service_kills.get(service, []) if t >= since]
+            self.service_kills[service] = recent
+            return len(recent)
+
+
+class DynamoDBKillLedger:
+    """
+    The same ledger on a DynamoDB table (pk/sk string keys, expiresAt TTL), shared
+    by every container. Task items are pk='task#<arn>', sk='kill'; service items are
+    pk='service#<name>', sk='<zero-padded epoch>#<arn>' so a window is one Query.
+    """
+
+    BATCH_WRITE_SIZE = 25
+    BATCH_GET_SIZE = 100
+    BATCH_WRITE_ATTEMPTS = 6
+    BACKOFF_BASE_SECONDS = 0.05
+
+    def __init__(self, table_name, client=None):
+        self.table_name = table_name
+        self.client = client
+
+    def _client(self):
+        return self.client or get_client('dynamodb')
+
+    @staticmethod
+    def _sort_key(at):
+        return f"{at:017.3f}"
+
+    def record_kills(self, kills, at):
+        expires = str(int(at + max(TASK_KILL_COOLDOWN_SECONDS, SERVICE_KILL_WINDOW_SECONDS) + 3600))
+        items = []
+        for task_arn, service in kills:
+            items.append({'pk': {'S': f"task#{task_arn}"}, 'sk': {'S': 'kill'},
+                          'killedAt': {'N': str(at)}, 'expiresAt': {'N': expires}})
+            if service:
+                items.append({'pk': {'S': f"service#{service}"}, 'sk': {'S': f"{self._sort_key(at)}#{task_arn}"},
+                              'expiresAt': {'N': expires}})
+        for i in range(0, len(items), self.BATCH_WRITE_SIZE):
+            requests = [{'PutRequest': {'Item': item}} for item in items[i:i + self.BATCH_WRITE_SIZE]]
+            self._batch_write({self.table_name: requests})
+
+    def _batch_write(self, request_items):
+        """
+        batch_write_item until nothing is left: under throttling DynamoDB returns
+        part of the batch as UnprocessedItems, and a dropped kill would let the
+        budget and flap checks undercount.
+        """
+        for attempt in range(1, self.BATCH_WRITE_ATTEMPTS + 1):
+            request_items = self._client().batch_write_item(RequestItems=request_items).get('UnprocessedItems')
+            if not request_items:
+                return
+            METRICS.count('ApiRetries')
+            time.sleep(random.uniform(0, self.BACKOFF_BASE_SECONDS * 2 ** attempt))
+        left = sum(len(requests) for requests in request_items.values())
+        logger.error(f"Kill ledger: {left} writes still unprocessed after {self.BATCH_WRITE_ATTEMPTS} attempts")
+
+    def last_task_kill(self, task_arn):
+        item = self._client().get_item(
+            TableName=self.table_name,
+            Key={'pk': {'S': f"task#{task_arn}"}, 'sk': {'S': 'kill'}},
+        ).get('Item')
+        return float(item['killedAt']['N']) if item else None
+
+    def last_task_kills(self, task_arns):
+        """
+        Kill times of many tasks, 100 keys per batch_get_item. Keys DynamoDB returns
+        as UnprocessedKeys under throttling are retried like unprocessed writes.
+        """
+        arns = list(dict.fromkeys(task_arns))
+        kills = {}
+        for i in range(0, len(arns), self.BATCH_GET_SIZE):
+            keys = [{'pk': {'S': f"task#{arn}"}, 'sk': {'S': 'kill'}} for arn in arns[i:i + self.BATCH_GET_SIZE]]
+            request_items = {self.table_name: {'Keys': keys, 'ProjectionExpression': 'pk, killedAt'}}
+            for attempt in range(1, self.BATCH_WRITE_ATTEMPTS + 1):
+                response = self._client().batch_get_item(RequestItems=request_items)
+                for item in response.get('Responses', {}).get(self.table_name, []):
+                    kills[item['pk']['S'][len('task#'):]] = float(item['killedAt']['N'])
+                request_items = response.get('UnprocessedKeys')
+                if not request_items:
+                    break
+                METRICS.count('ApiRetries')
+                time.sleep(random.uniform(0, self.BACKOFF_BASE_SECONDS * 2 ** attempt))
+            else:
+                left = sum(len(request['Keys']) for request in request_items.values())
+                logger.error(f"Kill ledger: {left} reads still unprocessed after {self.BATCH_WRITE_ATTEMPTS} attempts")
+        return kills
+
+    def service_kills_since(self, service, since):
+        return self._client().query(
+            TableName=self.table_name,
+            KeyConditionExpression='pk = :pk AND sk >= :since',
+            ExpressionAttributeValues={':pk': {'S': f"service#{service}"}, ':since': {'S': self._sort_key(since)}},
+            Select='COUNT',
+        )['Count']
+
+
+KILL_LEDGER = None
+
+
+def get_kill_ledger():
+    global KILL_LEDGER
+    if KILL_LEDGER is None:
+        KILL_LEDGER = DynamoDBKillLedger(KILL_LEDGER_TABLE) if KILL_LEDGER_TABLE else InMemoryKillLedger()
+    return KILL_LEDGER
+
+
+def stand_down_target_groups(health):
+    """Target groups where so many targets are unhealthy that the healer must not act."""
+    stood_down = {}
+    for tg_arn, descriptions in health.items():
+        states = [t['TargetHealth']['State'] for t in descriptions if t['TargetHealth']['State'] != 'draining']
+        if not states:
+            continue
+        fraction = states.count('unhealthy') / len(states)
+        if fraction >= STAND_DOWN_UNHEALTHY_FRACTION:
+            stood_down[tg_arn] = round(fraction, 3)
+    return stood_down
+
+
+def apply_flap_suppression(task_arns, now):
+    """
+    Split task_arns into (allowed, suppressed): skip tasks inside their warm-up
+    grace period (they fail health checks while starting) and tasks already
+    stopped within the cooldown (their targets linger while draining).
+    """
+    last_kills = get_kill_ledger().last_task_kills(task_arns) if task_arns else {}
+    allowed, suppressed = [], []
+    for task_arn in task_arns:
+        started_at = TOPOLOGY.started_at(task_arn)
+        last_kill = last_kills.get(task_arn)
+        if started_at is not None and now - started_at < WARMUP_GRACE_SECONDS:
+            suppressed.append({"taskArn": task_arn, "reason": "warming up"})
+        elif last_kill is not None and now - last_kill < TASK_KILL_COOLDOWN_SECONDS:
+            suppressed.append({"taskArn": task_arn, "reason": "recently stopped"})
+        else:
+            allowed.append(task_arn)
+    return allowed, suppressed
+
+
+def apply_kill_budget(task_arns, now=None):
+    """
+    Split task_arns into (allowed, deferred) so that no service loses more than
+    MAX_KILL_FRACTION of its desiredCount (at least one task) per
+    SERVICE_KILL_WINDOW_SECONDS, counting kills by earlier invocations.
+    Standalone tasks, not owned by a service, are never deferred.
+    """
+    now = time.time() if now is None else now
+    ledger = get_kill_ledger()
+    services = {arn: TOPOLOGY.service_of(arn) for arn in task_arns}
+    desired = describe_desired_counts({s for s in services.values() if s})
+
+    allowed, deferred, spent = [], [], {}
+    for task_arn in task_arns:
+        service = services[task_arn]
+        if service is None:
+            allowed.append(task_arn)
+            continue
+        if service not in spent:
+            spent[service] = ledger.service_kills_since(service, now - SERVICE_KILL_WINDOW_SECONDS)
+        budget = max(1, int(desired.get(service, 0) * MAX_KILL_FRACTION))
+        if spent[service] < budget:
+            spent[service] = spent.get(service, 0) + 1
+            allowed.append(task_arn)
+        else:
+            deferred.append({"taskArn": task_arn, "service": service, "reason": "kill budget exhausted"})
+    return allowed, deferred
+
+
+def stop_task(task_arn):
+    """
+    Stop one task through the shared token bucket, backing off on throttling and
+    transient errors. This loop is the only retry layer: the client makes a
+    single attempt per call, so one task costs at most STOP_MAX_ATTEMPTS calls.
+    """
+    started = time.perf_counter()
+    attempt = 0
+    while True:
+        attempt += 1
+        STOP_BUCKET.acquire()
+        try:
+            get_client('ecs', single_attempt=True).stop_task(
+                cluster=CLUSTER_NAME,
+                task=task_arn,
+                reason='Auto-Healer: Task failed ALB health checks'
+            )
+        except ClientError as e:
+            code = e.response.get('Error', {}).get('Code')
+            retryable = code in THROTTLING_ERROR_CODES or code in TRANSIENT_ERROR_CODES
+            if retryable and attempt < STOP_MAX_ATTEMPTS:
+                if code in THROTTLING_ERROR_CODES:
+                    STOP_BUCKET.throttled()
+                METRICS.count('ApiRetries')
+                # Full jitter keeps concurrent workers from retrying in lockstep
+                time.sleep(random.uniform(0, STOP_BACKOFF_BASE_SECONDS * 2 ** attempt))
+                continue
+            logger.error(f"Failed to stop task {task_arn}: {code}")
+            status, error = 'failed', code
+        except BotoCoreError as e:
+            if isinstance(e, TRANSIENT_ERRORS) and attempt < STOP_MAX_ATTEMPTS:
+                METRICS.count('ApiRetries')
+                time.sleep(random.uniform(0, STOP_BACKOFF_BASE_SECONDS * 2 ** attempt))
+                continue
+            # One failed stop must not lose the ledger entries of the stops that succeeded
+            logger.error(f"Failed to stop task {task_arn}: {e}")
+            status, error = 'failed', type(e).__name__
+        else:
+            STOP_BUCKET.succeeded()
+            status, error = 'stopped', None
+        result = {
+            "taskArn": task_arn,
+            "status": status,
+            "attempts": attempt,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+        if error:
+            result["error"] = error
+        return result
+
+
+def stop_tasks(task_arns):
+    """Dispatch stops through a bounded thread pool; results keep input order."""
+    if not task_arns:
+        return []
+    for task_arn in task_arns:
+        logger.info(f"Stopping stale task: {task_arn}")
+    with ThreadPoolExecutor(max_workers=min(STOP_CONCURRENCY, len(task_arns))) as pool:
+        return list(pool.map(stop_task, task_arns))
+
+
+def handle_alarm(event):
+    # 1. Get every TargetGroup ARN from the alarm(s)
+    with METRICS.phase('TargetHealthTime'):
+        tg_arns = extract_target_groups(event)
+        if not tg_arns:
+            return {"status": "No target groups found in alarm."}
+
+        # 2. Find unhealthy targets across all target groups at once
+        health = describe_target_health(tg_arns)
+
+    # Stand down on target groups that are (almost) entirely unhealthy
+    stood_down = stand_down_target_groups(health)
+    for tg_arn, fraction in stood_down.items():
+        logger.warning(f"Standing down on {tg_arn}: {fraction:.0%} of targets unhealthy")
+    METRICS.count('TargetGroupsStoodDown', len(stood_down))
+
+    unhealthy_targets = []
+    seen_targets = set()
+    for tg_arn, descriptions in health.items():
+        if tg_arn in stood_down:
+            continue
+        for t in descriptions:
+            key = (t['Target']['Id'], t['Target'].get('Port'))
+            if t['TargetHealth']['State'] in ['unhealthy', 'draining'] and key not in seen_targets:
+                seen_targets.add(key)
+                unhealthy_targets.append(t)
+    METRICS.count('TargetsUnhealthy', len(unhealthy_targets))
 
     if not unhealthy_targets:
+        if stood_down:
+            return {"status": "Standing down: target groups are unhealthy fleet-wide.",
+                    "stood_down_target_groups": stood_down}
         return {"status": "No unhealthy targets found."}
 
-    # 3. List all tasks in the cluster (Use pagination in real prod code!)
-    # Optimization: Use 'containerInstance' filter if you knew the host, 
-    # but for Fargate/mixed, listing tasks is safer.
-    list_resp = ecs.list_tasks(cluster=CLUSTER_NAME, desiredStatus='RUNNING')
-    task_arns = list_resp['taskArns']
-    
-    if not task_arns:
+    # 3-4. One shared task-resolution pass for all target groups: list and describe
+    # every task (paginated, 100 per describe) unless the warm container already
+    # holds a fresh topology.
+    refreshed = False
+    if not TOPOLOGY.is_fresh():
+        refresh_topology()
+        refreshed = True
+
+    if not len(TOPOLOGY):
         return {"status": "No running tasks found."}
 
-    # 4. Describe tasks to get their network details (IPs)
-    # AWS allows describing up to 100 tasks at once.
-    tasks_resp = ecs.describe_tasks(cluster=CLUSTER_NAME, tasks=task_arns)
-    
-    # 5. Match Target IP to Task
-    tasks_to_kill = []
-    
-    for u_target in unhealthy_targets:
-        bad_ip = u_target['Target']['Id']
-        bad_port = u_target['Target']['Port']
-        
-        for task in tasks_resp['tasks']:
-            # Look inside containers for network bindings
-            for container in task['containers']:
-                # For 'awsvpc' mode (Fargate), IP is in networkInterfaces
-                # For 'bridge' mode (EC2), we look at mapped ports
-                # Let's assume standard logic:
-                for net_int in task['attachments']:
-                    if net_int['type'] == 'ElasticNetworkInterface':
-                        for detail in net_int['details']:
-                            if detail['name'] == 'privateIPv4Address' and detail['value'] == bad_ip:
-                                tasks_to_kill.append(task['taskArn'])
-    
-    # 6. Execute the Fix (Stop the Task)
-    # Removing duplicates
-    tasks_to_kill = list(set(tasks_to_kill))
-    
-    for task_arn in tasks_to_kill:
-        logger.info(f"Stopping stale task: {task_arn}")
-        ecs.stop_task(
-            cluster=CLUSTER_NAME,
-            task=task_arn,
-            reason='Auto-Healer: Task failed ALB health checks'
-        )
+    # 5. Match Target IP/port to Task with constant-time index lookups
+    def resolve_all():
+        resolved, missing = [], []
+        for u_target in unhealthy_targets:
+            task_arn = TOPOLOGY.resolve(u_target['Target']['Id'], u_target['Target'].get('Port'))
+            if task_arn is None:
+                missing.append(u_target)
+            elif task_arn not in resolved:
+                resolved.append(task_arn)
+        return resolved, missing
+
+    with METRICS.phase('MatchTime'):
+        tasks_to_kill, missing = resolve_all()
+
+    # A miss may mean the cache is behind the cluster; rebuild once, but not on
+    # every alarm (draining targets stay unresolvable until deregistered).
+    if missing and not refreshed and TOPOLOGY.age() >= TOPOLOGY_MISS_REFRESH_SECONDS:
+        refresh_topology()
+        refreshed = True
+        with METRICS.phase('MatchTime'):
+            tasks_to_kill, missing = resolve_all()
+
+    # Task state events reach whichever container EventBridge invokes, so a warm
+    # topology can map a reused awsvpc IP to a task that already stopped: that is
+    # a hit, not a miss. Confirm cached matches are still running before they are
+    # stopped and charged to the ledger; rebuild if any is not.
+    if tasks_to_kill and not refreshed:
+        with METRICS.phase('VerifyTime'):
+            stale = stopped_task_arns(tasks_to_kill)
+        if stale:
+            METRICS.count('StaleTopologyHits', len(stale))
+            logger.info(f"{len(stale)} matched tasks are no longer running; rebuilding the topology")
+            refresh_topology()
+            with METRICS.phase('MatchTime'):
+                tasks_to_kill, missing = resolve_all()
+
+    # 6. Execute the Fix (Stop the Task), skipping warming-up and recently
+    # stopped tasks and staying within each service's kill budget
+    now = time.time()
+    tasks_to_kill, suppressed = apply_flap_suppression(tasks_to_kill, now)
+    for item in suppressed:
+        logger.info(f"Not stopping {item['taskArn']}: {item['reason']}")
+    tasks_to_kill, deferred = apply_kill_budget(tasks_to_kill, now)
+    for item in deferred:
+        logger.warning(f"Deferring stop of {item['taskArn']}: {item['reason']} for {item['service']}")
+
+    with METRICS.phase('StopTime'):
+        stops = stop_tasks(tasks_to_kill)
+    killed = [s["taskArn"] for s in stops if s["status"] == "stopped"]
+    get_kill_ledger().record_kills([(arn, TOPOLOGY.service_of(arn)) for arn in killed], now)
+
+    METRICS.count('TasksStopped', len(killed))
+    METRICS.count('TasksDeferred', len(deferred))
+    METRICS.count('TasksSuppressed', len(suppressed))
+    METRICS.count('StopFailures', sum(1 for s in stops if s["status"] == "failed"))
+
+    return {
+        "killed_tasks": killed,
+        "stops": stops,
+        "deferred_tasks": deferred,
+        "suppressed_tasks": suppressed,
+        "stood_down_target_groups": stood_down,
+        "target_groups": tg_arns,
+        "topology_version": TOPOLOGY.version,
+    }
+
+
+def lambda_handler(event, context):
+    global METRICS
+    cold_start = not INIT_TIMINGS.get('invoked')
+    INIT_TIMINGS['invoked'] = True
+    started = time.perf_counter()
+
+    # 0. Task state changes keep the warm topology cache current
+    if isinstance(event, dict) and event.get('detail-type') == 'ECS Task State Change':
+        result = handle_task_state_change(event)
+    else:
+        METRICS = InvocationMetrics()
+        result = handle_alarm(event)
+        METRICS.add_time('TotalTime', (time.perf_counter() - started) * 1000)
+        if cold_start:
+            METRICS.count('ColdStart')
+        METRICS.emit(ClusterName=CLUSTER_NAME or 'unknown')
+
+    if cold_start:
+        init = {
+            'import_ms': INIT_TIMINGS['import_ms'],
+            'import_to_invoke_ms': round((started - _IMPORT_FINISHED) * 1000, 2),
+            'client_init_ms': dict(INIT_TIMINGS['client_init_ms']),
+            'handler_ms': round((time.perf_counter() - started) * 1000, 2),
+        }
+        logger.info(f"Cold start timings: {init}")
+        result['cold_start'] = init
+    return result
+
 
-    return {"killed_tasks": tasks_to_kill}
+_IMPORT_FINISHED = time.perf_counter()
+INIT_TIMINGS['import_ms'] = round((_IMPORT_FINISHED - _IMPORT_STARTED) * 1000, 2)
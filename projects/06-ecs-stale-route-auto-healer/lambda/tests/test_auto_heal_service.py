@@ -0,0 +1,598 @@
+# Unit tests for the auto-healer Lambda, using in-memory fakes instead of AWS.
+# Run from the lambda/ directory:
+# pip install boto3 pytest
+# python -m pytest tests/
+
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import pytest
+from botocore.awsrequest import AWSResponse
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+import auto_heal_service
+
+
+class FakePaginator:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def paginate(self, **kwargs):
+        return iter(self.pages)
+
+
+class FakeEcs:
+    def __init__(self, tasks, page_size=100, desired_counts=None, throttle_first_stops=0, unreachable_stops=()):
+        self.tasks = {t["taskArn"]: t for t in tasks}
+        self.container_instance_calls = 0
+        self.page_size = page_size
+        self.desired_counts = desired_counts or {"web": 100}
+        self.throttles_left = throttle_first_stops
+        self.unreachable_stops = set(unreachable_stops)
+        self.describe_batches = []
+        self.list_calls = 0
+        self.stop_calls = 0
+        self.stopped = []
+
+    def get_paginator(self, name):
+        self.list_calls += 1
+        arns = [arn for arn, task in self.tasks.items() if task["lastStatus"] == "RUNNING"]
+        pages = [
+            {"taskArns": arns[i:i + self.page_size]}
+            for i in range(0, len(arns), self.page_size)
+        ] or [{"taskArns": []}]
+        return FakePaginator(pages)
+
+    def describe_tasks(self, cluster, tasks):
+        assert len(tasks) <= 100
+        self.describe_batches.append(len(tasks))
+        return {"tasks": [self.tasks[arn] for arn in tasks if arn in self.tasks],
+                "failures": [{"arn": arn, "reason": "MISSING"} for arn in tasks if arn not in self.tasks]}
+
+    def describe_container_instances(self, cluster, containerInstances):
+        assert len(containerInstances) <= 100
+        self.container_instance_calls += 1
+        return {"containerInstances": [
+            {"containerInstanceArn": arn, "ec2InstanceId": "i-" + arn.rsplit("/", 1)[-1]}
+            for arn in containerInstances
+        ]}
+
+    def describe_services(self, cluster, services):
+        assert len(services) <= 10
+        return {"services": [
+            {"serviceName": name, "desiredCount": self.desired_counts[name]}
+            for name in services if name in self.desired_counts
+        ]}
+
+    def stop_task(self, cluster, task, reason):
+        self.stop_calls += 1
+        if self.throttles_left:
+            self.throttles_left -= 1
+            raise ClientError({"Error": {"Code": "ThrottlingException"}}, "StopTask")
+        if task in self.unreachable_stops:
+            raise EndpointConnectionError(endpoint_url="https://ecs.us-east-1.amazonaws.com")
+        self.stopped.append(task)
+        return {}
+
+
+class FakeEc2:
+    def __init__(self):
+        self.calls = 0
+
+    def describe_instances(self, InstanceIds):
+        self.calls += 1
+        return {"Reservations": [{"Instances": [
+            {"InstanceId": i, "PrivateIpAddress": "172.16.{}.{}".format(*divmod(int(i[2:]), 250))}
+            for i in InstanceIds
+        ]}]}
+
+
+class FakeElbv2:
+    def __init__(self, targets, load_balancers=None):
+        # targets is either one list for every target group or {tg_arn: list}
+        self.targets = targets
+        self.load_balancers = load_balancers or {}
+        self.described = []
+
+    def get_paginator(self, name):
+        assert name == "describe_target_groups"
+        balancers = self.load_balancers
+
+        class Paginator:
+            def paginate(self, LoadBalancerArn):
+                return iter([{"TargetGroups": [{"TargetGroupArn": arn} for arn in balancers[LoadBalancerArn]]}])
+
+        return Paginator()
+
+    def describe_target_health(self, TargetGroupArn):
+        self.described.append(TargetGroupArn)
+        targets = self.targets[TargetGroupArn] if isinstance(self.targets, dict) else self.targets
+        return {"TargetHealthDescriptions": targets}
+
+
+def make_task(n, ip, service="web"):
+    return {
+        "taskArn": f"arn:aws:ecs:us-east-1:123456789012:task/demo/{n}",
+        "group": f"service:{service}",
+        "lastStatus": "RUNNING",
+        "containers": [{"name": "nginx", "networkBindings": []}],
+        "attachments": [{
+            "type": "ElasticNetworkInterface",
+            "details": [{"name": "privateIPv4Address", "value": ip}],
+        }],
+    }
+
+
+def make_bridge_task(n, instance, host_port, service="web"):
+    return {
+        "taskArn": f"arn:aws:ecs:us-east-1:123456789012:task/demo/{n}",
+        "group": f"service:{service}",
+        "lastStatus": "RUNNING",
+        "containerInstanceArn": f"arn:aws:ecs:us-east-1:123456789012:container-instance/demo/{instance}",
+        "containers": [{"name": "nginx", "networkBindings": [
+            {"bindIP": "0.0.0.0", "containerPort": 80, "hostPort": host_port, "protocol": "tcp"}
+        ]}],
+        "attachments": [],
+    }
+
+
+def target(ip, port, state):
+    return {"Target": {"Id": ip, "Port": port}, "TargetHealth": {"State": state}}
+
+
+def healthy(count):
+    """Healthy targets that keep a target group below the stand-down threshold."""
+    return [target(f"10.9.0.{n}", 80, "healthy") for n in range(count)]
+
+
+ALARM_EVENT = {
+    "detail": {"configuration": {"metrics": [{
+        "metricStat": {"metric": {"dimensions": {"TargetGroup": "arn:aws:elasticloadbalancing:tg"}}}
+    }]}}
+}
+
+
+@pytest.fixture
+def cluster(monkeypatch):
+    def install(tasks, targets, load_balancers=None, **kwargs):
+        fake_ecs = FakeEcs(tasks, **kwargs)
+        monkeypatch.setattr(auto_heal_service, "CLIENTS", {
+            "ecs": fake_ecs,
+            "ecs:single-attempt": fake_ecs,
+            "elbv2": FakeElbv2(targets, load_balancers),
+            "ec2": FakeEc2(),
+        })
+        monkeypatch.setattr(auto_heal_service, "CONTAINER_INSTANCES", {})
+        monkeypatch.setattr(auto_heal_service, "TOPOLOGY", auto_heal_service.TaskTopology())
+        monkeypatch.setattr(auto_heal_service, "KILL_LEDGER", auto_heal_service.InMemoryKillLedger())
+        monkeypatch.setattr(auto_heal_service, "INIT_TIMINGS", {"client_init_ms": {}, "invoked": True})
+        monkeypatch.setattr(auto_heal_service, "STOP_BUCKET", auto_heal_service.TokenBucket(1000, 1000))
+        monkeypatch.setattr(auto_heal_service, "STOP_BACKOFF_BASE_SECONDS", 0)
+        return fake_ecs
+    return install
+
+
+def test_no_unhealthy_targets(cluster):
+    fake_ecs = cluster([make_task(1, "10.0.0.1")], [target("10.0.0.1", 80, "healthy")])
+    assert auto_heal_service.lambda_handler(ALARM_EVENT, None) == {"status": "No unhealthy targets found."}
+    assert fake_ecs.stopped == []
+
+
+def test_stops_only_matching_tasks_across_pages(cluster):
+    tasks = [make_task(n, f"10.0.{n // 250}.{n % 250}") for n in range(350)]
+    fake_ecs = cluster(
+        tasks,
+        [target("10.0.1.49", 80, "unhealthy"), target("10.0.0.3", 80, "healthy")],
+        page_size=100,
+    )
+
+    result = auto_heal_service.lambda_handler(ALARM_EVENT, None)
+
+    # Task 299 lives on the third page of list_tasks
+    assert result["killed_tasks"] == [tasks[299]["taskArn"]]
+    assert fake_ecs.stopped == [tasks[299]["taskArn"]]
+    assert fake_ecs.describe_batches == [100, 100, 100, 50]
+
+
+def test_build_target_index_prefers_exact_port():
+    task = make_task(1, "10.0.0.1")
+    task["containers"][0]["networkBindings"] = [{"containerPort": 80, "hostPort": 8080}]
+    index = auto_heal_service.build_target_index([task])
+
+    assert auto_heal_service.resolve_target(index, "10.0.0.1", 8080) == task["taskArn"]
+    assert auto_heal_service.resolve_target(index, "10.0.0.1", 9999) == task["taskArn"]
+    assert auto_heal_service.resolve_target(index, "10.0.0.2", 80) is None
+
+
+def task_state_change(task, last_status, desired_status, version):
+    detail = dict(task, lastStatus=last_status, desiredStatus=desired_status, version=version,
+                  clusterArn="arn:aws:ecs:us-east-1:123456789012:cluster/demo")
+    return {"detail-type": "ECS Task State Change", "detail": detail}
+
+
+def test_warm_topology_skips_list_and_describe(cluster):
+    tasks = [make_task(n, f"10.0.0.{n}") for n in range(1, 4)]
+    fake_ecs = cluster(tasks, [target("10.0.0.2", 80, "unhealthy")] + healthy(2))
+
+    auto_heal_service.lambda_handler(ALARM_EVENT, None)
+    second = auto_heal_service.lambda_handler(ALARM_EVENT, None)
+
+    assert fake_ecs.list_calls == 1
+    assert fake_ecs.describe_batches == [3, 1]  # the warm match is re-described, not re-listed
+    # The draining target still resolves, but the task was just stopped
+    assert fake_ecs.stopped == [tasks[1]["taskArn"]]
+    assert second["suppressed_tasks"] == [{"taskArn": tasks[1]["taskArn"], "reason": "recently stopped"}]
+
+
+def test_task_state_change_updates_cache_incrementally(cluster, monkeypatch):
+    monkeypatch.setattr(auto_heal_service, "CLUSTER_NAME", "demo")
+    old, new = make_task(1, "10.0.0.1"), make_task(2, "10.0.0.9")
+    fake_ecs = cluster([old], [target("10.0.0.9", 80, "unhealthy")] + healthy(1))
+    auto_heal_service.refresh_topology()
+    fake_ecs.tasks[new["taskArn"]] = new  # started after the rebuild
+    version = auto_heal_service.TOPOLOGY.version
+
+    auto_heal_service.lambda_handler(task_state_change(new, "RUNNING", "RUNNING", 3), None)
+    auto_heal_service.lambda_handler(task_state_change(old, "RUNNING", "STOPPED", 5), None)
+    # Out-of-order event for the stopped task is ignored
+    auto_heal_service.lambda_handler(task_state_change(old, "RUNNING", "RUNNING", 4), None)
+
+    assert auto_heal_service.TOPOLOGY.version == version + 2
+    assert auto_heal_service.TOPOLOGY.resolve("10.0.0.1", 80) is None
+
+    result = auto_heal_service.lambda_handler(ALARM_EVENT, None)
+
+    assert result["killed_tasks"] == [new["taskArn"]]
+    assert fake_ecs.list_calls == 1
+
+
+def test_cached_stopped_task_behind_a_reused_ip_is_not_stopped(cluster):
+    # This container missed the task state events: its cache still maps 10.0.0.5
+    # to task 1, which stopped, and ECS gave the IP to task 2
+    old, new = make_task(1, "10.0.0.5"), make_task(2, "10.0.0.5")
+    fake_ecs = cluster([old], [target("10.0.0.5", 80, "unhealthy")] + healthy(4))
+    auto_heal_service.refresh_topology()
+    old["lastStatus"] = "STOPPED"
+    fake_ecs.tasks[new["taskArn"]] = new
+
+    result = auto_heal_service.lambda_handler(ALARM_EVENT, None)
+
+    assert result["killed_tasks"] == [new["taskArn"]]
+    assert fake_ecs.stopped == [new["taskArn"]] and fake_ecs.list_calls == 2
+    assert auto_heal_service.get_kill_ledger().last_task_kill(old["taskArn"]) is None
+
+
+def test_kill_budget_defers_beyond_fraction_of_desired_count(cluster, monkeypatch):
+    monkeypatch.setattr(auto_heal_service, "MAX_KILL_FRACTION", 0.5)
+    tasks = [make_task(n, f"10.0.0.{n}") for n in range(1, 7)]
+    fake_ecs = cluster(
+        tasks,
+        [target(f"10.0.0.{n}", 80, "unhealthy") for n in range(1, 7)] + healthy(6),
+        desired_counts={"web": 6},
+    )
+
+    result = auto_heal_service.lambda_handler(ALARM_EVENT, None)
+
+    assert len(result["killed_tasks"]) == 3
+    assert len(fake_ecs.stopped) == 3
+    assert [d["taskArn"] for d in result["deferred_tasks"]] == [t["taskArn"] for t in tasks[3:]]
+    assert all(d["service"] == "web" for d in result["deferred_tasks"])
+    assert all(s["latency_ms"] >= 0 for s in result["stops"])
+
+
+def test_throttled_stops_are_retried(cluster):
+    tasks = [make_task(n, f"10.0.0.{n}") for n in range(1, 5)]
+    fake_ecs = cluster(
+        tasks,
+        [target(f"10.0.0.{n}", 80, "unhealthy") for n in range(1, 5)] + healthy(4),
+        throttle_first_stops=3,
+    )
+
+    result = auto_heal_service.lambda_handler(ALARM_EVENT, None)
+
+    assert sorted(result["killed_tasks"]) == sorted(t["taskArn"] for t in tasks)
+    assert fake_ecs.stop_calls == 7
+    assert sum(s["attempts"] for s in result["stops"]) == 7
+    assert auto_heal_service.STOP_BUCKET.rate < auto_heal_service.STOP_BUCKET.max_rate
+
+
+def test_connection_errors_fail_one_stop_and_keep_the_others_in_the_ledger(cluster):
+    tasks = [make_task(n, f"10.0.0.{n}") for n in range(1, 4)]
+    fake_ecs = cluster(
+        tasks,
+        [target(f"10.0.0.{n}", 80, "unhealthy") for n in range(1, 4)] + healthy(8),
+        unreachable_stops={tasks[1]["taskArn"]},
+    )
+
+    result = auto_heal_service.lambda_handler(ALARM_EVENT, None)
+
+    assert result["killed_tasks"] == [tasks[0]["taskArn"], tasks[2]["taskArn"]]
+    failed, = [s for s in result["stops"] if s["status"] == "failed"]
+    assert failed["error"] == "EndpointConnectionError"
+    assert failed["attempts"] == auto_heal_service.STOP_MAX_ATTEMPTS  # retried here, not by botocore
+    ledger = auto_heal_service.get_kill_ledger()
+    assert ledger.last_task_kill(tasks[0]["taskArn"]) is not None
+    assert ledger.last_task_kill(tasks[1]["taskArn"]) is None
+    assert sorted(fake_ecs.stopped) == sorted([tasks[0]["taskArn"], tasks[2]["taskArn"]])
+
+
+def test_stop_client_makes_a_single_attempt_per_call(monkeypatch):
+    monkeypatch.setattr(auto_heal_service, "CLIENTS", {})
+    stop_client = auto_heal_service.get_client("ecs", single_attempt=True)
+
+    assert stop_client.meta.config.retries == {"mode": "standard", "total_max_attempts": 1}
+    assert auto_heal_service.get_client("ecs").meta.config.retries["mode"] == "adaptive"
+
+
+def test_token_bucket_waits_for_refill():
+    clock = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    bucket = auto_heal_service.TokenBucket(rate=10, burst=2, clock=lambda: clock[0], sleep=sleep)
+    for _ in range(4):
+        bucket.acquire()
+
+    assert sum(sleeps) == pytest.approx(0.2)
+
+
+def alarm_event(*dimensions):
+    return {
+        "region": "us-east-1",
+        "account": "123456789012",
+        "detail": {"configuration": {"metrics": [
+            {"metricStat": {"metric": {"dimensions": d}}} for d in dimensions
+        ]}},
+    }
+
+
+def test_extract_target_groups_expands_suffixes_and_load_balancers(cluster):
+    lb_arn = "arn:aws:elasticloadbalancing:us-east-1:123456789012:loadbalancer/app/demo/1"
+    tg = "arn:aws:elasticloadbalancing:us-east-1:123456789012:targetgroup/{}/1"
+    cluster([], [], load_balancers={lb_arn: [tg.format("api"), tg.format("web")]})
+
+    event = alarm_event(
+        {"TargetGroup": "targetgroup/web/1", "LoadBalancer": "app/demo/1"},
+        {"LoadBalancer": "app/demo/1"},
+    )
+
+    assert auto_heal_service.extract_target_groups(event) == [tg.format("web"), tg.format("api")]
+
+
+def test_fleet_alarm_shares_one_resolution_pass(cluster):
+    lb_arn = "arn:aws:elasticloadbalancing:us-east-1:123456789012:loadbalancer/app/demo/1"
+    tgs = [f"arn:aws:elasticloadbalancing:us-east-1:123456789012:targetgroup/path-{n}/1" for n in range(4)]
+    tasks = [make_task(n, f"10.0.0.{n}") for n in range(4)]
+    fake_ecs = cluster(
+        tasks,
+        {tg: [target(f"10.0.0.{n}", 80, "unhealthy")] + healthy(1) for n, tg in enumerate(tgs)},
+        load_balancers={lb_arn: tgs},
+    )
+
+    result = auto_heal_service.lambda_handler([alarm_event({"LoadBalancer": "app/demo/1"})], None)
+
+    assert sorted(auto_heal_service.CLIENTS["elbv2"].described) == sorted(tgs)
+    assert sorted(result["killed_tasks"]) == sorted(t["taskArn"] for t in tasks)
+    assert fake_ecs.list_calls == 1
+
+
+def test_bridge_mode_resolves_instance_ip_and_host_port(cluster):
+    # 1,000 bridge tasks packed two per instance on 500 container instances
+    tasks = [make_bridge_task(n, n // 2, 32768 + n % 2) for n in range(1000)]
+    fake_ecs = cluster(
+        tasks,
+        [target("172.16.1.7", 32769, "unhealthy"), target("i-300", 32768, "unhealthy")] + healthy(2),
+        desired_counts={"web": 1000},
+    )
+
+    result = auto_heal_service.lambda_handler(ALARM_EVENT, None)
+
+    # 172.16.1.7 is instance 257; i-300 is instance 300
+    assert sorted(result["killed_tasks"]) == sorted([tasks[515]["taskArn"], tasks[600]["taskArn"]])
+    assert fake_ecs.container_instance_calls == 5
+    assert auto_heal_service.CLIENTS["ec2"].calls == 1
+
+    auto_heal_service.refresh_topology()
+
+    assert fake_ecs.container_instance_calls == 5
+    assert auto_heal_service.CLIENTS["ec2"].calls == 1
+
+
+def test_clients_are_created_lazily_with_tuned_config(monkeypatch):
+    monkeypatch.setattr(auto_heal_service, "CLIENTS", {})
+    monkeypatch.setattr(auto_heal_service, "INIT_TIMINGS", {"client_init_ms": {}})
+
+    ecs = auto_heal_service.get_client("ecs")
+
+    assert auto_heal_service.get_client("ecs") is ecs
+    assert list(auto_heal_service.CLIENTS) == ["ecs"]
+    assert ecs.meta.config.retries["mode"] == "adaptive"
+    assert ecs.meta.config.max_pool_connections >= auto_heal_service.STOP_CONCURRENCY
+    assert "ecs" in auto_heal_service.INIT_TIMINGS["client_init_ms"]
+
+
+def test_first_invocation_reports_cold_start(cluster, monkeypatch):
+    cluster([make_task(1, "10.0.0.1")], [target("10.0.0.1", 80, "healthy")])
+    monkeypatch.setattr(auto_heal_service, "INIT_TIMINGS", {"client_init_ms": {}, "import_ms": 1.0})
+
+    first = auto_heal_service.lambda_handler(ALARM_EVENT, None)
+    second = auto_heal_service.lambda_handler(ALARM_EVENT, None)
+
+    assert set(first["cold_start"]) == {"import_ms", "import_to_invoke_ms", "client_init_ms", "handler_ms"}
+    assert "cold_start" not in second
+
+
+def test_alarm_invocation_emits_valid_emf(cluster, capsys):
+    tasks = [make_task(n, f"10.0.0.{n}") for n in range(1, 4)]
+    cluster(tasks, [target("10.0.0.1", 80, "unhealthy"), target("10.0.0.2", 80, "healthy")])
+
+    auto_heal_service.lambda_handler(ALARM_EVENT, None)
+
+    lines = [line for line in capsys.readouterr().out.splitlines() if line.startswith("{")]
+    assert len(lines) == 1
+    doc = json.loads(lines[0])
+    directive = doc["_aws"]["CloudWatchMetrics"][0]
+    assert isinstance(doc["_aws"]["Timestamp"], int)
+    assert directive["Namespace"] == auto_heal_service.METRICS_NAMESPACE
+    for dimension_set in directive["Dimensions"]:
+        assert all(isinstance(doc[d], str) for d in dimension_set)
+    for metric in directive["Metrics"]:
+        assert isinstance(doc[metric["Name"]], (int, float))
+        assert metric["Unit"] in ("Milliseconds", "Count")
+        assert metric["StorageResolution"] == 1
+
+    names = {m["Name"] for m in directive["Metrics"]}
+    assert {"TargetHealthTime", "ListTasksTime", "DescribeTasksTime", "MatchTime", "StopTime", "TotalTime"} <= names
+    assert doc["TasksScanned"] == 3
+    assert doc["TargetsUnhealthy"] == 1
+    assert doc["TasksStopped"] == 1
+
+
+def test_task_state_change_emits_no_metrics(cluster, capsys):
+    cluster([], [])
+    auto_heal_service.lambda_handler(task_state_change(make_task(1, "10.0.0.1"), "RUNNING", "RUNNING", 1), None)
+    assert capsys.readouterr().out == ""
+
+
+def test_api_calls_and_sdk_retries_are_counted(monkeypatch):
+    monkeypatch.setattr(auto_heal_service, "CLIENTS", {})
+    monkeypatch.setattr(auto_heal_service, "METRICS", auto_heal_service.InvocationMetrics())
+    client = auto_heal_service.get_client("elbv2")
+    client.meta.events.register("before-call", lambda **kwargs: (
+        AWSResponse(None, 200, {}, None),
+        {"TargetHealthDescriptions": [], "ResponseMetadata": {"RetryAttempts": 2}},
+    ))
+
+    auto_heal_service.describe_target_health(["arn:aws:elasticloadbalancing:us-east-1:123456789012:targetgroup/a/1"])
+
+    assert auto_heal_service.METRICS.counts == {"ApiCalls": 1, "ApiRetries": 2}
+
+
+def test_stands_down_when_target_group_is_unhealthy_fleet_wide(cluster):
+    tasks = [make_task(n, f"10.0.0.{n}") for n in range(1, 5)]
+    fake_ecs = cluster(tasks, [target(f"10.0.0.{n}", 80, "unhealthy") for n in range(1, 5)])
+
+    result = auto_heal_service.lambda_handler(ALARM_EVENT, None)
+
+    assert result["stood_down_target_groups"] == {"arn:aws:elasticloadbalancing:tg": 1.0}
+    assert fake_ecs.stopped == []
+    assert fake_ecs.list_calls == 0
+
+
+def test_tasks_in_warmup_grace_are_not_stopped(cluster, monkeypatch):
+    monkeypatch.setattr(auto_heal_service, "WARMUP_GRACE_SECONDS", 120)
+    fresh, old = make_task(1, "10.0.0.1"), make_task(2, "10.0.0.2")
+    fresh["startedAt"] = datetime.now(timezone.utc) - timedelta(seconds=30)
+    old["startedAt"] = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat().replace("+00:00", "Z")
+    fake_ecs = cluster(
+        [fresh, old],
+        [target("10.0.0.1", 80, "unhealthy"), target("10.0.0.2", 80, "unhealthy")] + healthy(2),
+    )
+
+    result = auto_heal_service.lambda_handler(ALARM_EVENT, None)
+
+    assert fake_ecs.stopped == [old["taskArn"]]
+    assert result["suppressed_tasks"] == [{"taskArn": fresh["taskArn"], "reason": "warming up"}]
+
+
+def test_kill_budget_spans_invocations(cluster, monkeypatch):
+    monkeypatch.setattr(auto_heal_service, "MAX_KILL_FRACTION", 0.25)
+    tasks = [make_task(n, f"10.0.0.{n}") for n in range(1, 9)]
+    fake_ecs = cluster(tasks, healthy(8), desired_counts={"web": 8})
+    elbv2 = auto_heal_service.CLIENTS["elbv2"]
+
+    # Two different tasks fail in consecutive alarms; a budget of 2 per window
+    # lets the first two through and defers the third.
+    for n in (1, 2, 3):
+        elbv2.targets = [target(f"10.0.0.{n}", 80, "unhealthy")] + healthy(8)
+        result = auto_heal_service.lambda_handler(ALARM_EVENT, None)
+
+    assert fake_ecs.stopped == [tasks[0]["taskArn"], tasks[1]["taskArn"]]
+    assert result["deferred_tasks"][0]["taskArn"] == tasks[2]["taskArn"]
+
+
+class FakeDynamoDB:
+    """Just enough of the DynamoDB API (pk/sk keys) for DynamoDBKillLedger."""
+
+    def __init__(self, unprocessed_per_call=0, throttled_calls=0):
+        self.items = {}
+        self.unprocessed_per_call = unprocessed_per_call
+        self.throttled_calls = throttled_calls
+        self.batch_calls = 0
+        self.get_calls = 0
+
+    def batch_write_item(self, RequestItems):
+        ((table, requests),) = RequestItems.items()
+        assert len(requests) <= 25
+        self.batch_calls += 1
+        # Throttled: the last few requests of the batch come back unprocessed
+        throttled = self.batch_calls <= self.throttled_calls
+        cut = max(0, len(requests) - self.unprocessed_per_call) if throttled else len(requests)
+        for request in requests[:cut]:
+            item = request["PutRequest"]["Item"]
+            self.items[(item["pk"]["S"], item["sk"]["S"])] = item
+        return {"UnprocessedItems": {table: requests[cut:]} if requests[cut:] else {}}
+
+    def batch_get_item(self, RequestItems):
+        ((table, request),) = RequestItems.items()
+        assert len(request["Keys"]) <= 100
+        self.get_calls += 1
+        throttled = self.get_calls <= self.throttled_calls
+        cut = max(0, len(request["Keys"]) - self.unprocessed_per_call) if throttled else len(request["Keys"])
+        found = [self.items[(k["pk"]["S"], k["sk"]["S"])] for k in request["Keys"][:cut]
+                 if (k["pk"]["S"], k["sk"]["S"]) in self.items]
+        unprocessed = {table: dict(request, Keys=request["Keys"][cut:])} if request["Keys"][cut:] else {}
+        return {"Responses": {table: found}, "UnprocessedKeys": unprocessed}
+
+    def get_item(self, TableName, Key):
+        item = self.items.get((Key["pk"]["S"], Key["sk"]["S"]))
+        return {"Item": item} if item else {}
+
+    def query(self, TableName, KeyConditionExpression, ExpressionAttributeValues, Select):
+        pk, since = ExpressionAttributeValues[":pk"]["S"], ExpressionAttributeValues[":since"]["S"]
+        return {"Count": sum(1 for (p, sk) in self.items if p == pk and sk >= since)}
+
+
+def test_dynamodb_ledger_retries_unprocessed_items(monkeypatch):
+    monkeypatch.setattr(auto_heal_service.DynamoDBKillLedger, "BACKOFF_BASE_SECONDS", 0)
+    client = FakeDynamoDB(unprocessed_per_call=4, throttled_calls=2)
+    ledger = auto_heal_service.DynamoDBKillLedger("kills", client=client)
+
+    ledger.record_kills([(f"arn:task/{n}", "web") for n in range(10)], at=1000.0)
+
+    assert len(client.items) == 20  # every task and service item, despite throttling
+    assert client.batch_calls == 3
+    assert ledger.service_kills_since("web", 999.0) == 10
+
+
+def test_dynamodb_ledger_matches_in_memory_ledger():
+    kills = [(f"arn:task/{n}", "web" if n % 2 else None) for n in range(30)]
+    for ledger in (auto_heal_service.InMemoryKillLedger(),
+                   auto_heal_service.DynamoDBKillLedger("kills", client=FakeDynamoDB())):
+        ledger.record_kills(kills[:10], at=1000.0)
+        ledger.record_kills(kills[10:], at=2000.0)
+
+        assert ledger.last_task_kill("arn:task/3") == 1000.0
+        assert ledger.last_task_kill("arn:task/missing") is None
+        assert ledger.last_task_kills(["arn:task/3", "arn:task/missing"]) == {"arn:task/3": 1000.0}
+        assert ledger.service_kills_since("web", 999.0) == 15
+        assert ledger.service_kills_since("web", 1500.0) == 10
+
+
+def test_dynamodb_ledger_reads_kills_in_batches(monkeypatch):
+    monkeypatch.setattr(auto_heal_service.DynamoDBKillLedger, "BACKOFF_BASE_SECONDS", 0)
+    client = FakeDynamoDB()
+    ledger = auto_heal_service.DynamoDBKillLedger("kills", client=client)
+    ledger.record_kills([(f"arn:task/{n}", None) for n in range(0, 250, 2)], at=1000.0)
+    client.unprocessed_per_call, client.throttled_calls = 30, 2
+
+    kills = ledger.last_task_kills([f"arn:task/{n}" for n in range(250)])
+
+    assert kills == {f"arn:task/{n}": 1000.0 for n in range(0, 250, 2)}
+    assert client.get_calls == 5  # 100 + 100 + 50 keys, two of them partly unprocessed
@@ -141,12 +141,39 @@ resource "aws_lambda_function" "auto_healer" {
 
   environment {
     variables = {
-      CLUSTER_NAME = aws_ecs_cluster.main.name
-      SERVICE_NAME = aws_ecs_service.nginx.name
+      CLUSTER_NAME               = aws_ecs_cluster.main.name
+      SERVICE_NAME               = aws_ecs_service.nginx.name
+      TOPOLOGY_CACHE_TTL_SECONDS = var.topology_cache_ttl_seconds
+      STOP_CONCURRENCY           = var.stop_concurrency
+      MAX_KILL_FRACTION          = var.max_kill_fraction
+      KILL_LEDGER_TABLE          = aws_dynamodb_table.kill_ledger.name
     }
   }
 }
 
+# Kill ledger shared by all auto-healer containers (flap suppression)
+resource "aws_dynamodb_table" "kill_ledger" {
+  name         = "${var.cluster_name}-auto-healer-kills"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "pk"
+  range_key    = "sk"
+
+  attribute {
+    name = "pk"
+    type = "S"
+  }
+
+  attribute {
+    name = "sk"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expiresAt"
+    enabled        = true
+  }
+}
+
 # 10. Lambda IAM Role
 resource "aws_iam_role" "lambda_role" {
   name = "${var.cluster_name}-lambda-role"
@@ -182,6 +209,7 @@ resource "aws_iam_role_policy" "lambda_policy" {
         Action = [
           "ecs:ListTasks",
           "ecs:DescribeTasks",
+          "ecs:DescribeServices",
           "ecs:StopTask",
           "ecs:UpdateService"
         ]
@@ -194,7 +222,33 @@ resource "aws_iam_role_policy" "lambda_policy" {
       {
         Effect = "Allow"
         Action = [
-          "elasticloadbalancing:DescribeTargetHealth"
+          "ecs:DescribeContainerInstances"
+        ]
+        Resource = [
+          "arn:aws:ecs:${var.region}:${data.aws_caller_identity.current.account_id}:container-instance/${aws_ecs_cluster.main.name}/*"
+        ]
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "ec2:DescribeInstances"
+        ]
+        Resource = "*"
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:GetItem",
+          "dynamodb:Query",
+          "dynamodb:BatchWriteItem"
+        ]
+        Resource = aws_dynamodb_table.kill_ledger.arn
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "elasticloadbalancing:DescribeTargetHealth",
+          "elasticloadbalancing:DescribeTargetGroups"
         ]
         Resource = "*"
       }
@@ -250,3 +304,31 @@ resource "aws_lambda_permission" "allow_eventbridge" {
   principal     = "events.amazonaws.com"
   source_arn    = aws_cloudwatch_event_rule.alarm_trigger.arn
 }
+
+# 13. EventBridge Rule (Keep the Lambda's warm task topology cache current)
+resource "aws_cloudwatch_event_rule" "task_state_change" {
+  name        = "${var.cluster_name}-task-state-change"
+  description = "Routes ECS task state changes to the auto-healer topology cache"
+
+  event_pattern = jsonencode({
+    source      = ["aws.ecs"]
+    detail-type = ["ECS Task State Change"]
+    detail = {
+      clusterArn = [aws_ecs_cluster.main.arn]
+    }
+  })
+}
+
+resource "aws_cloudwatch_event_target" "task_state_lambda_target" {
+  rule      = aws_cloudwatch_event_rule.task_state_change.name
+  target_id = "SendTaskStateToLambda"
+  arn       = aws_lambda_function.auto_healer.arn
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_task_state" {
+  statement_id  = "AllowTaskStateFromEventBridge"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.auto_healer.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.task_state_change.arn
+}
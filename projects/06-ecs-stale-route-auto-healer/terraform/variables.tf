@@ -2,3 +2,18 @@
 
 variable "region" { default = "us-east-1" }
 variable "cluster_name" { default = "demo-stale-route" }
+
+variable "topology_cache_ttl_seconds" {
+  description = "How long a warm auto-healer container trusts its cached task topology"
+  default     = 300
+}
+
+variable "stop_concurrency" {
+  description = "Maximum number of concurrent ecs:StopTask calls per invocation"
+  default     = 8
+}
+
+variable "max_kill_fraction" {
+  description = "Largest fraction of a service's desiredCount the auto-healer may stop per sliding SERVICE_KILL_WINDOW_SECONDS window (default 300s), counted across invocations"
+  default     = 0.5
+}